@@ -0,0 +1,318 @@
+from pathlib import Path
+
+import fastparquet
+import numpy as np
+import pandas as pd
+
+from b3_series.config import Config
+from b3_series.files import atomic_write, remove_files_except
+from b3_series.io import fingerprint_metadata, get_absolute_series_path, is_current
+from b3_series.query import load, select_series
+
+ADJUSTMENTS_FOLDER = "adjustments"
+
+# columns identifying an event, its ticker and first trading day after it
+EVENT_KEYS = ["sigla_acao", "data_pregao"]
+
+PRICE_COLUMNS = [
+    "preco_abertura",
+    "preco_maximo",
+    "preco_minimo",
+    "preco_medio",
+    "preco_ultimo",
+    "preco_melhor_oferta_compra",
+    "preco_melhor_oferta_venda",
+]
+
+# columns needed to detect splits and groupings
+EVENT_COLUMNS = [
+    "sigla_acao",
+    "data_pregao",
+    "tipo_mercado",
+    "preco_abertura",
+    "preco_ultimo",
+    "fator_cotacao",
+    "numero_distribuicao",
+]
+
+# splits and groupings are detected in the cash market only, as the prices
+# of options and forwards jump on their own, like the panel of the screener
+EVENT_MARKETS = [10]
+
+# smallest price jump between two trading days taken as a split or grouping,
+# a 2:1 split within RATIO_TOLERANCE
+MIN_EVENT_RATIO = 1.9
+
+# relative distance between a price jump and the n:1 or 1:n ratio of a split
+# or grouping
+RATIO_TOLERANCE = 0.05
+
+
+def _float_prices(values: pd.Series) -> np.ndarray:
+    """
+    Prices as float64, including the integer cents of the compact schema.
+    """
+    if pd.api.types.is_integer_dtype(values.dtype):
+        return values.astype("float64").to_numpy(na_value=np.nan) / 100
+    return values.to_numpy(dtype="float64", na_value=np.nan)
+
+
+def normalize_quotation_factor(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Prices per share, dividing the prices quoted per lot by fator_cotacao.
+
+    Returns:
+        pd.DataFrame: A copy of the records with float prices per share and
+            quantities in shares
+    """
+    df = df.copy()
+    factor = df["fator_cotacao"].to_numpy(dtype="float64", na_value=1)
+    factor[~(factor > 0)] = 1
+
+    for column in PRICE_COLUMNS:
+        if column in df:
+            df[column] = _float_prices(df[column]) / factor
+    return df
+
+
+def _nearest_ratio(ratio: float) -> float:
+    """
+    Split or grouping ratio closest to a price jump, like 2 for a 2:1 split
+    or 0.1 for a 10:1 grouping, or NaN if none is close enough.
+
+    Only n:1 splits and 1:n groupings are detected, as fractional ratios
+    would match almost any jump.
+    """
+    inverted = ratio < 1
+    value = 1 / ratio if inverted else ratio
+
+    nearest = round(value)
+    if nearest >= 2 and abs(value / nearest - 1) <= RATIO_TOLERANCE:
+        return 1 / nearest if inverted else nearest
+    return np.nan
+
+
+def detect_adjustment_events(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Detect splits and groupings of every ticker in one grouped pass.
+
+    An event is a jump between the close of a trading day and the open of
+    the next one close to a split or grouping ratio, on the day the
+    distribution number (numero_distribuicao) of the ticker changes. Only
+    the records of the EVENT_MARKETS are considered when they have a
+    tipo_mercado.
+
+    Args:
+        df (pd.DataFrame): Records with at least the EVENT_COLUMNS
+
+    Returns:
+        pd.DataFrame: The sigla_acao, the data_pregao of the first trading
+            day after the event and its ratio, as the factor dividing the
+            prices before it
+    """
+    if "tipo_mercado" in df:
+        df = df[df["tipo_mercado"].isin(EVENT_MARKETS).to_numpy()]
+    df = normalize_quotation_factor(
+        df[[column for column in EVENT_COLUMNS if column in df]]
+    )
+    df = df.sort_values(["sigla_acao", "data_pregao"], kind="stable")
+
+    tickers = df["sigla_acao"].to_numpy(dtype=object)
+    same_ticker = np.zeros(len(df), dtype=bool)
+    same_ticker[1:] = tickers[1:] == tickers[:-1]
+
+    distributions = df["numero_distribuicao"].to_numpy(dtype="float64", na_value=0)
+    changed_distribution = np.zeros(len(df), dtype=bool)
+    changed_distribution[1:] = distributions[1:] != distributions[:-1]
+
+    previous_close = np.roll(df["preco_ultimo"].to_numpy(), 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratios = previous_close / df["preco_abertura"].to_numpy()
+
+    candidates = same_ticker & changed_distribution & np.isfinite(ratios)
+    candidates &= (ratios >= MIN_EVENT_RATIO) | (ratios <= 1 / MIN_EVENT_RATIO)
+
+    events = df.loc[candidates, ["sigla_acao", "data_pregao"]]
+    events["sigla_acao"] = events["sigla_acao"].astype(object)
+    events["fator"] = [_nearest_ratio(ratio) for ratio in ratios[candidates]]
+
+    return events.dropna(subset=["fator"]).reset_index(drop=True)
+
+
+def apply_adjustment_factors(df: pd.DataFrame, events: pd.DataFrame) -> pd.DataFrame:
+    """
+    Adjust the prices and quantities of the records for the given events.
+
+    The prices of a record are divided by the product of the factors of the
+    events of its ticker after its trading date, and the quantities are
+    multiplied by it, so volumes are unchanged.
+
+    Returns:
+        pd.DataFrame: The normalized records, adjusted, with the applied
+            factor in fator_ajuste
+    """
+    df = normalize_quotation_factor(df)
+
+    events = events.sort_values(["sigla_acao", "data_pregao"], ascending=[True, False])
+    events = events.assign(
+        fator_ajuste=events.groupby("sigla_acao", observed=True, sort=False)[
+            "fator"
+        ].cumprod()
+    )
+
+    # the factor of a record is the cumulated factor of the next event
+    records = pd.DataFrame(
+        {
+            "position": np.arange(len(df)),
+            "sigla_acao": df["sigla_acao"].to_numpy(dtype=object),
+            "data_pregao": df["data_pregao"].to_numpy(),
+        }
+    )
+    records = pd.merge_asof(
+        records.sort_values("data_pregao"),
+        events[["sigla_acao", "data_pregao", "fator_ajuste"]].sort_values(
+            "data_pregao"
+        ),
+        on="data_pregao",
+        by="sigla_acao",
+        direction="forward",
+        allow_exact_matches=False,
+    )
+
+    factor = np.ones(len(df))
+    factor[records["position"].to_numpy()] = records["fator_ajuste"].fillna(1)
+    for column in PRICE_COLUMNS:
+        if column in df:
+            df[column] = df[column] / factor
+    if "quantidade_titulos_negociados" in df:
+        quantities = df["quantidade_titulos_negociados"].astype("float64")
+        df["quantidade_titulos_negociados"] = quantities * factor
+    df["fator_ajuste"] = factor
+
+    return df
+
+
+def adjust_prices(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Adjust a loaded or queried DataFrame for the quotation factor and for
+    the splits and groupings found in it.
+    """
+    return apply_adjustment_factors(df, detect_adjustment_events(df))
+
+
+def _adjustments_path(config=Config()) -> Path:
+    return Path(get_absolute_series_path(ADJUSTMENTS_FOLDER, config))
+
+
+def _read_event_records(parquet_name: str, config=Config()) -> pd.DataFrame:
+    """
+    Records of the EVENT_MARKETS in a parquet file, with the EVENT_COLUMNS.
+    """
+    parquet_file = fastparquet.ParquetFile(
+        get_absolute_series_path(parquet_name, config)
+    )
+    df = parquet_file.to_pandas(
+        columns=EVENT_COLUMNS,
+        filters=[("tipo_mercado", "in", EVENT_MARKETS)],
+        index=False,
+    )
+    return df[df["tipo_mercado"].isin(EVENT_MARKETS).to_numpy()]
+
+
+def _serie_adjustments(parquet_name: str, config=Config()) -> pd.DataFrame:
+    """
+    Splits and groupings found in a parquet file, and the first and last
+    records of each of its tickers, to find the events between files.
+
+    They are cached in a file per parquet file, recording its fingerprint
+    like the ticker index, so the events of a file are only detected again
+    after it changes.
+
+    Returns:
+        pd.DataFrame: The events, with their fator, and the first and last
+            records of each ticker, with the EVENT_COLUMNS, told apart by
+            the registro column
+    """
+    path = _adjustments_path(config) / parquet_name
+    metadata = fingerprint_metadata(parquet_name, config)
+
+    if path.exists():
+        parquet_file = fastparquet.ParquetFile(str(path))
+        if is_current(parquet_file, parquet_name, config):
+            return parquet_file.to_pandas(index=False)
+
+    df = _read_event_records(parquet_name, config)
+    df = df.assign(sigla_acao=df["sigla_acao"].astype(object))
+    df = df.sort_values(["sigla_acao", "data_pregao"], kind="stable")
+    adjustments = pd.concat(
+        [
+            detect_adjustment_events(df).assign(registro="event"),
+            df.drop_duplicates("sigla_acao", keep="first").assign(registro="first"),
+            df.drop_duplicates("sigla_acao", keep="last").assign(registro="last"),
+        ],
+        ignore_index=True,
+    )
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with atomic_write(path) as partial:
+        fastparquet.write(
+            str(partial), adjustments, write_index=False, custom_metadata=metadata
+        )
+
+    return adjustments
+
+
+def load_adjustment_factors(config=Config()) -> pd.DataFrame:
+    """
+    Splits and groupings of every ticker in the converted parquet files.
+
+    The events found in each parquet file are cached with it, so only the
+    files converted or replaced since the last call are read. The events
+    between two files, on the first trading day of a file, are detected from
+    the cached first and last records of each ticker in each file.
+
+    Returns:
+        pd.DataFrame: The events, see detect_adjustment_events
+    """
+    series = select_series(config=config)
+
+    # cache files of the series removed or superseded since
+    remove_files_except(_adjustments_path(config), series)
+
+    if not series:
+        return detect_adjustment_events(pd.DataFrame(columns=EVENT_COLUMNS))
+
+    adjustments = pd.concat(
+        [_serie_adjustments(serie, config) for serie in series], ignore_index=True
+    )
+
+    events = adjustments.loc[adjustments["registro"] == "event", EVENT_KEYS + ["fator"]]
+    edges = adjustments[adjustments["registro"] != "event"].drop_duplicates(EVENT_KEYS)
+    firsts = adjustments.loc[adjustments["registro"] == "first", EVENT_KEYS]
+    edge_events = detect_adjustment_events(edges).merge(firsts, on=EVENT_KEYS)
+
+    return (
+        pd.concat([events, edge_events], ignore_index=True)
+        .sort_values(EVENT_KEYS, kind="stable")
+        .reset_index(drop=True)
+    )
+
+
+def load_adjusted(
+    tickers: list[str] = None,
+    start=None,
+    end=None,
+    markets: list[int] = None,
+    config=Config(),
+) -> pd.DataFrame:
+    """
+    Load records like query.load, adjusted with the cached adjustment factors.
+
+    Events after end are taken into account, so the adjusted prices of a
+    range are the same as in the adjusted whole history.
+
+    Returns:
+        pd.DataFrame: The adjusted records, see apply_adjustment_factors
+    """
+    df = load(tickers=tickers, start=start, end=end, markets=markets, config=config)
+    return apply_adjustment_factors(df, load_adjustment_factors(config))
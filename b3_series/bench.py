@@ -0,0 +1,440 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import zipfile
+from datetime import datetime
+from time import perf_counter
+
+import numpy as np
+import pandas as pd
+
+from b3_series.config import Config
+from b3_series.index import INDEX_SORT_COLUMNS
+from b3_series.pandas import load_compressed_series
+from b3_series.parquet import PARQUET_CODECS, PARQUET_ENGINES, write_parquet_file
+from b3_series.schema import PARSER_VERSION, RECORD_LENGTH, SCHEMA
+from b3_series.sync_parquets import sync_parquets
+
+# statements timed in fresh interpreters by the startup benchmark
+STARTUP_STATEMENTS = {
+    "import b3_series": "import b3_series",
+    "import b3_series.sync_series": "import b3_series.sync_series",
+    "list_series": (
+        "from b3_series.config import Config; from b3_series.io import list_series; "
+        "list_series(config=Config(fs_path={folder!r}))"
+    ),
+}
+
+_CHUNK_RECORDS = 100_000
+_LINE_BREAK = b"\r\n"
+
+
+def _digits(values: np.ndarray, width: int) -> np.ndarray:
+    """
+    Zero-padded decimal digits of the values, as a (n x width) byte matrix.
+    """
+    values = values.astype(np.int64)
+    digits = np.empty((len(values), width), dtype=np.uint8)
+    for position in range(width - 1, -1, -1):
+        digits[:, position] = values % 10 + ord("0")
+        values = values // 10
+    return digits
+
+
+def _text(values: list[str], width: int) -> np.ndarray:
+    """
+    Space-padded text values, as a (n x width) byte matrix.
+    """
+    encoded = [value.ljust(width)[:width].encode("ISO-8859-1") for value in values]
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8).reshape(-1, width)
+
+
+def _synthetic_records(
+    first: int, count: int, total: int, trading_days: np.ndarray, rng
+) -> np.ndarray:
+    """
+    Quotation records first to first + count of a synthetic series with
+    total records, spread in date order over the trading days.
+    """
+    columns = dict(zip(SCHEMA.names, SCHEMA.colspecs))
+    records = np.full((count, RECORD_LENGTH + len(_LINE_BREAK)), ord(" "), np.uint8)
+    records[:, RECORD_LENGTH:] = np.frombuffer(_LINE_BREAK, dtype=np.uint8)
+
+    def put(name, values):
+        start, end = columns[name]
+        records[:, start:end] = values
+
+    index = np.arange(first, first + count) * len(trading_days) // total
+    days = trading_days[index]
+    expiries = trading_days[np.minimum(index + 20, len(trading_days) - 1)]
+    tickers = rng.integers(0, 2000, count)
+    options = rng.random(count) < 0.3
+
+    ticker_names = [f"T{ticker:04d}" for ticker in range(2000)]
+    names = _text([f"COMPANY {ticker:04d}" for ticker in range(2000)], 12)
+    isins = _text([f"BRT{ticker:04d}ACNOR{ticker % 10}" for ticker in range(2000)], 12)
+    tickers_text = _text(ticker_names, 12)
+
+    put("tipo_registro", _digits(np.ones(count), 2))
+    put("data_pregao", _digits(days, 8))
+    put("codbdi", _digits(np.where(options, 78, 2), 2))
+    put("sigla_acao", tickers_text[tickers])
+    put("tipo_mercado", _digits(np.where(options, 70, 10), 3))
+    put("nome_resumido", names[tickers])
+    put("especificacao_papel", _text(["ON      NM"], 10)[np.zeros(count, int)])
+    put("moeda", _text(["R$"], 4)[np.zeros(count, int)])
+
+    base = (tickers + 1) * 50 * rng.uniform(0.9, 1.1, count)
+    low, high = base * 0.97, base * 1.03
+    for name, prices in [
+        ("preco_abertura", base),
+        ("preco_maximo", high),
+        ("preco_minimo", low),
+        ("preco_medio", base),
+        ("preco_ultimo", rng.uniform(low, high)),
+        ("preco_melhor_oferta_compra", low),
+        ("preco_melhor_oferta_venda", high),
+    ]:
+        put(name, _digits(prices, 13))
+
+    trades = rng.integers(1, 99_999, count)
+    quantity = trades * rng.integers(1, 1_000, count)
+    put("numero_negocios", _digits(trades, 5))
+    put("quantidade_titulos_negociados", _digits(quantity, 18))
+    put("volume_titulos_negociados", _digits(quantity * base, 18))
+    put("preco_exercicio", _digits(np.where(options, base, 0), 13))
+    put("indicador_correcao_preco", _digits(np.zeros(count), 1))
+    put("data_vencimento", _digits(np.where(options, expiries, 99991231), 8))
+    put("fator_cotacao", _digits(np.ones(count), 7))
+    put("preco_pontos", _digits(np.zeros(count), 13))
+    put("codigo_isin", isins[tickers])
+    put("numero_distribuicao", _digits(np.full(count, 100), 3))
+
+    return records
+
+
+def generate_series(path: str, records: int, year: int = 2023, seed: int = 0) -> str:
+    """
+    Write a synthetic COTAHIST zip file with the given number of records.
+
+    The file follows the layout of dataframe_columns(), with a header and a
+    trailer record, and is written in chunks so any size fits in memory.
+
+    Args:
+        path (str): Path of the zip file to write
+        records (int): Number of quotation records
+        year (int, optional): Year of the trading dates. Defaults to 2023.
+        seed (int, optional): Seed of the random values. Defaults to 0.
+
+    Returns:
+        str: The path of the zip file
+    """
+    rng = np.random.default_rng(seed)
+    days = np.arange(f"{year}-01-01", f"{year + 1}-01-01", dtype="datetime64[D]")
+    days = days[np.is_busday(days)].astype(object)
+    trading_days = np.array([int(day.strftime("%Y%m%d")) for day in days])
+
+    header = f"00COTAHIST.{year}BOVESPA {trading_days[-1]}"
+    trailer = f"99COTAHIST.{year}BOVESPA {trading_days[-1]}{records + 2:011d}"
+
+    member = f"{os.path.splitext(os.path.basename(path))[0]}.TXT"
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        with zip_file.open(member, "w", force_zip64=True) as f:
+            f.write(header.ljust(RECORD_LENGTH).encode() + _LINE_BREAK)
+            for first in range(0, records, _CHUNK_RECORDS):
+                count = min(_CHUNK_RECORDS, records - first)
+                chunk = _synthetic_records(first, count, records, trading_days, rng)
+                f.write(chunk.tobytes())
+            f.write(trailer.ljust(RECORD_LENGTH).encode() + _LINE_BREAK)
+
+    return path
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / 1024**2 if sys.platform == "darwin" else peak / 1024
+
+
+def _measure_load(path: str, engine: str) -> dict:
+    start_time = perf_counter()
+    df = load_compressed_series(path, engine=engine)
+    elapsed = perf_counter() - start_time
+
+    with zipfile.ZipFile(path) as zip_file:
+        uncompressed = sum(info.file_size for info in zip_file.infolist())
+
+    return {
+        "engine": engine,
+        "records": len(df),
+        "seconds": elapsed,
+        "records_per_second": len(df) / elapsed,
+        "mb_per_second": uncompressed / 1024**2 / elapsed,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def _run_isolated(function, *args):
+    """
+    Run a measurement in a fresh process, so its peak RSS is its own.
+    """
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1) as pool:
+        return pool.apply(function, args)
+
+
+def _measure_parquet(df: pd.DataFrame, folder: str, config=Config()) -> dict:
+    settings = {
+        "engine": config.parquet_engine,
+        "codec": config.parquet_codec,
+        "level": config.parquet_codec_level,
+        "row_group_size": config.row_group_size,
+        "dictionary": config.parquet_dictionary,
+    }
+    path = os.path.join(folder, "bench.parquet")
+
+    try:
+        start_time = perf_counter()
+        write_parquet_file(path, df, config)
+        write_seconds = perf_counter() - start_time
+    except Exception as error:
+        return {**settings, "error": str(error)}
+
+    start_time = perf_counter()
+    pd.read_parquet(path, engine="fastparquet")
+    read_seconds = perf_counter() - start_time
+
+    return {
+        **settings,
+        "write_seconds": write_seconds,
+        "read_seconds": read_seconds,
+        "bytes": os.path.getsize(path),
+    }
+
+
+def compare_parquet_settings(
+    zip_path: str, settings: list[dict] = None, config=Config()
+) -> list[dict]:
+    """
+    Convert a sample series with each parquet writer setting, timing the write
+    and the read back and measuring the size of the file.
+
+    Args:
+        zip_path (str): Path of the sample zip file
+        settings (list[dict], optional): Config fields of each setting, like
+            {"parquet_engine": "pyarrow", "parquet_codec": "zstd"}. Defaults to
+            every engine with every codec.
+        config (Config, optional): Settings shared by all the runs
+
+    Returns:
+        list[dict]: One result per setting, with an error instead of the
+            timings when the setting is not supported
+    """
+    if settings is None:
+        settings = [
+            {"parquet_engine": engine, "parquet_codec": codec}
+            for engine in PARQUET_ENGINES
+            for codec in PARQUET_CODECS
+        ]
+
+    df = load_compressed_series(zip_path, compact=config.compact_schema)
+    df = df.sort_values(INDEX_SORT_COLUMNS, kind="stable", ignore_index=True)
+
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        for setting in settings:
+            setting_config = Config(**{**config.dict(), **setting})
+            results.append(_measure_parquet(df, folder, setting_config))
+    return results
+
+
+def _measure_sync_parquets(zip_path: str, folder: str) -> dict:
+    fs_path = os.path.join(folder, "sync")
+    os.makedirs(fs_path, exist_ok=True)
+    shutil.copy(zip_path, os.path.join(fs_path, "COTAHIST_A2023.ZIP"))
+
+    start_time = perf_counter()
+    sync_parquets(Config(fs_path=fs_path))
+    return {"seconds": perf_counter() - start_time}
+
+
+def measure_startup(folder: str, repeats: int = 5) -> list[dict]:
+    """
+    Time the STARTUP_STATEMENTS in fresh interpreters, imports included, as
+    paid by every short-lived scheduled job.
+    """
+    env = dict(os.environ)
+    package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env["PYTHONPATH"] = os.pathsep.join(
+        filter(None, [package_root, env.get("PYTHONPATH")])
+    )
+
+    results = []
+    for name, statement in STARTUP_STATEMENTS.items():
+        code = (
+            "from time import perf_counter; start_time = perf_counter(); "
+            f"{statement.format(folder=folder)}; print(perf_counter() - start_time)"
+        )
+        timings = [
+            float(subprocess.check_output([sys.executable, "-c", code], env=env))
+            for _ in range(repeats)
+        ]
+        results.append(
+            {
+                "statement": name,
+                "min_ms": min(timings) * 1000,
+                "median_ms": statistics.median(timings) * 1000,
+            }
+        )
+    return results
+
+
+def run_benchmarks(
+    records: int = 100_000,
+    engines: list[str] = None,
+    codecs: list = None,
+    isolate: bool = True,
+) -> dict:
+    """
+    Benchmark parsing, parquet writing and sync_parquets on a synthetic series,
+    and the startup of the package.
+
+    Args:
+        records (int, optional): Records of the synthetic series. Defaults to 100_000.
+        engines (list[str], optional): Parser engines to measure. Defaults to numpy.
+        codecs (list, optional): Parquet compression codecs to measure.
+            Defaults to PARQUET_CODECS.
+        isolate (bool, optional): Measure each parser run in a fresh process,
+            so the peak RSS is not inflated by earlier runs. Defaults to True.
+
+    Returns:
+        dict: The results, ready to be dumped as JSON
+    """
+    engines = engines or ["numpy"]
+    codecs = PARQUET_CODECS if codecs is None else codecs
+
+    with tempfile.TemporaryDirectory() as folder:
+        zip_path = generate_series(os.path.join(folder, "COTAHIST_A2023.ZIP"), records)
+
+        load = []
+        for engine in engines:
+            if isolate:
+                load.append(_run_isolated(_measure_load, zip_path, engine))
+            else:
+                load.append(_measure_load(zip_path, engine))
+
+        df = load_compressed_series(zip_path)
+        parquet = [
+            _measure_parquet(df, folder, Config(parquet_codec=codec))
+            for codec in codecs
+        ]
+
+        return {
+            "created_at": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "parser_version": PARSER_VERSION,
+            "records": records,
+            "zip_bytes": os.path.getsize(zip_path),
+            "load": load,
+            "parquet": parquet,
+            "sync_parquets": _measure_sync_parquets(zip_path, folder),
+            "startup": measure_startup(folder),
+        }
+
+
+def _codec(value: str):
+    return None if value.lower() == "none" else value.lower()
+
+
+def _dictionary(value: str):
+    return {"on": True, "off": False, "default": None}[value]
+
+
+def _compare(args: argparse.Namespace) -> dict:
+    with tempfile.TemporaryDirectory() as folder:
+        zip_path = args.compare or generate_series(
+            os.path.join(folder, "COTAHIST_A2023.ZIP"), args.records
+        )
+        settings = [
+            {
+                "parquet_engine": engine,
+                "parquet_codec": codec,
+                "parquet_codec_level": level,
+                "row_group_size": row_group_size,
+                "parquet_dictionary": dictionary,
+            }
+            for engine in args.parquet_engines
+            for codec in args.codecs
+            for level in args.levels
+            for row_group_size in args.row_group_sizes
+            for dictionary in args.dictionary
+        ]
+
+        return {
+            "created_at": datetime.now().isoformat(),
+            "sample": os.path.basename(zip_path),
+            "zip_bytes": os.path.getsize(zip_path),
+            "parquet": compare_parquet_settings(zip_path, settings),
+        }
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(description="Benchmark b3_series pipelines.")
+    parser.add_argument("--records", type=int, default=100_000)
+    parser.add_argument("--engines", nargs="+", default=["numpy"])
+    parser.add_argument("--output", help="JSON file to write the results to")
+    parser.add_argument(
+        "--compare",
+        nargs="?",
+        const="",
+        metavar="ZIP",
+        help="Only compare parquet writer settings on a sample series, "
+        "a synthetic one of --records records when omitted",
+    )
+    parser.add_argument(
+        "--parquet-engines", nargs="+", default=PARQUET_ENGINES, choices=PARQUET_ENGINES
+    )
+    parser.add_argument(
+        "--codecs",
+        nargs="+",
+        type=_codec,
+        default=PARQUET_CODECS,
+        help="Codecs to compare, none for uncompressed",
+    )
+    parser.add_argument("--levels", nargs="+", type=int, default=[None])
+    parser.add_argument(
+        "--row-group-sizes", nargs="+", type=int, default=[Config().row_group_size]
+    )
+    parser.add_argument(
+        "--dictionary",
+        nargs="+",
+        type=_dictionary,
+        default=[None],
+        help="Dictionary encoding of the text columns: on, off or default",
+    )
+    args = parser.parse_args(argv)
+
+    if args.compare is not None:
+        results = _compare(args)
+    else:
+        results = run_benchmarks(records=args.records, engines=args.engines)
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+import sys
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+
+import pandas as pd
+
+from b3_series.config import Config
+from b3_series.files import atomic_write
+from b3_series.io import file_fingerprint, get_absolute_series_path
+from b3_series.metrics import metrics
+from b3_series.pandas import PARSER_VERSION, load_compressed_series
+
+
+def _frame_size(df: pd.DataFrame) -> int:
+    """
+    Bytes held by a DataFrame.
+
+    The parser shares one string object per distinct value, so text columns
+    count each distinct value once instead of once per row, which is also
+    much faster than memory_usage(deep=True).
+    """
+    size = int(df.memory_usage(index=True, deep=False).sum())
+    for name in df.columns[df.dtypes == object]:
+        size += sum(sys.getsizeof(value) for value in pd.unique(df[name]))
+    return size
+
+
+def series_fingerprint(path: str, compact: bool) -> str:
+    """
+    Fingerprint of a series file and of the parser settings it is read with.
+    """
+    return f"{file_fingerprint(path)}-{PARSER_VERSION}-{int(compact)}"
+
+
+def _read_series(path: str, compact: bool) -> pd.DataFrame:
+    if path.lower().endswith(".parquet"):
+        return pd.read_parquet(path, engine="fastparquet")
+    return load_compressed_series(path, compact=compact)
+
+
+class SeriesCache:
+    """
+    Parsed series kept in memory, with an optional tier on local disk.
+
+    Entries are keyed by series path and validated against a fingerprint of
+    the file (size, modification time, parser version and schema), so they
+    are invalidated as soon as the file changes. The least recently used
+    entries are evicted once the DataFrames held exceed max_bytes.
+
+    With a disk path, parsed series are also written as uncompressed Feather
+    files, which other processes open memory-mapped instead of parsing the
+    series again. The disk tier requires pyarrow.
+    """
+
+    def __init__(self, max_bytes: int = 512 * 1024**2, disk_path: str = None):
+        self.max_bytes = max_bytes
+        self.disk_path = disk_path
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def _get(self, path: str, fingerprint: str) -> pd.DataFrame:
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is None:
+                return None
+            if entry[0] != fingerprint:
+                self.size -= self._entries.pop(path)[2]
+                return None
+            self._entries.move_to_end(path)
+            return entry[1]
+
+    def _put(self, path: str, fingerprint: str, df: pd.DataFrame):
+        size = _frame_size(df)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if path in self._entries:
+                self.size -= self._entries.pop(path)[2]
+            self._entries[path] = (fingerprint, df, size)
+            self.size += size
+
+            while self.size > self.max_bytes:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self.size -= evicted_size
+                metrics.count("cache_evictions")
+
+    def _disk_file(self, name: str, fingerprint: str) -> Path:
+        return Path(self.disk_path) / f"{name}.{fingerprint}.feather"
+
+    def _read_disk(self, name: str, fingerprint: str) -> pd.DataFrame:
+        path = self._disk_file(name, fingerprint)
+        if not path.exists():
+            return None
+
+        from pyarrow import feather
+
+        # split_blocks keeps numeric columns without nulls as views of the map
+        table = feather.read_table(str(path), memory_map=True)
+        return table.to_pandas(split_blocks=True)
+
+    def _write_disk(self, name: str, fingerprint: str, df: pd.DataFrame):
+        from pyarrow import feather
+
+        path = self._disk_file(name, fingerprint)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        for stale in path.parent.glob(f"{name}.*.feather"):
+            stale.unlink(missing_ok=True)
+
+        with atomic_write(path) as partial:
+            feather.write_feather(df, str(partial), compression="uncompressed")
+
+    def load(self, path: str, compact: bool = False) -> pd.DataFrame:
+        """
+        Load a zip or parquet series file through the cache.
+
+        The returned DataFrame is shared with later calls and must not be
+        modified in place.
+
+        Args:
+            path (str): Path of the series file
+            compact (bool, optional): Use the compact_dtypes() schema for zip
+                files. Defaults to False.
+
+        Returns:
+            pd.DataFrame: The records of the series
+        """
+        name = Path(path).name
+        fingerprint = series_fingerprint(path, compact)
+
+        df = self._get(path, fingerprint)
+        if df is not None:
+            metrics.count("cache_hits", tier="memory")
+            return df
+
+        if self.disk_path is not None:
+            df = self._read_disk(name, fingerprint)
+            if df is not None:
+                metrics.count("cache_hits", tier="disk")
+
+        if df is None:
+            metrics.count("cache_misses")
+            df = _read_series(path, compact)
+            if self.disk_path is not None:
+                self._write_disk(name, fingerprint, df)
+
+        self._put(path, fingerprint, df)
+        return df
+
+
+@lru_cache(maxsize=None)
+def _cached_series_cache(max_bytes: int, disk_path: str) -> SeriesCache:
+    return SeriesCache(max_bytes, disk_path)
+
+
+def get_series_cache(config=Config()) -> SeriesCache:
+    """
+    Series cache of the config, shared by the calls using the same settings.
+    """
+    return _cached_series_cache(config.cache_memory_mb * 1024**2, config.cache_path)
+
+
+def load_series(serie: str, config=Config()) -> pd.DataFrame:
+    """
+    Load a zip or parquet series file through the cache of the config.
+
+    Args:
+        serie (str): Name of the series file
+        config (Config, optional): Storage and cache settings
+
+    Returns:
+        pd.DataFrame: The records of the series, shared with later calls
+    """
+    path = get_absolute_series_path(serie, config)
+    return get_series_cache(config).load(path, compact=config.compact_schema)
@@ -0,0 +1,297 @@
+import argparse
+import json
+import logging
+import os
+import sys
+
+from b3_series.config import Config, FSType
+
+CONFIG_OPTIONS = [
+    "fs_path",
+    "fs_type",
+    "s3_endpoint_url",
+    "download_workers",
+    "conversion_workers",
+    "convert_on_download",
+    "compact_schema",
+    "parquet_engine",
+    "parquet_codec",
+    "parquet_codec_level",
+    "parquet_dictionary",
+    "row_group_size",
+    "partitioned_dataset",
+    "dataset_partition_on",
+]
+
+# the conversion and the queries read and write the series as local files
+S3_COMMANDS = ["stats"]
+
+
+def _config(args: argparse.Namespace) -> Config:
+    options = {
+        name: getattr(args, name)
+        for name in CONFIG_OPTIONS
+        if getattr(args, name, None) is not None
+    }
+    # None stands for an option not given, so uncompressed is spelled "none"
+    if options.get("parquet_codec") == "none":
+        options["parquet_codec"] = None
+    return Config(**options)
+
+
+def _print_report(report):
+    print(report.json(indent=2))
+
+
+def _sync(args: argparse.Namespace):
+    config = _config(args)
+
+    if args.dry_run:
+        from b3_series.sync_series import _find_missing_series
+
+        for serie in _find_missing_series(config, save_catalog=False):
+            print(f"Would download {serie}")
+        return _convert(args)
+
+    from b3_series.pipeline import sync_pipeline
+
+    _print_report(sync_pipeline(config, args.budget))
+
+    if args.consolidate:
+        from b3_series.consolidate import sync_consolidated
+
+        _print_report(sync_consolidated(config))
+
+
+def _convert(args: argparse.Namespace):
+    config = _config(args)
+
+    if args.dry_run:
+        from b3_series.io import list_series
+        from b3_series.sync_parquets import _find_outdated_parquets, _load_manifest
+
+        outdated, _ = _find_outdated_parquets(
+            list_series("zip", config=config), _load_manifest(config), config
+        )
+        for zip_serie in outdated:
+            print(f"Would convert {zip_serie}")
+        return
+
+    from b3_series.sync_parquets import sync_parquets
+
+    _print_report(sync_parquets(config, args.budget))
+
+
+def _query(args: argparse.Namespace):
+    config = _config(args)
+
+    if args.dry_run:
+        from b3_series.query import select_series, to_date
+
+        start = to_date(args.start) if args.start else None
+        end = to_date(args.end) if args.end else None
+        for serie in select_series(start, end, config):
+            print(f"Would read {serie}")
+        return
+
+    from b3_series.query import load
+
+    df = load(
+        tickers=args.tickers or None,
+        start=args.start,
+        end=args.end,
+        columns=args.columns,
+        markets=args.markets,
+        isins=args.isins,
+        config=config,
+    )
+
+    if args.output is None:
+        df.to_csv(sys.stdout, index=False)
+    elif args.output.endswith(".parquet"):
+        df.to_parquet(args.output, engine="fastparquet", index=False)
+    else:
+        df.to_csv(args.output, index=False)
+
+
+def _bench(args: argparse.Namespace):
+    from b3_series.bench import main
+
+    main(args.bench_args)
+
+
+def _stats(args: argparse.Namespace):
+    from b3_series.jobs import DONE, FAILED, PENDING, JobQueue
+    from b3_series.storage import get_storage
+    from b3_series.sync_parquets import CONVERSION_JOURNAL
+    from b3_series.sync_series import DOWNLOAD_JOURNAL
+
+    config = _config(args)
+    storage = get_storage(config)
+
+    stats = {}
+    for format in ["zip", "parquet"]:
+        series = [
+            name for name in storage.list() if name.lower().endswith(f".{format}")
+        ]
+        stats[format] = {"series": len(series)}
+        if config.fs_type == FSType.local:
+            sizes = [os.path.getsize(storage.path(name)) for name in series]
+            stats[format]["bytes"] = sum(sizes)
+
+    for stage, journal in [("sync", DOWNLOAD_JOURNAL), ("convert", CONVERSION_JOURNAL)]:
+        queue = JobQueue(journal, config)
+        stats[f"{stage}_jobs"] = {
+            status: len(queue.names(status)) for status in [PENDING, DONE, FAILED]
+        }
+
+    print(json.dumps(stats, indent=2))
+
+
+def _parser() -> argparse.ArgumentParser:
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--fs-path", help="Folder or s3://bucket/prefix of the store")
+    common.add_argument(
+        "--fs-type",
+        choices=[fs_type.name for fs_type in FSType],
+        type=str.lower,
+        help=f"Storage backend, s3 only for: {', '.join(S3_COMMANDS)}",
+    )
+    common.add_argument("--s3-endpoint-url")
+    common.add_argument("--download-workers", type=int)
+    common.add_argument("--conversion-workers", type=int)
+    common.add_argument("--compact-schema", action="store_true", default=None)
+    common.add_argument("--parquet-engine", choices=["fastparquet", "pyarrow"])
+    common.add_argument(
+        "--parquet-codec",
+        choices=["gzip", "snappy", "zstd", "lz4", "none"],
+        help="Codec of the parquet files written, none to leave them "
+        "uncompressed (default: gzip)",
+    )
+    common.add_argument("--parquet-codec-level", type=int)
+    common.add_argument(
+        "--parquet-dictionary",
+        action=argparse.BooleanOptionalAction,
+        help="Dictionary-encode the columns (default: the engine's own)",
+    )
+    common.add_argument(
+        "--row-group-size",
+        type=int,
+        help="Records per row group of the parquet files (default: 100000)",
+    )
+    common.add_argument(
+        "--partitioned-dataset",
+        action="store_true",
+        default=None,
+        help="Also write the series to a dataset partitioned by year and month, "
+        "and query it",
+    )
+    common.add_argument(
+        "--dataset-partition-on",
+        nargs="+",
+        metavar="COLUMN",
+        help="Columns also partitioning the dataset, such as tipo_mercado",
+    )
+    common.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Only print what would be downloaded, converted or read",
+    )
+
+    parser = argparse.ArgumentParser(
+        prog="b3-series", description="Download and query B3 historical series."
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    sync = subparsers.add_parser(
+        "sync",
+        parents=[common],
+        help="Download and convert the missing series",
+        description="Download and convert the missing series. The parquet "
+        "files written with other writer settings (engine, codec, dictionary "
+        "or row group size) are converted again.",
+    )
+    sync.add_argument(
+        "--budget", type=float, default=7, help="Time budget in minutes (default: 7)"
+    )
+    sync.add_argument(
+        "--convert-on-download",
+        action="store_true",
+        default=None,
+        help="Parse the series while they are downloaded",
+    )
+    sync.add_argument(
+        "--consolidate",
+        action="store_true",
+        help="Consolidate the parquet files of closed periods afterwards",
+    )
+    sync.set_defaults(handler=_sync)
+
+    convert = subparsers.add_parser(
+        "convert",
+        parents=[common],
+        help="Convert the outdated zip files to parquet",
+        description="Convert the outdated zip files to parquet, including "
+        "those written with other writer settings (engine, codec, dictionary "
+        "or row group size).",
+    )
+    convert.add_argument(
+        "--budget", type=float, default=3, help="Time budget in minutes (default: 3)"
+    )
+    convert.set_defaults(handler=_convert)
+
+    query = subparsers.add_parser(
+        "query", parents=[common], help="Print or save the records of some tickers"
+    )
+    query.add_argument("tickers", nargs="*", help="Tickers, all when omitted")
+    query.add_argument("--start", help="First trading date, as YYYY-MM-DD")
+    query.add_argument("--end", help="Last trading date, as YYYY-MM-DD")
+    query.add_argument("--columns", nargs="+")
+    query.add_argument("--markets", nargs="+", type=int)
+    query.add_argument("--isins", nargs="+")
+    query.add_argument("--output", help="CSV or .parquet file, stdout when omitted")
+    query.set_defaults(handler=_query)
+
+    # the options of bench are parsed by b3_series.bench itself
+    bench = subparsers.add_parser(
+        "bench", add_help=False, help="Benchmark the pipelines, see b3_series.bench"
+    )
+    bench.set_defaults(handler=_bench)
+
+    stats = subparsers.add_parser(
+        "stats", parents=[common], help="Print statistics of the store"
+    )
+    stats.set_defaults(handler=_stats)
+
+    return parser
+
+
+def main(argv: list[str] = None):
+    """
+    Entry point of the b3-series console script.
+
+    Heavy modules like pandas are only imported by the subcommands using
+    them, so the script starts quickly.
+    """
+    # progress messages go to stderr, so reports and records can be piped
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    parser = _parser()
+    args, extra = parser.parse_known_args(argv)
+    if args.command == "bench":
+        args.bench_args = extra
+    elif extra:
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+
+    if getattr(args, "fs_type", None) is not None:
+        args.fs_type = FSType[args.fs_type]
+        if args.fs_type == FSType.s3 and args.command not in S3_COMMANDS:
+            parser.error(
+                f"{args.command} needs a local store, --fs-type s3 is only "
+                f"supported by: {', '.join(S3_COMMANDS)}"
+            )
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
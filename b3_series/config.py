@@ -1,4 +1,5 @@
 from enum import IntEnum
+from typing import Literal, Optional
 
 from pydantic import BaseModel
 
@@ -11,3 +12,23 @@ class FSType(IntEnum):
 class Config(BaseModel):
     fs_type: FSType = FSType.local
     fs_path: str = "data"
+    s3_endpoint_url: str = None
+    series_url: str = "https://bvmf.bmfbovespa.com.br/InstDados/SerHist/{}"
+    conversion_workers: int = 1
+    download_workers: int = 1
+    download_requests_per_second: float = 2
+    convert_on_download: bool = False
+    catalog_ttl_in_minutes: int = 60
+    row_group_size: int = 100_000
+    parquet_engine: Literal["fastparquet", "pyarrow"] = "fastparquet"
+    parquet_codec: Optional[Literal["gzip", "snappy", "zstd", "lz4"]] = "gzip"
+    parquet_codec_level: int = None
+    parquet_dictionary: bool = None
+    compact_schema: bool = False
+    cache_memory_mb: int = 512
+    cache_path: str = None
+    partitioned_dataset: bool = False
+    dataset_partition_on: list[str] = []
+    consolidation_grace_days: int = 7
+    max_attempts: int = 5
+    retry_backoff_seconds: float = 5
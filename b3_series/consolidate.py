@@ -0,0 +1,150 @@
+import os
+from datetime import date, timedelta
+
+import fastparquet
+import pandas as pd
+
+from b3_series.config import Config
+from b3_series.dataset import remove_dataset_series
+from b3_series.index import remove_ticker_indexes
+from b3_series.io import get_absolute_series_path, list_series, require_local_storage
+from b3_series.metrics import RunReport, metrics, run_report
+from b3_series.names import SERIE_LEVELS, SERIE_PATTERN, serie_level, serie_stem
+from b3_series.options import remove_options
+from b3_series.query import serie_period
+from b3_series.sync_parquets import write_parquet
+from b3_series.validation import remove_quarantine
+
+# records are unique by trading date, ticker and market
+DEDUPLICATION_COLUMNS = ["data_pregao", "sigla_acao", "tipo_mercado"]
+
+
+def _consolidated_name(parquet_serie: str, level: str) -> str:
+    """
+    Name of the monthly ("M") or annual ("A") series holding a series.
+    """
+    match = SERIE_PATTERN.match(serie_stem(parquet_serie))
+    kind, period = match.group("kind").upper(), match.group("period")
+    if kind == "D":
+        period = period[2:]
+    if level == "A" and kind != "A":
+        period = period[2:]
+    return f"COTAHIST_{level}{period}.parquet"
+
+
+def _closed_period(parquet_name: str, today: date, grace_days: int) -> bool:
+    """
+    Whether no more daily files are expected for a consolidated series, once
+    grace_days passed since the end of its period.
+    """
+    _, last_day = serie_period(parquet_name)
+    return last_day + timedelta(days=grace_days) < today
+
+
+def _consolidation_groups(
+    parquet_series: list[str], level: str, today: date, grace_days: int
+) -> dict[str, list[str]]:
+    """
+    Series to consolidate into each monthly or annual series of a closed period.
+
+    A group is only consolidated when it holds smaller series, so series
+    already consolidated are left untouched.
+    """
+    groups = {}
+    for parquet_serie in parquet_series:
+        match = SERIE_PATTERN.match(serie_stem(parquet_serie))
+        if match is None or serie_level(parquet_serie) > SERIE_LEVELS[level]:
+            continue
+        name = _consolidated_name(parquet_serie, level)
+        if _closed_period(name, today, grace_days):
+            groups.setdefault(name, []).append(parquet_serie)
+
+    return {
+        name: sorted(series, key=serie_level, reverse=True)
+        for name, series in groups.items()
+        if any(serie_level(serie) < serie_level(name) for serie in series)
+    }
+
+
+def _read_parquet(parquet_serie: str, config=Config()) -> pd.DataFrame:
+    path = get_absolute_series_path(parquet_serie, config)
+    return fastparquet.ParquetFile(path).to_pandas(index=False)
+
+
+def consolidate_series(
+    parquet_series: list[str], parquet_name: str, config=Config()
+) -> int:
+    """
+    Merge parquet series into a single monthly or annual parquet series.
+
+    The series are merged from the largest to the smallest, and records are
+    deduplicated by DEDUPLICATION_COLUMNS keeping the first, so official
+    monthly and annual records win over daily ones. The merged file is
+    swapped in before the merged series are removed, and from then on
+    readers skip the smaller series it supersedes, so they never see a
+    partial or duplicated state.
+
+    Args:
+        parquet_series (list[str]): Names of the parquet series to merge
+        parquet_name (str): Name of the consolidated parquet series
+        config (Config, optional): Storage settings
+
+    Returns:
+        int: The number of records of the consolidated series
+    """
+    with metrics.span("consolidate_series", serie=parquet_name):
+        frames = [_read_parquet(serie, config) for serie in parquet_series]
+        df = pd.concat(frames, ignore_index=True)
+        df = df.drop_duplicates(DEDUPLICATION_COLUMNS, keep="first")
+
+        # categories of the compact schema differ between series
+        categorical = frames[0].select_dtypes("category").columns
+        df = df.astype({column: "category" for column in categorical})
+
+        write_parquet(df, parquet_name, config, sources=parquet_series)
+
+        for serie in parquet_series:
+            if serie != parquet_name:
+                os.unlink(get_absolute_series_path(serie, config))
+
+    metrics.count("files_consolidated", len(parquet_series))
+    return len(df)
+
+
+def sync_consolidated(config=Config(), today: date = None) -> RunReport:
+    """
+    Consolidate the parquet series of closed periods.
+
+    Daily series of past months are merged into monthly series, and then
+    monthly series of past years into annual series, so scans read a few
+    large files instead of many small ones. A period is only consolidated
+    config.consolidation_grace_days after its end, as later daily series
+    would be superseded by the consolidated series.
+
+    Args:
+        config (Config, optional): Storage settings
+        today (date, optional): Current date. Defaults to today.
+
+    Returns:
+        RunReport: The consolidated parquet series
+    """
+    require_local_storage("Consolidating the series", config)
+    today = today or date.today()
+
+    with run_report("sync_consolidated") as report:
+        for level in ["M", "A"]:
+            parquet_series = list_series("parquet", config=config)
+            groups = _consolidation_groups(
+                parquet_series, level, today, config.consolidation_grace_days
+            )
+            for parquet_name, series in sorted(groups.items()):
+                consolidate_series(series, parquet_name, config)
+                report.completed.append(parquet_name)
+
+        parquet_series = list_series("parquet", config=config)
+        remove_ticker_indexes(parquet_series, config)
+        remove_options(parquet_series, config)
+        remove_quarantine(parquet_series, config)
+        remove_dataset_series(parquet_series, config)
+
+    return report
@@ -0,0 +1,238 @@
+from __future__ import annotations
+
+import os
+from datetime import date
+from pathlib import Path
+from time import time
+from typing import TYPE_CHECKING
+
+from b3_series.config import Config
+from b3_series.files import atomic_write
+from b3_series.io import get_absolute_series_path
+from b3_series.metrics import metrics
+from b3_series.names import serie_level, serie_stem, superseding_stems
+from b3_series.parquet import write_parquet_file
+from b3_series.schema import SCHEMA
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+DATASET_FOLDER = "dataset"
+PARTITION_COLUMNS = ["ano", "mes"]
+SORT_COLUMNS = ["sigla_acao", "data_pregao"]
+
+
+def get_dataset_path(config=Config()) -> str:
+    return get_absolute_series_path(DATASET_FOLDER, config)
+
+
+def _dataset_files(config=Config()) -> dict[str, list[Path]]:
+    """
+    Parquet files of the dataset grouped by the series they came from.
+    """
+    files = {}
+    for path in Path(get_dataset_path(config)).rglob("*.parquet"):
+        files.setdefault(path.stem, []).append(path)
+    return files
+
+
+def _month_path(path: Path, config=Config()) -> Path:
+    """
+    Folder of the year and month partition holding a file of the dataset.
+    """
+    root = Path(get_dataset_path(config))
+    return root.joinpath(*path.relative_to(root).parts[: len(PARTITION_COLUMNS)])
+
+
+def _dataset_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Cast a parsed series to the dataset schema.
+
+    Integer columns are stored as nullable Int64, so files parsed from
+    different series always share the same parquet schema.
+    """
+    integer_columns = {
+        column.name: "Int64"
+        for column in SCHEMA.columns
+        if column.type == "int" and column.name in df
+    }
+    return df.astype(integer_columns).assign(
+        ano=df["data_pregao"].dt.year, mes=df["data_pregao"].dt.month
+    )
+
+
+def _write_partition(df: pd.DataFrame, partition_path: Path, stem: str, config):
+    df = df.sort_values(SORT_COLUMNS, kind="stable", ignore_index=True)
+
+    partition_path.mkdir(parents=True, exist_ok=True)
+    with atomic_write(partition_path / f"{stem}.parquet") as partial:
+        write_parquet_file(str(partial), df, config)
+
+
+def write_dataset(parquet_name: str, df: pd.DataFrame, config=Config()) -> list[str]:
+    """
+    Write the records of a parquet series to the partitioned parquet dataset.
+
+    The records are partitioned by year and month (and by the columns in
+    config.dataset_partition_on), sorted by ticker and date and written as one
+    file per partition named after the series. Partitions already holding a
+    series that supersedes this one are left untouched, and the files of the
+    series superseded by this one, or of a previous version of it, are
+    removed from the months it writes.
+
+    Args:
+        parquet_name (str): Name of the parquet file of the series
+        df (pd.DataFrame): The records of the series
+        config (Config, optional): Storage and writer settings
+
+    Returns:
+        list[str]: Paths of the written parquet files
+    """
+    with metrics.span("write_dataset", serie=parquet_name):
+        stem = serie_stem(parquet_name)
+        level = serie_level(parquet_name)
+        dataset_path = Path(get_dataset_path(config))
+        partition_on = list(config.dataset_partition_on)
+
+        written = []
+        for month, month_df in _dataset_frame(df).groupby(PARTITION_COLUMNS):
+            month_path = dataset_path.joinpath(
+                *[f"{name}={value}" for name, value in zip(PARTITION_COLUMNS, month)]
+            )
+            existing = list(month_path.rglob("*.parquet"))
+            if any(serie_level(path.name) > level for path in existing):
+                continue
+
+            month_df = month_df.drop(columns=PARTITION_COLUMNS)
+            groups = (
+                month_df.groupby(partition_on) if partition_on else [((), month_df)]
+            )
+            for values, partition_df in groups:
+                values = values if isinstance(values, tuple) else (values,)
+                partition_path = month_path.joinpath(
+                    *[f"{name}={value}" for name, value in zip(partition_on, values)]
+                )
+                partition_df = partition_df.drop(columns=partition_on)
+                _write_partition(partition_df, partition_path, stem, config)
+                written.append(str(partition_path / f"{stem}.parquet"))
+
+            for path in existing:
+                replaced = path.stem == stem and str(path) not in written
+                if serie_level(path.name) < level or replaced:
+                    path.unlink()
+
+    metrics.count(
+        "bytes_written",
+        sum(os.path.getsize(path) for path in written),
+        stage="write_dataset",
+    )
+
+    return written
+
+
+def sync_dataset(
+    parquet_series: list[str], config=Config(), timeout_in_minutes=3
+) -> list[str]:
+    """
+    Write to the dataset the parquet files it does not hold yet, such as the
+    files converted before the dataset was enabled.
+
+    Series already written, or superseded by a series already written, are
+    skipped, so daily and monthly files never duplicate annual data.
+
+    Returns:
+        list[str]: Names of the parquet files written to the dataset
+    """
+    import fastparquet
+
+    written_stems = set(_dataset_files(config))
+
+    def is_missing(parquet_serie):
+        stem = serie_stem(parquet_serie)
+        superseded = any(name in written_stems for name in superseding_stems(stem))
+        return stem not in written_stems and not superseded
+
+    # annual series first, so the smaller series they supersede are skipped
+    missing_series = sorted(
+        [serie for serie in parquet_series if is_missing(serie)],
+        key=serie_level,
+        reverse=True,
+    )
+
+    written_series = []
+    timeout = time() + 60 * timeout_in_minutes
+    for parquet_serie in missing_series:
+        if time() > timeout:
+            print(f"Timeout of {timeout_in_minutes} minutes reached. Stopping.")
+            break
+        if not is_missing(parquet_serie):
+            continue
+
+        path = get_absolute_series_path(parquet_serie, config)
+        df = fastparquet.ParquetFile(path).to_pandas(index=False)
+        write_dataset(parquet_serie, df, config)
+        written_series.append(parquet_serie)
+        written_stems.add(serie_stem(parquet_serie))
+
+    return written_series
+
+
+def remove_dataset_series(parquet_names: list[str], config=Config()) -> list[str]:
+    """
+    Remove the dataset files of parquet files other than the given ones, and
+    the files of months also held by a series superseding theirs, left by
+    series written concurrently.
+
+    Returns:
+        list[str]: Paths of the removed files
+    """
+    stems = {serie_stem(parquet_name) for parquet_name in parquet_names}
+    files = sorted(Path(get_dataset_path(config)).rglob("*.parquet"))
+
+    month_levels = {}
+    for path in files:
+        month_path = _month_path(path, config)
+        month_levels[month_path] = max(
+            month_levels.get(month_path, 0), serie_level(path.name)
+        )
+
+    removed = []
+    for path in files:
+        superseded = serie_level(path.name) < month_levels[_month_path(path, config)]
+        if path.stem not in stems or superseded:
+            path.unlink()
+            removed.append(str(path))
+    return removed
+
+
+def select_partitions(
+    start: date = None, end: date = None, config=Config()
+) -> list[tuple[str, dict]]:
+    """
+    Files of the dataset that may hold records between start and end.
+
+    Returns:
+        list[tuple[str, dict]]: The path of each file and the values of the
+            config.dataset_partition_on columns it holds
+    """
+    root = Path(get_dataset_path(config))
+    types = {column.name: column.type for column in SCHEMA.columns}
+
+    selected = []
+    for path in sorted(root.rglob("*.parquet")):
+        values = dict(
+            part.split("=", 1) for part in path.relative_to(root).parent.parts
+        )
+        month = int(values.pop("ano")), int(values.pop("mes"))
+        if start is not None and month < (start.year, start.month):
+            continue
+        if end is not None and month > (end.year, end.month):
+            continue
+
+        values = {
+            name: int(value) if types.get(name) == "int" else value
+            for name, value in values.items()
+        }
+        selected.append((str(path), values))
+
+    return selected
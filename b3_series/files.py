@@ -0,0 +1,64 @@
+import os
+import shutil
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, Iterator
+
+
+def _remove(path: Path):
+    if path.is_dir():
+        shutil.rmtree(path)
+    else:
+        path.unlink(missing_ok=True)
+
+
+@contextmanager
+def atomic_write(path) -> Iterator[Path]:
+    """
+    Path of a partial file, or folder, to write instead of the given path.
+
+    The partial replaces the path once the block completes, so readers never
+    see it half-written, and is removed if the block fails. A folder replaces
+    the previous folder as a whole.
+
+    Example:
+        with atomic_write(path) as partial:
+            partial.write_text(text)
+    """
+    path = Path(path)
+    partial = path.with_name(f"{path.name}.partial")
+    _remove(partial)
+
+    try:
+        yield partial
+    except BaseException:
+        _remove(partial)
+        raise
+
+    if partial.is_dir() and path.exists():
+        _remove(path)
+    os.replace(partial, path)
+
+
+def remove_files_except(
+    folder, names: Iterable[str], pattern: str = "*.parquet"
+) -> list[str]:
+    """
+    Remove the files of a folder matching a glob pattern whose name is not
+    one of the given names, such as the files derived from parquet files
+    removed since.
+
+    Returns:
+        list[str]: Names of the removed files
+    """
+    folder = Path(folder)
+    if not folder.exists():
+        return []
+
+    names = set(names)
+    removed = []
+    for path in folder.glob(pattern):
+        if path.name not in names:
+            path.unlink()
+            removed.append(path.name)
+    return removed
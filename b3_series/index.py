@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from b3_series.config import Config
+from b3_series.files import atomic_write, remove_files_except
+from b3_series.io import fingerprint_metadata, get_absolute_series_path, is_current
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+INDEX_FOLDER = "index"
+
+# converted parquet files are sorted so the records of a ticker are contiguous
+INDEX_SORT_COLUMNS = ["sigla_acao", "codigo_isin", "data_pregao"]
+
+# bump whenever a change to the layout of the parquet files changes the index
+INDEX_VERSION = 1
+
+
+def get_index_path(config=Config()) -> str:
+    return get_absolute_series_path(INDEX_FOLDER, config)
+
+
+def _index_file(parquet_name: str, config=Config()) -> Path:
+    return Path(get_index_path(config)) / parquet_name
+
+
+def has_ticker_index(parquet_name: str, config=Config()) -> bool:
+    import fastparquet
+
+    path = _index_file(parquet_name, config)
+    if not path.exists():
+        return False
+    return is_current(fastparquet.ParquetFile(str(path)), parquet_name, config)
+
+
+def build_ticker_index(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Row ranges of each ticker and ISIN of a DataFrame sorted by INDEX_SORT_COLUMNS.
+
+    Returns:
+        pd.DataFrame: One row per ticker and ISIN, with the first (row_start)
+            and past the last (row_stop) row of its records and the first
+            and last trading dates of the range
+    """
+    import numpy as np
+    import pandas as pd
+
+    if df.empty:
+        return pd.DataFrame(
+            {
+                "sigla_acao": pd.Series(dtype=object),
+                "codigo_isin": pd.Series(dtype=object),
+                "row_start": pd.Series(dtype="int64"),
+                "row_stop": pd.Series(dtype="int64"),
+                "first_date": pd.Series(dtype="datetime64[ns]"),
+                "last_date": pd.Series(dtype="datetime64[ns]"),
+            }
+        )
+
+    tickers = df["sigla_acao"].to_numpy(dtype=object)
+    isins = df["codigo_isin"].to_numpy(dtype=object)
+    changed = (tickers[1:] != tickers[:-1]) | (isins[1:] != isins[:-1])
+    starts = np.concatenate([[0], np.flatnonzero(changed) + 1])
+    stops = np.append(starts[1:], len(df))
+
+    dates = df["data_pregao"].to_numpy()
+    return pd.DataFrame(
+        {
+            "sigla_acao": tickers[starts],
+            "codigo_isin": isins[starts],
+            "row_start": starts.astype("int64"),
+            "row_stop": stops.astype("int64"),
+            "first_date": np.minimum.reduceat(dates, starts),
+            "last_date": np.maximum.reduceat(dates, starts),
+        }
+    )
+
+
+def write_ticker_index(parquet_name: str, df: pd.DataFrame, config=Config()):
+    """
+    Write the ticker index of a converted parquet file.
+
+    Every parquet file has its own index file, so indexing a new daily or
+    monthly file never rewrites the index of the other files. The index
+    records the fingerprint of the parquet file, its size and modification
+    time, so an index left behind by a replaced parquet file is ignored.
+
+    Args:
+        parquet_name (str): Name of the parquet file
+        df (pd.DataFrame): The records written to it, sorted by INDEX_SORT_COLUMNS
+        config (Config, optional): Storage settings
+    """
+    import fastparquet
+
+    path = _index_file(parquet_name, config)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with atomic_write(path) as partial:
+        fastparquet.write(
+            str(partial),
+            build_ticker_index(df),
+            compression="gzip",
+            write_index=False,
+            custom_metadata=fingerprint_metadata(parquet_name, config),
+        )
+
+
+def remove_ticker_indexes(parquet_names: list[str], config=Config()) -> list[str]:
+    """
+    Remove the index files of parquet files other than the given ones.
+
+    Returns:
+        list[str]: Names of the parquet files whose index was removed
+    """
+    return remove_files_except(get_index_path(config), parquet_names)
+
+
+def read_ticker_index(
+    parquet_name: str,
+    tickers: list[str] = None,
+    isins: list[str] = None,
+    config=Config(),
+) -> pd.DataFrame:
+    """
+    Row ranges of the given tickers or ISINs in a parquet file.
+
+    Returns:
+        pd.DataFrame: The matching rows of the index, or None if the parquet
+            file has no index or was replaced since it was indexed
+    """
+    import fastparquet
+    import numpy as np
+
+    path = _index_file(parquet_name, config)
+    if not path.exists():
+        return None
+
+    index_file = fastparquet.ParquetFile(str(path))
+    if not is_current(index_file, parquet_name, config):
+        return None
+
+    index = index_file.to_pandas(index=False)
+    mask = np.zeros(len(index), dtype=bool)
+    if tickers is not None:
+        mask |= index["sigla_acao"].isin(tickers).to_numpy()
+    if isins is not None:
+        mask |= index["codigo_isin"].isin(isins).to_numpy()
+
+    return index[mask]
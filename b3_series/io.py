@@ -1,18 +1,46 @@
-from pathlib import Path
-from time import perf_counter
+import os
+from contextlib import contextmanager
+from typing import BinaryIO, Iterator
 
-from b3_series.config import Config
+from b3_series.config import Config, FSType
+from b3_series.metrics import metrics
+from b3_series.storage import Content, get_storage
+
+# metadata key of the fingerprint of a parquet file in the files derived from it
+PARQUET_FINGERPRINT = "parquet_fingerprint"
+
+
+def require_local_storage(operation: str, config=Config()):
+    """
+    Fail early when an operation reading or writing the series as local files
+    is asked of another storage.
+
+    Downloads and listings go through the storage, but the conversion, the
+    indexes and the queries open the series with os and fastparquet.
+
+    Raises:
+        ValueError: When config.fs_type is not local
+    """
+    if config.fs_type != FSType.local:
+        raise ValueError(
+            f"{operation} requires fs_type=local, the {config.fs_type.name} "
+            "storage only supports downloading and listing the series"
+        )
 
 
 def get_absolute_series_path(series: str, config=Config()) -> str:
-    return f"{config.fs_path}/{series}"
+    """
+    Local path of a series or of a folder of the store.
 
+    Raises:
+        ValueError: When config.fs_type is not local
+    """
+    require_local_storage(f"Reading {series} as a local file", config)
+    return get_storage(config).path(series)
 
-def list_series(format=None, config=Config()) -> list[str]:
-    tmp_folder = Path(config.fs_path)
-    tmp_folder.exists() or tmp_folder.mkdir()
 
-    existing_files = [file.name for file in tmp_folder.iterdir()]
+def list_series(format=None, config=Config()) -> list[str]:
+    existing_files = get_storage(config).list()
 
     if (format is not None) and (format != ""):
         existing_files = [
@@ -22,17 +50,71 @@ def list_series(format=None, config=Config()) -> list[str]:
     return existing_files
 
 
+def file_fingerprint(path: str) -> str:
+    """
+    Fingerprint of the current version of a local file, from its size and its
+    modification time in nanoseconds, so a file replaced by another of the
+    same size gets another fingerprint.
+    """
+    stat = os.stat(path)
+    return f"{stat.st_size:x}-{stat.st_mtime_ns:x}"
+
+
+def fingerprint_metadata(parquet_name: str, config=Config()) -> dict[str, str]:
+    """
+    Key-value metadata recording the fingerprint of a parquet file in the
+    files derived from it, such as its ticker index, see is_current.
+    """
+    path = get_absolute_series_path(parquet_name, config)
+    return {PARQUET_FINGERPRINT: file_fingerprint(path)}
+
+
+def is_current(derived_file, parquet_name: str, config=Config()) -> bool:
+    """
+    Whether a parquet file derived from a parquet file, such as its ticker
+    index, was written for its current version, and not for a parquet file
+    replaced since.
+
+    Args:
+        derived_file (fastparquet.ParquetFile): The derived file
+        parquet_name (str): Name of the parquet file it was derived from
+        config (Config, optional): Storage settings
+    """
+    fingerprint = file_fingerprint(get_absolute_series_path(parquet_name, config))
+    return derived_file.key_value_metadata.get(PARQUET_FINGERPRINT) == fingerprint
+
+
+def series_modified_at(series: str, config=Config()) -> float:
+    """
+    Modification time of a series as a timestamp, or None if it does not exist.
+    """
+    return get_storage(config).modified_at(series)
+
+
+@contextmanager
+def open_series(series: str, config=Config()) -> Iterator[BinaryIO]:
+    """
+    Open a series for reading as a seekable binary file.
+    """
+    with get_storage(config).open(series) as f:
+        yield f
+
+
 def remove_series(series: str, config=Config()):
-    path = get_absolute_series_path(series, config)
-    Path(path).unlink()
+    get_storage(config).remove(series)
 
 
-def save_series(series: str, content: bytes, config=Config()):
-    print(f"Saving series {series}...")
-    start_time = perf_counter()
+def save_series(series: str, content: Content, config=Config()):
+    """
+    Write a series to the storage.
 
-    with open(get_absolute_series_path(series, config), "wb") as f:
-        f.write(content)
+    Args:
+        series (str): Name of the series file
+        content (Content): The content as bytes, as an iterable of byte chunks
+            or as a binary file, written block by block
+        config (Config, optional): Storage settings
+    """
+    with metrics.span("save_series", serie=series):
+        written = get_storage(config).write(series, content)
 
-    end_time = perf_counter()
-    print(f"Saved series {series}. Time elapsed: {end_time - start_time}")
+    metrics.count("bytes_written", written, stage="save_series")
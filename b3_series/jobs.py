@@ -0,0 +1,234 @@
+import json
+import logging
+import threading
+from concurrent.futures import FIRST_COMPLETED, Executor, ThreadPoolExecutor, wait
+from time import sleep, time
+from typing import Any, Callable
+
+from pydantic import BaseModel
+
+from b3_series.config import Config
+from b3_series.metrics import metrics
+from b3_series.storage import get_storage
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# longest wait between two attempts of a job
+MAX_BACKOFF_SECONDS = 15 * 60
+
+
+class Job(BaseModel):
+    name: str
+    status: str = PENDING
+    attempts: int = 0
+    next_attempt_at: float = 0
+    error: str = None
+
+
+def backoff_seconds(attempts: int, config=Config()) -> float:
+    """
+    Wait before the next attempt of a job that failed attempts times, doubling
+    config.retry_backoff_seconds after every failure.
+    """
+    return min(config.retry_backoff_seconds * 2 ** (attempts - 1), MAX_BACKOFF_SECONDS)
+
+
+class JobQueue:
+    """
+    Work items of a sync stage, persisted as a JSON journal in the storage.
+
+    Every change of state is written to the journal, so a run interrupted by
+    its time budget, an error or a crash is resumed by the next run: jobs
+    left running are taken as pending again, and jobs waiting for a retry
+    keep their backoff. A job failing config.max_attempts times in a row is
+    marked as failed, and is only enqueued again MAX_BACKOFF_SECONDS later or
+    after retry_failed() is called.
+    """
+
+    def __init__(self, journal: str, config=Config()):
+        self.journal = journal
+        self.config = config
+        self._lock = threading.Lock()
+        self._jobs = {}
+
+        storage = get_storage(config)
+        if storage.modified_at(journal) is not None:
+            with storage.open(journal) as f:
+                for item in json.loads(f.read()):
+                    job = Job(**item)
+                    if job.status == RUNNING:
+                        job.status = PENDING
+                    self._jobs[job.name] = job
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def __getitem__(self, name: str) -> Job:
+        return self._jobs[name]
+
+    def save(self):
+        content = json.dumps([job.dict() for job in self._jobs.values()], indent=2)
+        get_storage(self.config).write(self.journal, content.encode())
+
+    def enqueue(self, names: list[str]):
+        """
+        Track the given jobs only, keeping the state of the ones already known.
+
+        Jobs done in an earlier run are queued again, as the work they did is
+        needed again, and jobs no longer given are dropped.
+        """
+        now = time()
+        with self._lock:
+            jobs = {}
+            for name in names:
+                job = self._jobs.get(name)
+                if job is None or job.status == DONE:
+                    job = Job(name=name)
+                elif job.status == FAILED and job.next_attempt_at <= now:
+                    job = Job(name=name)
+                jobs[name] = job
+            self._jobs = jobs
+            self.save()
+
+    def retry_failed(self):
+        with self._lock:
+            for job in self._jobs.values():
+                if job.status == FAILED:
+                    job.status, job.attempts, job.next_attempt_at = PENDING, 0, 0
+            self.save()
+
+    def names(self, status: str) -> list[str]:
+        return [job.name for job in self._jobs.values() if job.status == status]
+
+    def ready(self, now: float = None) -> list[str]:
+        """
+        Pending jobs whose backoff elapsed, in the order they were enqueued.
+        """
+        now = time() if now is None else now
+        return [
+            job.name
+            for job in self._jobs.values()
+            if job.status == PENDING and job.next_attempt_at <= now
+        ]
+
+    def next_attempt_at(self) -> float:
+        """
+        Time of the next pending job to become ready, or None if there is none.
+        """
+        pending = [
+            job.next_attempt_at for job in self._jobs.values() if job.status == PENDING
+        ]
+        return min(pending) if pending else None
+
+    def start(self, name: str):
+        with self._lock:
+            self._jobs[name].status = RUNNING
+            self.save()
+
+    def complete(self, name: str):
+        with self._lock:
+            job = self._jobs[name]
+            job.status, job.error = DONE, None
+            self.save()
+
+    def fail(self, name: str, error: BaseException):
+        """
+        Record a failed attempt, scheduling a retry after its backoff unless
+        the job ran out of attempts.
+        """
+        with self._lock:
+            job = self._jobs[name]
+            job.attempts += 1
+            job.error = f"{type(error).__name__}: {error}"
+            if job.attempts >= self.config.max_attempts:
+                job.status = FAILED
+                job.next_attempt_at = time() + MAX_BACKOFF_SECONDS
+            else:
+                job.status = PENDING
+                job.next_attempt_at = time() + backoff_seconds(
+                    job.attempts, self.config
+                )
+                metrics.count("retries", serie=name)
+            self.save()
+
+
+def run_jobs(
+    queue: JobQueue,
+    work: Callable[[str], Any],
+    timeout_in_minutes: float,
+    workers: int = 1,
+    executor: Callable[[int], Executor] = ThreadPoolExecutor,
+) -> list[Any]:
+    """
+    Run the ready jobs of a queue until it is empty or the timeout is reached.
+
+    A failed job is retried after its backoff, waiting for it while the
+    timeout allows, instead of aborting the other jobs. No job is started
+    after the timeout is reached, but the jobs already running are allowed
+    to finish.
+
+    Args:
+        queue (JobQueue): The jobs to run
+        work (Callable[[str], Any]): Runs a job given its name
+        timeout_in_minutes (float): Time budget of the run
+        workers (int, optional): Jobs run at a time, in the current thread
+            when 1. Defaults to 1.
+        executor (Callable[[int], Executor], optional): Pool running the jobs
+            given its number of workers. Defaults to ThreadPoolExecutor.
+
+    Returns:
+        list[Any]: The results of the completed jobs, in completion order
+    """
+    results = []
+    timeout = time() + 60 * timeout_in_minutes
+
+    def finish(name: str, run: Callable[[], Any]):
+        try:
+            result = run()
+        except Exception as error:
+            queue.fail(name, error)
+            logger.warning("Job %s failed: %s", name, error)
+            return
+        queue.complete(name)
+        results.append(result)
+
+    pool = executor(workers) if workers > 1 else None
+    running = {}
+    try:
+        while True:
+            for name in queue.ready():
+                if len(running) >= workers or time() > timeout:
+                    break
+                queue.start(name)
+                if pool is None:
+                    finish(name, lambda: work(name))
+                else:
+                    running[pool.submit(work, name)] = name
+
+            if running:
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    finish(running.pop(future), future.result)
+                continue
+
+            next_attempt_at = queue.next_attempt_at()
+            if next_attempt_at is None:
+                break
+            if time() > timeout or next_attempt_at > timeout:
+                pending = queue.names(PENDING)
+                logger.warning(
+                    "Timeout of %s minutes reached. Stopping.", timeout_in_minutes
+                )
+                metrics.count("files_skipped_by_timeout", len(pending))
+                break
+            sleep(max(next_attempt_at - time(), 0))
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    return results
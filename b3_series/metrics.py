@@ -0,0 +1,232 @@
+import json
+import logging
+import threading
+from contextlib import contextmanager
+from time import perf_counter, time
+from typing import Iterator
+
+from pydantic import BaseModel
+
+from b3_series.files import atomic_write
+
+SPAN = "span"
+COUNTER = "counter"
+GAUGE = "gauge"
+
+
+class RunReport(BaseModel):
+    stage: str
+    seconds: float = 0
+    completed: list[str] = []
+    remaining: list[str] = []
+    counters: dict[str, float] = {}
+
+
+class LoggingSink:
+    """
+    Log every event through the standard logging module.
+    """
+
+    def __init__(self, logger: logging.Logger = None, level: int = logging.INFO):
+        self.logger = logger or logging.getLogger("b3_series")
+        self.level = level
+
+    def emit(self, event: dict):
+        labels = " ".join(f"{key}={value}" for key, value in event["labels"].items())
+        if event["type"] == SPAN:
+            message = f"{event['name']} {labels} took {event['value']:.3f}s"
+        else:
+            message = f"{event['name']} {labels} {event['type']} {event['value']}"
+        self.logger.log(self.level, message)
+
+
+class JsonLinesSink:
+    """
+    Append every event as a JSON line to a file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def emit(self, event: dict):
+        line = json.dumps(event) + "\n"
+        with self._lock, open(self.path, "a") as f:
+            f.write(line)
+
+
+class PrometheusSink:
+    """
+    Keep a Prometheus text exposition file with the aggregated events.
+
+    Counters are exposed as totals, gauges with their last value and spans
+    as summaries of their durations. The file is rewritten atomically after
+    every event, as expected by the node exporter textfile collector. Labels
+    with one value per file, like serie, are dropped to keep the number of
+    time series bounded.
+    """
+
+    def __init__(self, path: str, prefix: str = "b3_series", ignore_labels=("serie",)):
+        self.path = path
+        self.prefix = prefix
+        self.ignore_labels = ignore_labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def emit(self, event: dict):
+        labels = tuple(
+            sorted(
+                (key, value)
+                for key, value in event["labels"].items()
+                if key not in self.ignore_labels
+            )
+        )
+        with self._lock:
+            if event["type"] == SPAN:
+                key = (f"{self.prefix}_{event['name']}_seconds", labels)
+                count, total = self._values.get(key, (0, 0))
+                self._values[key] = (count + 1, total + event["value"])
+            elif event["type"] == COUNTER:
+                key = (f"{self.prefix}_{event['name']}_total", labels)
+                self._values[key] = self._values.get(key, 0) + event["value"]
+            else:
+                self._values[(f"{self.prefix}_{event['name']}", labels)] = event[
+                    "value"
+                ]
+            self._write()
+
+    def _write(self):
+        lines = []
+        for (name, labels), value in sorted(self._values.items()):
+            text = ",".join(f'{key}="{label}"' for key, label in labels)
+            text = f"{{{text}}}" if text else ""
+            if isinstance(value, tuple):
+                lines.append(f"{name}_count{text} {value[0]}")
+                lines.append(f"{name}_sum{text} {value[1]}")
+            else:
+                lines.append(f"{name}{text} {value}")
+
+        with atomic_write(self.path) as partial:
+            partial.write_text("\n".join(lines) + "\n")
+
+
+class _Collector:
+    def __init__(self):
+        self.events = []
+
+    def emit(self, event: dict):
+        self.events.append(event)
+
+
+class Metrics:
+    """
+    Records spans, counters and gauges and forwards them to the sinks.
+
+    Counter totals are always kept, so run reports work without sinks; events
+    are only built for the sinks when at least one sink is configured.
+    """
+
+    def __init__(self):
+        self.sinks = []
+        self._totals = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+
+    def remove_sink(self, sink):
+        self.sinks.remove(sink)
+
+    def _emit(self, kind: str, name: str, value: float, labels: dict):
+        if kind == COUNTER:
+            with self._lock:
+                self._totals[name] = self._totals.get(name, 0) + value
+
+        collector = getattr(self._local, "collector", None)
+        sinks = self.sinks if collector is None else [collector]
+        if not sinks:
+            return
+
+        event = {
+            "type": kind,
+            "name": name,
+            "value": value,
+            "labels": labels,
+            "time": time(),
+        }
+        for sink in sinks:
+            sink.emit(event)
+
+    def count(self, name: str, value: float = 1, **labels):
+        self._emit(COUNTER, name, value, labels)
+
+    def gauge(self, name: str, value: float, **labels):
+        self._emit(GAUGE, name, value, labels)
+
+    @contextmanager
+    def span(self, name: str, **labels) -> Iterator[dict]:
+        """
+        Measure the duration of a block. Labels added to the yielded dict
+        inside the block are recorded with the span.
+        """
+        start_time = perf_counter()
+        try:
+            yield labels
+        finally:
+            self._emit(SPAN, name, perf_counter() - start_time, labels)
+
+    def totals(self) -> dict[str, float]:
+        with self._lock:
+            return dict(self._totals)
+
+    def reset(self):
+        """
+        Forget the counter totals recorded so far.
+        """
+        with self._lock:
+            self._totals = {}
+
+    @contextmanager
+    def collect(self) -> Iterator[list[dict]]:
+        """
+        Divert the events of a block into a list, to be replayed elsewhere.
+
+        Used by worker processes, whose events would otherwise be lost. Only
+        the events of the calling thread are diverted, so the other threads
+        keep emitting to the sinks.
+        """
+        previous, collector = getattr(self._local, "collector", None), _Collector()
+        self._local.collector = collector
+        try:
+            yield collector.events
+        finally:
+            self._local.collector = previous
+
+    def replay(self, events: list[dict]):
+        for event in events:
+            self._emit(event["type"], event["name"], event["value"], event["labels"])
+
+
+metrics = Metrics()
+
+
+@contextmanager
+def run_report(stage: str, **labels) -> Iterator[RunReport]:
+    """
+    Time a run and fill its report with the counters recorded meanwhile.
+    """
+    report = RunReport(stage=stage)
+    before = metrics.totals()
+    start_time = perf_counter()
+
+    with metrics.span(stage, **labels):
+        yield report
+
+    report.seconds = perf_counter() - start_time
+    after = metrics.totals()
+    report.counters = {
+        name: value - before.get(name, 0)
+        for name, value in after.items()
+        if value != before.get(name, 0)
+    }
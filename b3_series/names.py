@@ -0,0 +1,32 @@
+import re
+from pathlib import Path
+
+SERIE_PATTERN = re.compile(r"COTAHIST_(?P<kind>[ADM])(?P<period>\d+)", re.IGNORECASE)
+
+# annual files supersede monthly files, which supersede daily files
+SERIE_LEVELS = {"D": 1, "M": 2, "A": 3}
+
+
+def serie_stem(serie_name: str) -> str:
+    return Path(serie_name).stem.upper()
+
+
+def serie_level(serie_name: str) -> int:
+    match = SERIE_PATTERN.match(serie_stem(serie_name))
+    return SERIE_LEVELS[match.group("kind").upper()] if match else 0
+
+
+def superseding_stems(serie_name: str) -> list[str]:
+    """
+    Names of the series whose data include the data of the given series.
+    """
+    match = SERIE_PATTERN.match(serie_stem(serie_name))
+    if match is None:
+        return []
+
+    kind, period = match.group("kind").upper(), match.group("period")
+    if kind == "M":
+        return [f"COTAHIST_A{period[2:]}"]
+    if kind == "D":
+        return [f"COTAHIST_A{period[4:]}", f"COTAHIST_M{period[2:]}"]
+    return []
@@ -0,0 +1,430 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from b3_series.config import Config
+from b3_series.files import atomic_write, remove_files_except
+from b3_series.io import fingerprint_metadata, get_absolute_series_path, is_current
+from b3_series.metrics import metrics
+from b3_series.parquet import restore_text_columns, write_parquet_file
+from b3_series.schema import SCHEMA
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+OPTIONS_FOLDER = "options"
+OPTIONS_INDEX_FOLDER = "index"
+
+# calls and puts, and the cash market of their underlying stocks
+OPTION_MARKETS = [70, 80]
+UNDERLYING_MARKETS = [10]
+
+# records of an expiry are sorted so the records of a strike are contiguous
+OPTIONS_SORT_COLUMNS = [
+    "data_vencimento",
+    "ativo_objeto",
+    "preco_exercicio",
+    "sigla_acao",
+    "data_pregao",
+]
+OPTIONS_COLUMNS = list(SCHEMA.names) + ["ativo_objeto"]
+
+
+def get_options_path(config=Config()) -> str:
+    return get_absolute_series_path(OPTIONS_FOLDER, config)
+
+
+def _options_index_file(parquet_name: str, config=Config()) -> Path:
+    return Path(get_options_path(config)) / OPTIONS_INDEX_FOLDER / parquet_name
+
+
+def _partition_file(parquet_name: str, expiry, config=Config()) -> Path:
+    return Path(get_options_path(config)) / f"{expiry:%Y-%m-%d}" / parquet_name
+
+
+def has_options_index(parquet_name: str, config=Config()) -> bool:
+    import fastparquet
+
+    path = _options_index_file(parquet_name, config)
+    if not path.exists():
+        return False
+    return is_current(fastparquet.ParquetFile(str(path)), parquet_name, config)
+
+
+def map_underlyings(df: pd.DataFrame) -> pd.Series:
+    """
+    Underlying ticker of the option records of a series.
+
+    Options are named after the first four letters of their underlying
+    ticker, and their especificacao_papel starts with the share class of the
+    underlying (ON, PN, UNT...). Among the cash market tickers of the series
+    with the same root, the one with the same share class and the largest
+    volume is the underlying, or the one with the largest volume when no
+    share class matches. Options without any cash ticker, like index options,
+    are mapped to their root.
+
+    Returns:
+        pd.Series: The underlying tickers, indexed like the option records
+    """
+    import pandas as pd
+
+    tickers = df["sigla_acao"].astype(str).str.strip()
+    roots = tickers.str[:4]
+    kinds = df["especificacao_papel"].astype(str).str.split().str[0].fillna("")
+    is_option = df["tipo_mercado"].isin(OPTION_MARKETS).to_numpy()
+    is_cash = df["tipo_mercado"].isin(UNDERLYING_MARKETS).to_numpy()
+
+    cash = pd.DataFrame(
+        {
+            "root": roots[is_cash],
+            "kind": kinds[is_cash],
+            "ticker": tickers[is_cash],
+            "volume": df["volume_titulos_negociados"][is_cash].astype("float64"),
+        }
+    )
+    volumes = (
+        cash.groupby(["root", "kind", "ticker"])["volume"]
+        .sum()
+        .reset_index()
+        .sort_values(["volume", "ticker"], ascending=[False, True], kind="stable")
+    )
+    by_kind = volumes.drop_duplicates(["root", "kind"]).set_index(["root", "kind"])
+    by_root = (
+        volumes.groupby(["root", "ticker"], sort=False)["volume"]
+        .sum()
+        .reset_index()
+        .sort_values(["volume", "ticker"], ascending=[False, True], kind="stable")
+        .drop_duplicates("root")
+        .set_index("root")
+    )
+
+    option_roots, option_kinds = roots[is_option], kinds[is_option]
+    keys = pd.MultiIndex.from_arrays([option_roots, option_kinds])
+    underlyings = pd.Series(
+        by_kind["ticker"].reindex(keys).to_numpy(), index=option_roots.index
+    )
+    underlyings = underlyings.fillna(option_roots.map(by_root["ticker"]))
+    return underlyings.fillna(option_roots).astype(object)
+
+
+def extract_options(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Option records of a parsed series with their underlying ticker, as
+    ativo_objeto, sorted by OPTIONS_SORT_COLUMNS.
+
+    Records without an expiry date are dropped.
+    """
+    options = df[df["tipo_mercado"].isin(OPTION_MARKETS).to_numpy()].copy()
+    options["ativo_objeto"] = map_underlyings(df)
+    options = options[options["data_vencimento"].notna().to_numpy()]
+    return options.sort_values(OPTIONS_SORT_COLUMNS, kind="stable", ignore_index=True)
+
+
+def build_options_index(options: pd.DataFrame) -> pd.DataFrame:
+    """
+    Row ranges of each underlying and strike of the options of a series,
+    sorted by OPTIONS_SORT_COLUMNS.
+
+    Returns:
+        pd.DataFrame: One row per underlying, expiry and strike, with the
+            first (row_start) and past the last (row_stop) row of its records
+            in the partition file of its expiry and the first and last
+            trading dates of the range
+    """
+    import numpy as np
+    import pandas as pd
+
+    if options.empty:
+        return pd.DataFrame(
+            {
+                "ativo_objeto": pd.Series(dtype=object),
+                "data_vencimento": pd.Series(dtype="datetime64[ns]"),
+                "preco_exercicio": pd.Series(dtype="float64"),
+                "row_start": pd.Series(dtype="int64"),
+                "row_stop": pd.Series(dtype="int64"),
+                "first_date": pd.Series(dtype="datetime64[ns]"),
+                "last_date": pd.Series(dtype="datetime64[ns]"),
+            }
+        )
+
+    expiries = options["data_vencimento"].to_numpy()
+    underlyings = options["ativo_objeto"].to_numpy(dtype=object)
+    strikes = options["preco_exercicio"].to_numpy()
+    changed = (
+        (expiries[1:] != expiries[:-1])
+        | (underlyings[1:] != underlyings[:-1])
+        | (strikes[1:] != strikes[:-1])
+    )
+    starts = np.concatenate([[0], np.flatnonzero(changed) + 1])
+    stops = np.append(starts[1:], len(options))
+
+    # every expiry has its own file, so the ranges start at its first row
+    offsets = np.searchsorted(expiries, expiries[starts], side="left")
+
+    dates = options["data_pregao"].to_numpy()
+    return pd.DataFrame(
+        {
+            "ativo_objeto": underlyings[starts],
+            "data_vencimento": expiries[starts],
+            "preco_exercicio": strikes[starts],
+            "row_start": (starts - offsets).astype("int64"),
+            "row_stop": (stops - offsets).astype("int64"),
+            "first_date": np.minimum.reduceat(dates, starts),
+            "last_date": np.maximum.reduceat(dates, starts),
+        }
+    )
+
+
+def _remove_partitions(parquet_name: str, config=Config()):
+    # empty partition folders are left for remove_options, as other
+    # conversions running meanwhile may be writing to them
+    for path in Path(get_options_path(config)).glob(f"*/{parquet_name}"):
+        if path.parent.name != OPTIONS_INDEX_FOLDER:
+            path.unlink()
+
+
+def write_options(parquet_name: str, df: pd.DataFrame, config=Config()) -> int:
+    """
+    Write the options of a converted parquet file to the options store.
+
+    The options are partitioned by expiry, with one file per expiry and
+    parquet file under options/<expiry>, so converting a series never
+    rewrites the options of the other series. The index of the series gives
+    the rows of each underlying and strike in these files, and records the
+    fingerprint of the parquet file, so the options left behind by a replaced
+    parquet file are ignored. The index is removed before the partition files
+    and written after them, so an interrupted write leaves the series without
+    an index, read whole until it is converted again.
+
+    Args:
+        parquet_name (str): Name of the parquet file
+        df (pd.DataFrame): The records written to it
+        config (Config, optional): Storage settings
+
+    Returns:
+        int: Number of option records written
+    """
+    import fastparquet
+
+    options = extract_options(df)
+    index_path = _options_index_file(parquet_name, config)
+    index_path.unlink(missing_ok=True)
+    _remove_partitions(parquet_name, config)
+
+    for expiry, partition in options.groupby("data_vencimento", sort=True):
+        path = _partition_file(parquet_name, expiry, config)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with atomic_write(path) as partial:
+            write_parquet_file(str(partial), partition, config)
+
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    with atomic_write(index_path) as partial:
+        fastparquet.write(
+            str(partial),
+            build_options_index(options),
+            compression="gzip",
+            write_index=False,
+            custom_metadata=fingerprint_metadata(parquet_name, config),
+        )
+
+    metrics.count("option_rows_written", len(options))
+    return len(options)
+
+
+def remove_options(parquet_names: list[str], config=Config()) -> list[str]:
+    """
+    Remove the options of parquet files other than the given ones.
+
+    Returns:
+        list[str]: Names of the parquet files whose options were removed
+    """
+    folder = Path(get_options_path(config))
+    if not folder.exists():
+        return []
+
+    removed = remove_files_except(folder, parquet_names, "*/*.parquet")
+
+    for partition in folder.iterdir():
+        if partition.is_dir() and partition.name != OPTIONS_INDEX_FOLDER:
+            if not any(partition.iterdir()):
+                partition.rmdir()
+
+    return sorted(set(removed))
+
+
+def read_options_index(
+    parquet_name: str,
+    underlyings: list[str] = None,
+    expiries: list = None,
+    config=Config(),
+) -> pd.DataFrame:
+    """
+    Row ranges of the options of the given underlyings and expiries of a
+    parquet file.
+
+    Returns:
+        pd.DataFrame: The matching rows of the index, or None if the parquet
+            file has no options index or was replaced since it was indexed
+    """
+    import fastparquet
+    import pandas as pd
+
+    path = _options_index_file(parquet_name, config)
+    if not path.exists():
+        return None
+
+    index_file = fastparquet.ParquetFile(str(path))
+    if not is_current(index_file, parquet_name, config):
+        return None
+
+    index = index_file.to_pandas(index=False)
+    if underlyings is not None:
+        index = index[index["ativo_objeto"].isin(underlyings)]
+    if expiries is not None:
+        expiries = [pd.Timestamp(expiry) for expiry in expiries]
+        index = index[index["data_vencimento"].isin(expiries)]
+    return index
+
+
+def _read_options(
+    serie: str, ranges: pd.DataFrame, columns: list[str], config=Config()
+) -> pd.DataFrame:
+    """
+    Read the option records in the given index ranges of a parquet file,
+    opening only the partition files of their expiries.
+    """
+    import fastparquet
+    import pandas as pd
+
+    from b3_series.query import read_row_ranges
+
+    frames = []
+    for expiry, expiry_ranges in ranges.groupby("data_vencimento", sort=True):
+        path = _partition_file(serie, expiry, config)
+        parquet_file = fastparquet.ParquetFile(str(path))
+        frames.append(read_row_ranges(parquet_file, expiry_ranges, columns))
+
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    return pd.concat(frames, ignore_index=True)
+
+
+def load_options(
+    underlyings: list[str] = None,
+    expiries: list = None,
+    start=None,
+    end=None,
+    min_strike: float = None,
+    max_strike: float = None,
+    columns: list[str] = None,
+    config=Config(),
+) -> pd.DataFrame:
+    """
+    Load the option records matching the given filters from the options store.
+
+    The options index of each parquet file gives the rows of every
+    underlying, expiry and strike, so only the partition files of the
+    matching expiries are opened and only the row groups holding the
+    matching strikes are read. Parquet files without a valid options index
+    are read whole instead.
+
+    Args:
+        underlyings (list[str], optional): Tickers of the underlying assets
+        expiries (list, optional): Expiry dates to load
+        start (optional): First trading date to load, inclusive
+        end (optional): Last trading date to load, inclusive
+        min_strike (float, optional): Lowest strike to load, inclusive
+        max_strike (float, optional): Highest strike to load, inclusive
+        columns (list[str], optional): Columns to load. Defaults to all the
+            columns of the series and ativo_objeto.
+        config (Config, optional): Storage settings
+
+    Returns:
+        pd.DataFrame: The matching records, sorted by trading date, expiry,
+            strike, market and ticker
+    """
+    import fastparquet
+    import pandas as pd
+
+    from b3_series.query import select_series, to_date
+
+    start, end = to_date(start), to_date(end)
+    if expiries is not None:
+        expiries = [pd.Timestamp(expiry) for expiry in expiries]
+    columns = columns or list(OPTIONS_COLUMNS)
+    sort_columns = [
+        "data_pregao",
+        "data_vencimento",
+        "preco_exercicio",
+        "tipo_mercado",
+        "sigla_acao",
+    ]
+    read_columns = columns + [name for name in sort_columns if name not in columns]
+    read_columns += [name for name in ["ativo_objeto"] if name not in read_columns]
+
+    with metrics.span("options_load"):
+        frames = []
+        for serie in select_series(start, end, config):
+            ranges = read_options_index(serie, underlyings, expiries, config)
+
+            if ranges is not None:
+                if start is not None:
+                    ranges = ranges[ranges["last_date"] >= pd.Timestamp(start)]
+                if end is not None:
+                    ranges = ranges[ranges["first_date"] <= pd.Timestamp(end)]
+                if min_strike is not None:
+                    ranges = ranges[ranges["preco_exercicio"] >= min_strike]
+                if max_strike is not None:
+                    ranges = ranges[ranges["preco_exercicio"] <= max_strike]
+                df = _read_options(serie, ranges, read_columns, config)
+            else:
+                parquet_file = fastparquet.ParquetFile(
+                    get_absolute_series_path(serie, config)
+                )
+                df = extract_options(parquet_file.to_pandas(index=False))
+                if underlyings is not None:
+                    df = df[df["ativo_objeto"].isin(underlyings)]
+                if expiries is not None:
+                    df = df[df["data_vencimento"].isin(expiries)]
+                if min_strike is not None:
+                    df = df[df["preco_exercicio"] >= min_strike]
+                if max_strike is not None:
+                    df = df[df["preco_exercicio"] <= max_strike]
+
+            mask = pd.Series(True, index=df.index)
+            if start is not None:
+                mask &= df["data_pregao"] >= pd.Timestamp(start)
+            if end is not None:
+                mask &= df["data_pregao"] <= pd.Timestamp(end)
+            frames.append(df.loc[mask, read_columns])
+
+        if not frames:
+            return pd.DataFrame(columns=columns)
+
+        df = restore_text_columns(pd.concat(frames, ignore_index=True), config)
+        df = df.sort_values(sort_columns, kind="stable", ignore_index=True)
+
+    metrics.count("option_rows_loaded", len(df))
+    return df[columns]
+
+
+def option_chain(
+    underlying: str, day, expiries: list = None, config=Config()
+) -> pd.DataFrame:
+    """
+    Snapshot of the options chain of an underlying on a trading date.
+
+    Args:
+        underlying (str): Ticker of the underlying asset, as PETR4
+        day: Trading date of the snapshot
+        expiries (list, optional): Expiry dates to load. Defaults to all.
+        config (Config, optional): Storage settings
+
+    Returns:
+        pd.DataFrame: The options traded on that date, sorted by expiry,
+            strike, market (calls before puts) and ticker
+    """
+    return load_options(
+        [underlying], expiries, start=day, end=day, config=config
+    ).reset_index(drop=True)
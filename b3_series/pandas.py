@@ -1,10 +1,57 @@
+import zipfile
 from datetime import datetime
+from types import MappingProxyType
+from typing import Iterator
 
+import numpy as np
 import pandas as pd
 
+from b3_series.schema import ENCODING, PARSER_VERSION, RECORD_LENGTH, SCHEMA  # noqa
+from b3_series.validation import SeriesValidator
 
-def empty_dataframe() -> pd.DataFrame:
-    return pd.DataFrame(columns=[column["name"] for column in dataframe_columns()])
+
+def dataframe_columns() -> list[dict]:
+    """
+    Columns of the B3 public data files.
+
+    Kept for compatibility, the parsers use the precompiled schema.SCHEMA.
+
+    Returns:
+        list[dict]: List of columns
+            Each element of the list is a dict with the following keys:
+                - name: Name of the column
+                - description: Description of the column
+                - type: Type of the column
+                - tuple: Tuple with the start and end positions of the column
+    """
+    return [
+        {
+            "name": column.name,
+            "description": column.description,
+            "type": column.type,
+            "tuple": (column.start, column.end),
+        }
+        for column in SCHEMA.columns
+    ]
+
+
+def compact_dtypes() -> dict[str, str]:
+    """
+    Compact dtypes of the columns of the B3 public data files.
+
+    Text columns are categorical, integer columns use the smallest nullable
+    integer type for their width and prices are nullable int64 fixed-point
+    values in cents.
+
+    Returns:
+        dict[str, str]: The dtype of each column
+    """
+    return dict(SCHEMA.compact_dtypes)
+
+
+def empty_dataframe(compact: bool = False) -> pd.DataFrame:
+    dtypes = SCHEMA.compact_dtypes if compact else SCHEMA.dtypes
+    return pd.DataFrame(columns=list(dtypes)).astype(dict(dtypes))
 
 
 def _parse_date(date: str) -> datetime:
@@ -17,212 +64,379 @@ def _parse_date(date: str) -> datetime:
         return None
 
 
-def load_compressed_series(path: str) -> pd.DataFrame:
-    names = []
-    colspecs = []
-    for column in dataframe_columns():
-        names.append(column["name"])
-        colspecs.append(column["tuple"])
+def _parse_price(price: str) -> float:
+    return float(price) / 100
+
+
+_DAYS_IN_MONTH = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+# read_fwf converters of the legacy engine
+_FWF_CONVERTERS = MappingProxyType(
+    {
+        "codigo_negociacao": str.strip,
+        "nome_resumido": str.strip,
+        "especificacao_papel": str.strip,
+        "indicador_correcao_preco": str.strip,
+        "codigo_isin": str.strip,
+        "data_pregao": _parse_date,
+        "data_vencimento": _parse_date,
+        **{
+            column.name: _parse_price
+            for column in SCHEMA.columns
+            if column.type == "float"
+        },
+    }
+)
+
+
+def _compressed_member(zip_file: zipfile.ZipFile, path: str) -> str:
+    """
+    Name of the single member of a B3 zip file.
+    """
+    members = zip_file.namelist()
+    if len(members) != 1:
+        raise ValueError(
+            f"Expected a single file in ZIP file {path}, found {len(members)}"
+        )
+    return members[0]
+
+
+def _read_compressed_content(path: str) -> bytes:
+    """
+    Read the decompressed content of the single member of a B3 zip file.
+    """
+    with zipfile.ZipFile(path) as zip_file:
+        return zip_file.read(_compressed_member(zip_file, path))
+
+
+def _records_and_lengths(content: bytes) -> tuple[np.ndarray, np.ndarray]:
+    """
+    View the records of a B3 file as a fixed-width (n x RECORD_LENGTH) byte
+    matrix, along with the length of each record without its line break.
+
+    Files with uniform line endings are viewed in place, without copying.
+    Anything else (missing final line break, short or long lines) falls back
+    to splitting the lines and padding them to the record length.
+    """
+    line_break = content.find(b"\n")
+    stride = line_break + 1 if line_break >= 0 else len(content)
+
+    if stride > RECORD_LENGTH and len(content) % stride == 0:
+        buffer = np.frombuffer(content, dtype=np.uint8).reshape(-1, stride)
+        if (buffer[:, -1] == ord("\n")).all():
+            lengths = stride - 1 - (buffer[:, -2] == ord("\r"))
+            return buffer[:, :RECORD_LENGTH], lengths
+
+    lines = [line for line in content.splitlines() if line]
+    records = b"".join(line.ljust(RECORD_LENGTH)[:RECORD_LENGTH] for line in lines)
+    return (
+        np.frombuffer(records, dtype=np.uint8).reshape(-1, RECORD_LENGTH),
+        np.array([len(line) for line in lines], dtype=np.int64),
+    )
+
+
+def _records_buffer(content: bytes) -> np.ndarray:
+    """
+    View the records of a B3 file as a fixed-width (n x RECORD_LENGTH) byte matrix.
+    """
+    return _records_and_lengths(content)[0]
+
+
+def _parse_integers(field: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Parse a zero-padded numeric field into int64 values.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: The parsed values and a mask of blank fields
+    """
+    blank = field.T == ord(" ")
+    digits = field.T - ord("0")
+    digits[blank] = 0
+
+    values = np.zeros(len(field), dtype=np.int64)
+    for position in digits:
+        values *= 10
+        values += position
+
+    return values, blank.all(axis=0)
+
+
+def _valid_dates(year: np.ndarray, month: np.ndarray, day: np.ndarray) -> np.ndarray:
+    """
+    Mask of the year, month and day values that are calendar dates.
+    """
+    valid = (month >= 1) & (month <= 12) & (day >= 1)
+
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    days_in_month = _DAYS_IN_MONTH[np.clip(month, 1, 12) - 1] + (leap & (month == 2))
+    return valid & (day <= days_in_month)
+
+
+def _parse_dates(values: np.ndarray) -> np.ndarray:
+    """
+    Vectorized counterpart of _parse_date for YYYYMMDD integers.
+    """
+    year, month, day = values // 10000, values // 100 % 100, values % 100
+    valid = (values != 0) & (values != 99991231) & _valid_dates(year, month, day)
+
+    dates = (year - 1970).astype("datetime64[Y]").astype("datetime64[M]")
+    dates = (dates + (month - 1)).astype("datetime64[D]") + (day - 1)
+    dates = dates.astype("datetime64[ns]")
+    dates[~valid] = np.datetime64("NaT")
+
+    return dates
+
+
+def _parse_strings(field: np.ndarray, categorical: bool = False):
+    """
+    Decode and strip a fixed-width text field.
+
+    Text columns have few distinct values, so only the distinct values are
+    decoded and the result shares one string object per distinct value.
+    """
+    raw = np.ascontiguousarray(field).view(f"S{field.shape[1]}").ravel()
+    codes, uniques = pd.factorize(raw)
+    decoded = np.array([value.decode(ENCODING).strip() for value in uniques])
+
+    if categorical:
+        categories, positions = np.unique(decoded, return_inverse=True)
+        return pd.Categorical.from_codes(positions[codes], categories.astype(object))
+
+    return decoded.astype(object)[codes]
+
+
+def _parse_records(
+    records: np.ndarray,
+    nullable: bool = False,
+    compact: bool = False,
+    lengths: np.ndarray = None,
+    validator: SeriesValidator = None,
+) -> pd.DataFrame:
+    """
+    Parse a fixed-width record matrix into a DataFrame, one column at a time.
+
+    Only quotation records (tipo_registro 01) are kept; the header (00) and
+    trailer (99) records are dropped.
+
+    Integer columns with blank fields become float64 with NaN, like read_fwf
+    does. With nullable=True every integer column is a nullable Int64 column
+    instead, so the dtypes do not depend on the records being parsed. With
+    compact=True the columns follow compact_dtypes().
+
+    With a validator, the records are checked while they are parsed, from
+    their lengths and from the parsed dates and prices, and the invalid
+    records are left out.
+    """
+    if validator is None:
+        records = records[(records[:, 0] == ord("0")) & (records[:, 1] == ord("1"))]
+    else:
+        valid, numbers = validator.check_layout(records, lengths)
+        records, numbers = records[valid], numbers[valid]
+
+    data = {}
+    fields = {}
+    for column in SCHEMA.columns:
+        field = records[:, column.start : column.end]
+
+        if column.type == "str":
+            data[column.name] = _parse_strings(field, categorical=compact)
+            continue
+
+        values, blank = _parse_integers(field)
+        if validator is not None and column.type in ("date", "float"):
+            fields[column.name] = (values, blank)
+        if compact and column.type != "date":
+            dtype = np.dtype(SCHEMA.compact_dtypes[column.name].lower())
+            data[column.name] = pd.arrays.IntegerArray(values.astype(dtype), blank)
+        elif column.type == "date":
+            data[column.name] = _parse_dates(values)
+        elif column.type == "float":
+            prices = values / 100
+            prices[blank] = np.nan
+            data[column.name] = prices
+        elif nullable:
+            data[column.name] = pd.arrays.IntegerArray(values, blank)
+        elif blank.any():
+            data[column.name] = np.where(blank, np.nan, values)
+        else:
+            data[column.name] = values
+
+    if validator is not None:
+        valid = validator.check_values(records, numbers, data, fields)
+        if not valid.all():
+            data = {name: values[valid] for name, values in data.items()}
+
+    return pd.DataFrame(data)
+
 
+def _load_compressed_series_fwf(path: str) -> pd.DataFrame:
     return pd.read_fwf(
         path,
         compression="zip",
-        colspecs=colspecs,
-        names=names,
+        colspecs=list(SCHEMA.colspecs),
+        names=list(SCHEMA.names),
         skiprows=1,
         decimal=",",
         thousands=".",
         skipfooter=1,
-        converters={
-            "codigo_negociacao": lambda x: x.strip(),
-            "nome_resumido": lambda x: x.strip(),
-            "especificacao_papel": lambda x: x.strip(),
-            "indicador_correcao_preco": lambda x: x.strip(),
-            "codigo_isin": lambda x: x.strip(),
-            "data_pregao": _parse_date,
-            "data_vencimento": _parse_date,
-            "preco_abertura": lambda x: float(x) / 100,
-            "preco_maximo": lambda x: float(x) / 100,
-            "preco_minimo": lambda x: float(x) / 100,
-            "preco_medio": lambda x: float(x) / 100,
-            "preco_ultimo": lambda x: float(x) / 100,
-            "preco_melhor_oferta_compra": lambda x: float(x) / 100,
-            "preco_melhor_oferta_venda": lambda x: float(x) / 100,
-            "preco_exercicio": lambda x: float(x) / 100,
-            "preco_pontos": lambda x: float(x) / 100,
-            "volume_titulos_negociados": lambda x: float(x) / 100,
-        },
-        encoding="ISO-8859-1",
+        converters=dict(_FWF_CONVERTERS),
+        encoding=ENCODING,
     )
 
 
-def dataframe_columns() -> list[dict]:
+def load_compressed_series(
+    path: str,
+    engine: str = "numpy",
+    compact: bool = False,
+    validator: SeriesValidator = None,
+) -> pd.DataFrame:
     """
-    Columns of the B3 public data files.
+    Load a compressed B3 series file into a DataFrame.
+
+    Args:
+        path (str): Path of the zip file
+        engine (str, optional): Parser engine. Defaults to "numpy".
+            - numpy: vectorized parser over the fixed-width record buffer
+            - fwf: pandas read_fwf with per-cell converters (legacy)
+        compact (bool, optional): Use the compact_dtypes() schema, with prices
+            in cents. Only supported by the numpy engine. Defaults to False.
+        validator (SeriesValidator, optional): Validator checking the records
+            while they are parsed, see SeriesValidator. Only supported by the
+            numpy engine.
 
     Returns:
-        list[dict]: List of columns
-            Each element of the list is a dict with the following keys:
-                - name: Name of the column
-                - description: Description of the column
-                - type: Type of the column
-                - tuple: Tuple with the start and end positions of the column
+        pd.DataFrame: The quotation records of the series, without the
+            invalid ones when validated
     """
-    return [
-        {
-            "name": "tipo_registro",
-            "description": "Tipo de registro",
-            "type": "int",
-            "tuple": (0, 2),
-        },
-        {
-            "name": "data_pregao",
-            "description": "Data do pregão",
-            "type": "date",
-            "tuple": (2, 10),
-        },
-        {
-            "name": "codbdi",
-            "description": "Código BDI",
-            "type": "int",
-            "tuple": (10, 12),
-        },
-        {
-            "name": "sigla_acao",
-            "description": "Sigla da ação",
-            "type": "str",
-            "tuple": (12, 24),
-        },
-        {
-            "name": "tipo_mercado",
-            "description": "Tipo de mercado",
-            "type": "str",
-            "tuple": (24, 27),
-        },
-        {
-            "name": "nome_resumido",
-            "description": "Nome resumido da empresa emissora do papel",
-            "type": "str",
-            "tuple": (27, 39),
-        },
-        {
-            "name": "especificacao_papel",
-            "description": "Especificação do papel",
-            "type": "str",
-            "tuple": (39, 49),
-        },
-        {
-            "name": "prazo_termo",
-            "description": "Prazo em dias do termo",
-            "type": "int",
-            "tuple": (49, 52),
-        },
-        {
-            "name": "moeda",
-            "description": "Moeda de referência em reais ou dólares",
-            "type": "str",
-            "tuple": (52, 56),
-        },
-        {
-            "name": "preco_abertura",
-            "description": "Preço de abertura do papel-mercado no pregão",
-            "type": "float",
-            "tuple": (56, 69),
-        },
-        {
-            "name": "preco_maximo",
-            "description": "Preço máximo do papel-mercado no pregão",
-            "type": "float",
-            "tuple": (69, 82),
-        },
-        {
-            "name": "preco_minimo",
-            "description": "Preço mínimo do papel-mercado no pregão",
-            "type": "float",
-            "tuple": (82, 95),
-        },
-        {
-            "name": "preco_medio",
-            "description": "Preço médio do papel-mercado no pregão",
-            "type": "float",
-            "tuple": (95, 108),
-        },
-        {
-            "name": "preco_ultimo",
-            "description": "Preço do último negócio do papel-mercado no pregão",
-            "type": "float",
-            "tuple": (108, 121),
-        },
-        {
-            "name": "preco_melhor_oferta_compra",
-            "description": "Preço da melhor oferta de compra do papel-mercado no pregão",
-            "type": "float",
-            "tuple": (121, 134),
-        },
-        {
-            "name": "preco_melhor_oferta_venda",
-            "description": "Preço da melhor oferta de venda do papel-mercado no pregão",
-            "type": "float",
-            "tuple": (134, 147),
-        },
-        {
-            "name": "numero_negocios",
-            "description": "Número de negócios efetuados com o papel-mercado no pregão",
-            "type": "int",
-            "tuple": (147, 152),
-        },
-        {
-            "name": "quantidade_titulos_negociados",
-            "description": "Quantidade total de títulos negociados neste papel-mercado",
-            "type": "int",
-            "tuple": (152, 170),
-        },
-        {
-            "name": "volume_titulos_negociados",
-            "description": "Volume total de títulos negociados neste papel-mercado",
-            "type": "float",
-            "tuple": (170, 188),
-        },
-        {
-            "name": "preco_exercicio",
-            "description": "Preço de exercício para o mercado de opções ou valor do contrato para o mercado de termo secundário",
-            "type": "float",
-            "tuple": (188, 201),
-        },
-        {
-            "name": "indicador_correcao_preco",
-            "description": "Indicador de correção de preços de exercícios ou valores de contrato para os mercados de opções ou termo secundário",
-            "type": "str",
-            "tuple": (201, 202),
-        },
-        {
-            "name": "data_vencimento",
-            "description": "Data do vencimento para os mercados de opções ou termo secundário",
-            "type": "date",
-            "tuple": (202, 210),
-        },
-        {
-            "name": "fator_cotacao",
-            "description": "Fator de cotação do papel",
-            "type": "int",
-            "tuple": (210, 217),
-        },
-        {
-            "name": "preco_pontos",
-            "description": "Preço de pontos do papel",
-            "type": "float",
-            "tuple": (217, 230),
-        },
-        {
-            "name": "codigo_isin",
-            "description": "Código do papel no sistema ISIN ou código interno do papel",
-            "type": "str",
-            "tuple": (230, 242),
-        },
-        {
-            "name": "numero_distribuicao",
-            "description": "Número de distribuição do papel",
-            "type": "int",
-            "tuple": (242, 245),
-        },
-    ]
+    if engine == "fwf":
+        if compact or validator is not None:
+            option = "compact" if compact else "validator"
+            raise ValueError(f"The {option} option requires the numpy engine, not fwf")
+        return _load_compressed_series_fwf(path)
+    if engine != "numpy":
+        raise ValueError(f"Unknown engine {engine}")
+
+    records, lengths = _records_and_lengths(_read_compressed_content(path))
+    return _parse_records(
+        records, compact=compact, lengths=lengths, validator=validator
+    )
+
+
+class SeriesStreamParser:
+    """
+    Parse the decompressed content of a B3 series as it arrives.
+
+    Content is fed in blocks of any size, and is parsed in chunks of
+    chunk_rows records as soon as they are complete, so a series can be
+    parsed while it is downloaded or decompressed.
+
+    Args:
+        chunk_rows (int, optional): Records per chunk. Defaults to 100_000.
+        nullable (bool, optional): Parse integer columns as nullable Int64,
+            see _parse_records. Defaults to False.
+        compact (bool, optional): Use the compact_dtypes() schema. Categories
+            are built per chunk. Defaults to False.
+        validator (SeriesValidator, optional): Validator checking the records
+            while they are parsed. Call its finish() once the parser is closed.
+    """
+
+    def __init__(
+        self,
+        chunk_rows: int = 100_000,
+        nullable: bool = False,
+        compact: bool = False,
+        validator: SeriesValidator = None,
+    ):
+        self.chunk_rows = chunk_rows
+        self.nullable = nullable
+        self.compact = compact
+        self.validator = validator
+        self._buffer = bytearray()
+        self._record_size = None
+
+    def _parse(self, content: bytes) -> list[pd.DataFrame]:
+        records, lengths = _records_and_lengths(content)
+        df = _parse_records(
+            records,
+            nullable=self.nullable,
+            compact=self.compact,
+            lengths=lengths,
+            validator=self.validator,
+        )
+        return [df] if len(df) else []
+
+    def feed(self, content: bytes) -> list[pd.DataFrame]:
+        """
+        Feed the next block of content.
+
+        Returns:
+            list[pd.DataFrame]: The chunks completed by the block
+        """
+        self._buffer += content
+        if self._record_size is None:
+            line_break = self._buffer.find(b"\n")
+            if line_break < 0 and len(self._buffer) < 2 * RECORD_LENGTH:
+                return []
+            self._record_size = line_break + 1 or RECORD_LENGTH + 2
+
+        chunk_size = self.chunk_rows * self._record_size
+        frames = []
+        while len(self._buffer) >= chunk_size:
+            end = self._buffer.rfind(b"\n", 0, chunk_size) + 1 or chunk_size
+            frames += self._parse(bytes(self._buffer[:end]))
+            del self._buffer[:end]
+
+        return frames
+
+    def close(self) -> list[pd.DataFrame]:
+        """
+        Parse the records left, including a last record without line break.
+
+        Returns:
+            list[pd.DataFrame]: The last chunks
+        """
+        content, self._buffer = bytes(self._buffer), bytearray()
+        end = content.rfind(b"\n") + 1
+        frames = self._parse(content[:end]) if end else []
+        if content[end:].strip():
+            frames += self._parse(content[end:])
+        return frames
+
+
+def iter_compressed_series(
+    path: str,
+    chunk_rows: int = 100_000,
+    compact: bool = False,
+    validator: SeriesValidator = None,
+) -> Iterator[pd.DataFrame]:
+    """
+    Stream a compressed B3 series file in chunks of quotation records.
+
+    The records are decompressed straight from the zip member, so memory
+    usage depends on chunk_rows and not on the size of the file. Header (00)
+    and trailer (99) records are recognized by their record type, so a
+    truncated file without trailer keeps its last quotation.
+
+    Args:
+        path (str): Path of the zip file
+        chunk_rows (int, optional): Records per chunk. Defaults to 100_000.
+        compact (bool, optional): Use the compact_dtypes() schema. Categories
+            are built per chunk. Defaults to False.
+        validator (SeriesValidator, optional): Validator checking the records
+            while they are parsed, see SeriesValidator.
+
+    Yields:
+        pd.DataFrame: Chunks with the columns of load_compressed_series and
+            nullable Int64 integer columns, so every chunk has the same dtypes
+    """
+    parser = SeriesStreamParser(
+        chunk_rows, nullable=True, compact=compact, validator=validator
+    )
+
+    with zipfile.ZipFile(path) as zip_file:
+        with zip_file.open(_compressed_member(zip_file, path)) as stream:
+            block_size = chunk_rows * (RECORD_LENGTH + 2)
+            for block in iter(lambda: stream.read(block_size), b""):
+                yield from parser.feed(block)
+
+    yield from parser.close()
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+from b3_series.config import Config
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+PARQUET_ENGINES = ["fastparquet", "pyarrow"]
+PARQUET_CODECS = ["gzip", "snappy", "zstd", "lz4", None]
+
+
+def _fastparquet_compression(
+    codec: str, level: int = None, categorical_columns: list[str] = ()
+):
+    """
+    Compression argument of fastparquet.write for a codec and level.
+
+    The Parquet LZ4 codec is the deprecated Hadoop framing, so LZ4 blocks are
+    written as LZ4_RAW, the codec pyarrow writes too. fastparquet cannot
+    compress the dictionary pages of categorical columns with a level, so
+    these columns are compressed with the default level.
+    """
+    if codec is None:
+        return None
+
+    name = "LZ4_RAW" if codec == "lz4" else codec.upper()
+    if level is None:
+        return name
+    if codec == "gzip":
+        args = {"compresslevel": level}
+    elif codec == "zstd":
+        args = {"level": level}
+    elif codec == "lz4":
+        args = {"mode": "high_compression", "compression": level}
+    else:
+        raise ValueError(f"The {codec} codec has no compression level")
+
+    compression = {column: name for column in categorical_columns}
+    compression["_default"] = {"type": name, "args": args}
+    return compression
+
+
+def _write_with_fastparquet(
+    path: str, df: pd.DataFrame, config: Config, custom_metadata: dict
+):
+    import fastparquet
+
+    if config.parquet_dictionary:
+        # fastparquet only dictionary-encodes categorical columns, so they are
+        # read back as categoricals, see restore_text_columns
+        text_columns = df.select_dtypes(include="object").columns
+        df = df.astype({column: "category" for column in text_columns})
+
+    categorical_columns = df.select_dtypes(include="category").columns
+    fastparquet.write(
+        path,
+        df,
+        compression=_fastparquet_compression(
+            config.parquet_codec, config.parquet_codec_level, categorical_columns
+        ),
+        row_group_offsets=config.row_group_size,
+        stats=True,
+        write_index=False,
+        custom_metadata=custom_metadata,
+    )
+
+
+def _write_with_pyarrow(
+    path: str, df: pd.DataFrame, config: Config, custom_metadata: dict
+):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # fastparquet cannot read the dictionary pages pyarrow writes for
+    # all-null numeric columns, so only the text columns are dictionary-encoded,
+    # and categorical columns always are so they are read back as categoricals
+    dictionary_dtypes = ["category"]
+    if config.parquet_dictionary is not False:
+        dictionary_dtypes.append("object")
+    use_dictionary = list(df.select_dtypes(include=dictionary_dtypes))
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    if custom_metadata:
+        metadata = dict(table.schema.metadata or {})
+        metadata.update(
+            {key.encode(): value.encode() for key, value in custom_metadata.items()}
+        )
+        table = table.replace_schema_metadata(metadata)
+
+    pq.write_table(
+        table,
+        path,
+        compression=config.parquet_codec or "none",
+        compression_level=config.parquet_codec_level,
+        row_group_size=config.row_group_size,
+        use_dictionary=use_dictionary,
+        write_statistics=True,
+    )
+
+
+def write_parquet_file(
+    path: str, df: pd.DataFrame, config=Config(), custom_metadata: dict = None
+):
+    """
+    Write a DataFrame as a parquet file with the writer settings of the config.
+
+    The engine, codec and level, row group size and dictionary encoding are
+    taken from config.parquet_engine, config.parquet_codec,
+    config.parquet_codec_level, config.row_group_size and
+    config.parquet_dictionary. Files written by either engine are read back
+    with fastparquet, keeping their custom metadata. Text columns
+    dictionary-encoded by fastparquet are read back as categoricals.
+
+    Args:
+        path (str): Path of the parquet file
+        df (pd.DataFrame): The records to write, without index
+        config (Config, optional): Writer settings
+        custom_metadata (dict, optional): Key-value metadata of the file
+    """
+    if config.parquet_engine == "pyarrow":
+        _write_with_pyarrow(path, df, config, custom_metadata)
+    else:
+        _write_with_fastparquet(path, df, config, custom_metadata)
+
+
+def restore_text_columns(df: pd.DataFrame, config=Config()) -> pd.DataFrame:
+    """
+    Cast back to object the text columns read as categoricals from files
+    written by fastparquet with config.parquet_dictionary, so queries return
+    the same dtypes whatever the writer settings. The categorical columns of
+    the compact schema are kept.
+    """
+    if config.compact_schema:
+        return df
+    categorical_columns = df.select_dtypes(include="category").columns
+    return df.astype({column: object for column in categorical_columns})
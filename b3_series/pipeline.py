@@ -0,0 +1,83 @@
+import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from time import time
+
+from b3_series.config import Config
+from b3_series.io import require_local_storage
+from b3_series.metrics import RunReport, metrics, run_report
+from b3_series.sync_parquets import _convert_zip_to_parquet_in_worker, sync_parquets
+from b3_series.sync_series import sync_series
+
+logger = logging.getLogger(__name__)
+
+
+def sync_pipeline(config=Config(), timeout_in_minutes: float = 7) -> RunReport:
+    """
+    Download the missing series and convert them to parquet as they land.
+
+    Every downloaded series is handed right away to a pool of
+    config.conversion_workers processes, so conversions overlap with the
+    downloads still running instead of waiting for all of them. The series
+    wait for a free process in the pipeline itself, so none starts converting
+    after the timeout. With
+    config.convert_on_download the series are parsed while downloaded
+    instead. The zip files still outdated afterwards, like the ones left by
+    earlier runs, are converted with the rest of the time budget.
+
+    Args:
+        config (Config, optional): Storage and concurrency settings
+        timeout_in_minutes (float, optional): Time budget of the whole run,
+            after which no download or conversion is started, and the
+            conversions still waiting for a worker are left for the next run.
+            Defaults to 7.
+
+    Returns:
+        RunReport: The converted parquet files, and the series still missing
+            or waiting for conversion
+    """
+    require_local_storage("Converting the series", config)
+    timeout = time() + 60 * timeout_in_minutes
+
+    with run_report("sync") as report:
+        converted = []
+        workers = max(config.conversion_workers, 1)
+        with (
+            ProcessPoolExecutor(workers) as processes,
+            ThreadPoolExecutor(workers) as dispatcher,
+        ):
+            conversions = []
+
+            def convert_in_worker(serie: str):
+                # the series still waiting for a worker at the timeout are left
+                # for sync_parquets to convert on the next run
+                if time() > timeout:
+                    return None
+                return processes.submit(
+                    _convert_zip_to_parquet_in_worker, serie, config
+                ).result()
+
+            def convert(serie: str):
+                conversions.append(dispatcher.submit(convert_in_worker, serie))
+
+            on_download = None if config.convert_on_download else convert
+            downloads = sync_series(config, timeout_in_minutes, on_download)
+
+            for future in as_completed(conversions):
+                try:
+                    result = future.result()
+                except Exception as error:
+                    # left for sync_parquets to retry
+                    logger.warning("Conversion failed: %s", error)
+                    continue
+                if result is None:
+                    continue
+                parquet_path, events = result
+                metrics.replay(events)
+                converted.append(parquet_path)
+
+        parquets = sync_parquets(config, max(timeout - time(), 0) / 60)
+
+        report.completed = converted + parquets.completed
+        report.remaining = downloads.remaining + parquets.remaining
+
+    return report
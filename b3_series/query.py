@@ -0,0 +1,251 @@
+import calendar
+from datetime import date, datetime
+
+import fastparquet
+import numpy as np
+import pandas as pd
+
+from b3_series.config import Config
+from b3_series.dataset import select_partitions
+from b3_series.index import read_ticker_index
+from b3_series.io import get_absolute_series_path, list_series, require_local_storage
+from b3_series.metrics import metrics
+from b3_series.names import SERIE_PATTERN, serie_stem, superseding_stems
+from b3_series.parquet import restore_text_columns
+from b3_series.schema import SCHEMA
+
+
+def serie_period(serie_name: str) -> tuple[date, date]:
+    """
+    First and last trading dates a series file may contain, from its name.
+    """
+    match = SERIE_PATTERN.match(serie_stem(serie_name))
+    if match is None:
+        return date.min, date.max
+
+    kind, period = match.group("kind").upper(), match.group("period")
+    if kind == "A":
+        year = int(period)
+        return date(year, 1, 1), date(year, 12, 31)
+    if kind == "M":
+        month, year = int(period[:2]), int(period[2:])
+        return date(year, month, 1), date(
+            year, month, calendar.monthrange(year, month)[1]
+        )
+
+    day = date(int(period[4:]), int(period[2:4]), int(period[:2]))
+    return day, day
+
+
+def select_series(start: date = None, end: date = None, config=Config()) -> list[str]:
+    """
+    Parquet files that may hold records between start and end.
+
+    Files superseded by another parquet file, such as the monthly files of a
+    year whose annual file is present, are skipped to avoid duplicate rows.
+    """
+    parquet_series = list_series("parquet", config=config)
+    stems = {serie_stem(serie) for serie in parquet_series}
+
+    selected = []
+    for serie in sorted(parquet_series):
+        if any(stem in stems for stem in superseding_stems(serie)):
+            continue
+
+        first_day, last_day = serie_period(serie)
+        if start is not None and last_day < start:
+            continue
+        if end is not None and first_day > end:
+            continue
+
+        selected.append(serie)
+
+    return selected
+
+
+def to_date(value) -> date:
+    if value is None or (isinstance(value, date) and not isinstance(value, datetime)):
+        return value
+    return pd.Timestamp(value).date()
+
+
+def read_row_ranges(
+    parquet_file: fastparquet.ParquetFile, ranges: pd.DataFrame, columns: list[str]
+) -> pd.DataFrame:
+    """
+    Read the rows between row_start and row_stop of each range, reading only
+    the row groups holding them.
+    """
+    sizes = [row_group.num_rows for row_group in parquet_file.row_groups]
+    offsets = np.cumsum([0] + sizes)
+    starts = ranges["row_start"].to_numpy()
+    stops = ranges["row_stop"].to_numpy()
+
+    frames = []
+    for position, (first, last) in enumerate(zip(offsets[:-1], offsets[1:])):
+        overlapping = (starts < last) & (stops > first)
+        if not overlapping.any():
+            continue
+
+        rows = np.concatenate(
+            [
+                np.arange(max(start, first), min(stop, last)) - first
+                for start, stop in zip(starts[overlapping], stops[overlapping])
+            ]
+        )
+        df = parquet_file[position].to_pandas(columns=columns, index=False)
+        frames.append(df.iloc[rows])
+
+    if not frames:
+        return parquet_file[0:0].to_pandas(columns=columns, index=False)
+    return pd.concat(frames, ignore_index=True)
+
+
+def _read_serie(
+    serie: str,
+    tickers: list[str],
+    isins: list[str],
+    start: date,
+    end: date,
+    columns: list[str],
+    filters: list[tuple],
+    config=Config(),
+) -> pd.DataFrame:
+    """
+    Read the columns of a parquet series, through its ticker index when
+    tickers or ISINs are given.
+    """
+    parquet_file = fastparquet.ParquetFile(get_absolute_series_path(serie, config))
+
+    ranges = None
+    if tickers is not None or isins is not None:
+        ranges = read_ticker_index(serie, tickers, isins, config)
+
+    if ranges is None:
+        df = parquet_file.to_pandas(columns=columns, filters=filters, index=False)
+    else:
+        if start is not None:
+            ranges = ranges[ranges["last_date"] >= pd.Timestamp(start)]
+        if end is not None:
+            ranges = ranges[ranges["first_date"] <= pd.Timestamp(end)]
+        df = read_row_ranges(parquet_file, ranges, columns)
+
+    return restore_text_columns(df, config)
+
+
+def _read_partition(
+    path: str, values: dict, columns: list[str], filters: list[tuple], config=Config()
+) -> pd.DataFrame:
+    """
+    Read the columns of a file of the dataset, restoring its partition columns
+    and the dtypes of the parquet series.
+    """
+    df = fastparquet.ParquetFile(path).to_pandas(
+        columns=[name for name in columns if name not in values],
+        filters=[filter for filter in filters if filter[0] not in values],
+        index=False,
+    )
+    for name, value in values.items():
+        if name in columns:
+            df[name] = value
+
+    # the parser reads integer columns with missing values as floats
+    dtypes = SCHEMA.compact_dtypes if config.compact_schema else SCHEMA.dtypes
+    return df.astype(
+        {
+            name: "float64" if dtypes[name] == "int64" and df[name].hasnans else dtype
+            for name, dtype in dtypes.items()
+            if name in columns
+        }
+    )
+
+
+def load(
+    tickers: list[str] = None,
+    start=None,
+    end=None,
+    columns: list[str] = None,
+    markets: list[int] = None,
+    isins: list[str] = None,
+    config=Config(),
+) -> pd.DataFrame:
+    """
+    Load the records of the converted parquet files matching the given filters.
+
+    Files outside the date range are skipped by name, row groups are pruned
+    through their statistics and only the requested columns are read. When
+    tickers or ISINs are given, the ticker index of each file gives the row
+    ranges to read, so only the row groups holding them are read. When
+    config.partitioned_dataset is set, the records are read from the dataset
+    instead, skipping the months outside the date range and the partitions
+    of other markets.
+
+    Args:
+        tickers (list[str], optional): Values of sigla_acao to load
+        start (optional): First trading date to load, inclusive
+        end (optional): Last trading date to load, inclusive
+        columns (list[str], optional): Columns to load. Defaults to all columns.
+        markets (list[int], optional): Values of tipo_mercado to load
+        isins (list[str], optional): Values of codigo_isin to load
+        config (Config, optional): Storage settings
+
+    Returns:
+        pd.DataFrame: The matching records
+    """
+    require_local_storage("Querying the series", config)
+    start, end = to_date(start), to_date(end)
+    columns = columns or list(SCHEMA.names)
+
+    filters = []
+    if tickers is not None:
+        filters.append(("sigla_acao", "in", list(tickers)))
+    if markets is not None:
+        filters.append(("tipo_mercado", "in", list(markets)))
+    if isins is not None:
+        filters.append(("codigo_isin", "in", list(isins)))
+    if start is not None:
+        filters.append(("data_pregao", ">=", pd.Timestamp(start)))
+    if end is not None:
+        filters.append(("data_pregao", "<=", pd.Timestamp(end)))
+
+    read_columns = columns + [name for name, _, _ in filters if name not in columns]
+
+    with metrics.span("query_load"):
+        if config.partitioned_dataset:
+            partitions = select_partitions(start, end, config)
+            frames = (
+                _read_partition(path, values, read_columns, filters, config)
+                for path, values in partitions
+                if not any(
+                    name in values and op == "in" and values[name] not in value
+                    for name, op, value in filters
+                )
+            )
+        else:
+            frames = (
+                _read_serie(
+                    serie, tickers, isins, start, end, read_columns, filters, config
+                )
+                for serie in select_series(start, end, config)
+            )
+
+        filtered_frames = []
+        for df in frames:
+            mask = pd.Series(True, index=df.index)
+            for name, op, value in filters:
+                if op == "in":
+                    mask &= df[name].isin(value)
+                elif op == ">=":
+                    mask &= df[name] >= value
+                else:
+                    mask &= df[name] <= value
+
+            filtered_frames.append(df.loc[mask, columns])
+
+        if not filtered_frames:
+            return pd.DataFrame(columns=columns)
+
+        df = pd.concat(filtered_frames, ignore_index=True)
+
+    metrics.count("rows_loaded", len(df))
+    return df
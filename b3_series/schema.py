@@ -0,0 +1,273 @@
+from types import MappingProxyType
+from typing import Mapping, NamedTuple
+
+RECORD_LENGTH = 245
+ENCODING = "ISO-8859-1"
+
+# bump whenever a change to the parser changes its output
+PARSER_VERSION = 2
+
+DEFAULT_DTYPES = MappingProxyType(
+    {
+        "str": "object",
+        "int": "int64",
+        "float": "float64",
+        "date": "datetime64[ns]",
+    }
+)
+
+# largest value of the nullable integer dtypes, smallest first
+_INTEGER_LIMITS = {"Int8": 2**7 - 1, "Int16": 2**15 - 1, "Int32": 2**31 - 1}
+
+
+class Column(NamedTuple):
+    name: str
+    description: str
+    type: str
+    start: int
+    end: int
+
+    @property
+    def width(self) -> int:
+        return self.end - self.start
+
+
+class Schema(NamedTuple):
+    """
+    Layout of the records of the B3 public data files, compiled once.
+
+    Immutable, so it is shared by every parser without copies.
+    """
+
+    columns: tuple[Column, ...]
+    names: tuple[str, ...]
+    colspecs: tuple[tuple[int, int], ...]
+    dtypes: Mapping[str, str]
+    compact_dtypes: Mapping[str, str]
+
+
+def _integer_dtype(width: int) -> str:
+    """
+    Smallest nullable integer dtype holding any number with the given digits.
+    """
+    for dtype, limit in _INTEGER_LIMITS.items():
+        if 10**width - 1 <= limit:
+            return dtype
+    return "Int64"
+
+
+def _compact_dtype(column: Column) -> str:
+    """
+    Text columns are categorical, integer columns use the smallest nullable
+    integer type for their width and prices are nullable int64 fixed-point
+    values in cents.
+    """
+    if column.type == "str":
+        return "category"
+    if column.type == "int":
+        return _integer_dtype(column.width)
+    if column.type == "float":
+        return "Int64"
+    return DEFAULT_DTYPES[column.type]
+
+
+def compile_schema(columns: tuple[Column, ...]) -> Schema:
+    return Schema(
+        columns=columns,
+        names=tuple(column.name for column in columns),
+        colspecs=tuple((column.start, column.end) for column in columns),
+        dtypes=MappingProxyType(
+            {column.name: DEFAULT_DTYPES[column.type] for column in columns}
+        ),
+        compact_dtypes=MappingProxyType(
+            {column.name: _compact_dtype(column) for column in columns}
+        ),
+    )
+
+
+COLUMNS = (
+    Column(
+        name="tipo_registro",
+        description="Tipo de registro",
+        type="int",
+        start=0,
+        end=2,
+    ),
+    Column(
+        name="data_pregao",
+        description="Data do pregão",
+        type="date",
+        start=2,
+        end=10,
+    ),
+    Column(
+        name="codbdi",
+        description="Código BDI",
+        type="int",
+        start=10,
+        end=12,
+    ),
+    Column(
+        name="sigla_acao",
+        description="Sigla da ação",
+        type="str",
+        start=12,
+        end=24,
+    ),
+    Column(
+        name="tipo_mercado",
+        description="Tipo de mercado",
+        type="int",
+        start=24,
+        end=27,
+    ),
+    Column(
+        name="nome_resumido",
+        description="Nome resumido da empresa emissora do papel",
+        type="str",
+        start=27,
+        end=39,
+    ),
+    Column(
+        name="especificacao_papel",
+        description="Especificação do papel",
+        type="str",
+        start=39,
+        end=49,
+    ),
+    Column(
+        name="prazo_termo",
+        description="Prazo em dias do termo",
+        type="int",
+        start=49,
+        end=52,
+    ),
+    Column(
+        name="moeda",
+        description="Moeda de referência em reais ou dólares",
+        type="str",
+        start=52,
+        end=56,
+    ),
+    Column(
+        name="preco_abertura",
+        description="Preço de abertura do papel-mercado no pregão",
+        type="float",
+        start=56,
+        end=69,
+    ),
+    Column(
+        name="preco_maximo",
+        description="Preço máximo do papel-mercado no pregão",
+        type="float",
+        start=69,
+        end=82,
+    ),
+    Column(
+        name="preco_minimo",
+        description="Preço mínimo do papel-mercado no pregão",
+        type="float",
+        start=82,
+        end=95,
+    ),
+    Column(
+        name="preco_medio",
+        description="Preço médio do papel-mercado no pregão",
+        type="float",
+        start=95,
+        end=108,
+    ),
+    Column(
+        name="preco_ultimo",
+        description="Preço do último negócio do papel-mercado no pregão",
+        type="float",
+        start=108,
+        end=121,
+    ),
+    Column(
+        name="preco_melhor_oferta_compra",
+        description="Preço da melhor oferta de compra do papel-mercado no pregão",
+        type="float",
+        start=121,
+        end=134,
+    ),
+    Column(
+        name="preco_melhor_oferta_venda",
+        description="Preço da melhor oferta de venda do papel-mercado no pregão",
+        type="float",
+        start=134,
+        end=147,
+    ),
+    Column(
+        name="numero_negocios",
+        description="Número de negócios efetuados com o papel-mercado no pregão",
+        type="int",
+        start=147,
+        end=152,
+    ),
+    Column(
+        name="quantidade_titulos_negociados",
+        description="Quantidade total de títulos negociados neste papel-mercado",
+        type="int",
+        start=152,
+        end=170,
+    ),
+    Column(
+        name="volume_titulos_negociados",
+        description="Volume total de títulos negociados neste papel-mercado",
+        type="float",
+        start=170,
+        end=188,
+    ),
+    Column(
+        name="preco_exercicio",
+        description="Preço de exercício para o mercado de opções ou valor do contrato para o mercado de termo secundário",
+        type="float",
+        start=188,
+        end=201,
+    ),
+    Column(
+        name="indicador_correcao_preco",
+        description="Indicador de correção de preços de exercícios ou valores de contrato para os mercados de opções ou termo secundário",
+        type="str",
+        start=201,
+        end=202,
+    ),
+    Column(
+        name="data_vencimento",
+        description="Data do vencimento para os mercados de opções ou termo secundário",
+        type="date",
+        start=202,
+        end=210,
+    ),
+    Column(
+        name="fator_cotacao",
+        description="Fator de cotação do papel",
+        type="int",
+        start=210,
+        end=217,
+    ),
+    Column(
+        name="preco_pontos",
+        description="Preço de pontos do papel",
+        type="float",
+        start=217,
+        end=230,
+    ),
+    Column(
+        name="codigo_isin",
+        description="Código do papel no sistema ISIN ou código interno do papel",
+        type="str",
+        start=230,
+        end=242,
+    ),
+    Column(
+        name="numero_distribuicao",
+        description="Número de distribuição do papel",
+        type="int",
+        start=242,
+        end=245,
+    ),
+)
+
+SCHEMA = compile_schema(COLUMNS)
@@ -0,0 +1,453 @@
+import json
+import os
+from pathlib import Path
+
+import fastparquet
+import numpy as np
+import pandas as pd
+
+from b3_series.config import Config
+from b3_series.files import atomic_write
+from b3_series.io import file_fingerprint, get_absolute_series_path
+from b3_series.query import select_series
+from b3_series.schema import SCHEMA
+
+PANEL_FOLDER = "panel"
+PANEL_META = "meta.json"
+
+# bump whenever a change to the layout of the panel files changes them
+PANEL_VERSION = 2
+
+# the cash market, where one record per ticker and trading date is expected
+PANEL_MARKETS = [10]
+
+PANEL_FIELDS = [
+    "preco_abertura",
+    "preco_maximo",
+    "preco_minimo",
+    "preco_ultimo",
+    "numero_negocios",
+    "quantidade_titulos_negociados",
+    "volume_titulos_negociados",
+]
+
+_TYPES = {column.name: column.type for column in SCHEMA.columns}
+
+
+def get_panel_path(config=Config()) -> str:
+    return get_absolute_series_path(PANEL_FOLDER, config)
+
+
+def _field_values(values: pd.Series, field: str) -> np.ndarray:
+    """
+    Values of a field as float64, including the integer cents of the compact schema.
+    """
+    if _TYPES[field] == "float" and pd.api.types.is_integer_dtype(values.dtype):
+        return values.astype("float64").to_numpy(na_value=np.nan) / 100
+    return values.to_numpy(dtype="float64", na_value=np.nan)
+
+
+def _read_records(parquet_series: list[str], config=Config()) -> pd.DataFrame:
+    """
+    Panel fields of the records of the PANEL_MARKETS, one per ticker and date.
+    """
+    columns = ["data_pregao", "sigla_acao", "tipo_mercado", *PANEL_FIELDS]
+    frames = []
+    for serie in parquet_series:
+        parquet_file = fastparquet.ParquetFile(get_absolute_series_path(serie, config))
+        df = parquet_file.to_pandas(columns=columns, index=False)
+        df = df[df["tipo_mercado"].isin(PANEL_MARKETS).to_numpy()]
+        frames.append(
+            pd.DataFrame(
+                {
+                    "data_pregao": df["data_pregao"].to_numpy(dtype="datetime64[D]"),
+                    "sigla_acao": df["sigla_acao"].to_numpy(dtype=object),
+                    **{
+                        field: _field_values(df[field], field) for field in PANEL_FIELDS
+                    },
+                }
+            )
+        )
+
+    if not frames:
+        return pd.DataFrame(columns=columns)
+    df = pd.concat(frames, ignore_index=True)
+    return df.drop_duplicates(["data_pregao", "sigla_acao"], keep="last")
+
+
+def _capacity(tickers: int) -> int:
+    """
+    Columns allocated for the given tickers, leaving room for new listings.
+    """
+    return tickers + tickers // 4 + 64
+
+
+class Panel:
+    """
+    Fields of the cash market records as dates x tickers float64 matrices.
+
+    Every field is a memory-mapped file under the panel folder, with one row
+    per trading date and one column per ticker, NaN where a ticker did not
+    trade. Rows are only ever appended, and the columns have room for new
+    tickers, so new daily series are added without rewriting the panel.
+    """
+
+    def __init__(self, path: str, meta: dict):
+        self.path = path
+        self.dates = np.array(meta["dates"], dtype="datetime64[D]")
+        self.tickers = np.array(meta["tickers"], dtype=object)
+        self.capacity = meta["capacity"]
+        self.series = meta["series"]
+
+        # mapped once, so a panel built meanwhile does not change this one
+        self._values = {}
+        if len(self.dates):
+            for field in PANEL_FIELDS:
+                values = np.memmap(
+                    Path(path) / f"{field}.f8",
+                    dtype="float64",
+                    mode="r",
+                    shape=(len(self.dates), self.capacity),
+                )
+                self._values[field] = values[:, : len(self.tickers)]
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def __getitem__(self, field: str) -> np.ndarray:
+        """
+        Read-only dates x tickers matrix of a field.
+        """
+        if not len(self.dates):
+            return np.empty((0, len(self.tickers)))
+        return self._values[field]
+
+    def row(self, day) -> int:
+        """
+        Row of the last trading date up to the given day.
+        """
+        position = np.searchsorted(self.dates, np.datetime64(day, "D"), side="right")
+        if position == 0:
+            raise KeyError(f"No trading date up to {day}")
+        return int(position) - 1
+
+    def frame(self, field: str, start=None, end=None) -> pd.DataFrame:
+        """
+        A field as a DataFrame indexed by date, with one column per ticker.
+        """
+        first = (
+            0
+            if start is None
+            else np.searchsorted(self.dates, np.datetime64(start, "D"))
+        )
+        last = len(self.dates) if end is None else self.row(end) + 1
+        return pd.DataFrame(
+            self[field][first:last],
+            index=pd.DatetimeIndex(
+                self.dates[first:last].astype("datetime64[ns]"), name="data_pregao"
+            ),
+            columns=pd.Index(self.tickers, name="sigla_acao"),
+        )
+
+
+def _series_fingerprints(config=Config()) -> dict[str, str]:
+    return {
+        serie: file_fingerprint(get_absolute_series_path(serie, config))
+        for serie in select_series(config=config)
+    }
+
+
+def _load_meta(path: Path) -> dict:
+    meta_path = path / PANEL_META
+    if not meta_path.exists():
+        return None
+    meta = json.loads(meta_path.read_text())
+    if meta.get("version") != PANEL_VERSION or meta.get("markets") != PANEL_MARKETS:
+        return None
+    return meta
+
+
+def _save_meta(path: Path, meta: dict):
+    with atomic_write(path / PANEL_META) as partial:
+        partial.write_text(json.dumps(meta))
+
+
+def _matrix(df: pd.DataFrame, field: str, rows, columns, shape) -> np.ndarray:
+    values = np.full(shape, np.nan)
+    values[rows, columns] = df[field].to_numpy()
+    return values
+
+
+def build_panel(config=Config()) -> Panel:
+    """
+    Build the panel from every converted parquet file.
+
+    The panel is written aside and swapped in once complete.
+
+    Returns:
+        Panel: The new panel
+    """
+    series = _series_fingerprints(config)
+    df = _read_records(list(series), config)
+
+    dates = np.unique(df["data_pregao"].to_numpy(dtype="datetime64[D]"))
+    tickers = np.unique(df["sigla_acao"].to_numpy(dtype=str))
+    capacity = _capacity(len(tickers))
+    rows = np.searchsorted(dates, df["data_pregao"].to_numpy(dtype="datetime64[D]"))
+    columns = np.searchsorted(tickers, df["sigla_acao"].to_numpy(dtype=str))
+
+    meta = {
+        "version": PANEL_VERSION,
+        "markets": PANEL_MARKETS,
+        "dates": [str(day) for day in dates],
+        "tickers": tickers.tolist(),
+        "capacity": capacity,
+        "series": series,
+    }
+
+    path = Path(get_panel_path(config))
+    with atomic_write(path) as partial:
+        partial.mkdir(parents=True)
+        for field in PANEL_FIELDS:
+            values = _matrix(df, field, rows, columns, (len(dates), capacity))
+            values.tofile(partial / f"{field}.f8")
+        _save_meta(partial, meta)
+
+    return Panel(str(path), meta)
+
+
+def update_panel(config=Config()) -> Panel:
+    """
+    Bring the panel up to date with the converted parquet files.
+
+    Series with trading dates after the last row of the panel, like new daily
+    series, are appended to the panel files, adding new tickers to the free
+    columns. The panel is built again when a series already in it changed or
+    disappeared, when a new series has earlier dates or when there is no
+    room left for the new tickers.
+
+    Returns:
+        Panel: The updated panel
+    """
+    path = Path(get_panel_path(config))
+    meta = _load_meta(path)
+    series = _series_fingerprints(config)
+
+    if meta is None or any(
+        series.get(serie) != fingerprint
+        for serie, fingerprint in meta["series"].items()
+    ):
+        return build_panel(config)
+
+    new_series = [serie for serie in series if serie not in meta["series"]]
+    if not new_series:
+        return Panel(str(path), meta)
+
+    df = _read_records(new_series, config)
+    dates = np.unique(df["data_pregao"].to_numpy(dtype="datetime64[D]"))
+    if len(dates) and meta["dates"] and dates[0] <= np.datetime64(meta["dates"][-1]):
+        return build_panel(config)
+
+    tickers = meta["tickers"] + sorted(
+        set(df["sigla_acao"]).difference(meta["tickers"])
+    )
+    if len(tickers) > meta["capacity"]:
+        return build_panel(config)
+
+    positions = {ticker: i for i, ticker in enumerate(tickers)}
+    rows = np.searchsorted(dates, df["data_pregao"].to_numpy(dtype="datetime64[D]"))
+    columns = df["sigla_acao"].map(positions).to_numpy(dtype=np.int64)
+
+    row_bytes = meta["capacity"] * np.dtype("float64").itemsize
+    for field in PANEL_FIELDS:
+        field_path = path / f"{field}.f8"
+        # drop rows appended by an update interrupted before saving the meta
+        os.truncate(field_path, len(meta["dates"]) * row_bytes)
+        values = _matrix(df, field, rows, columns, (len(dates), meta["capacity"]))
+        with open(field_path, "ab") as f:
+            values.tofile(f)
+
+    meta = {
+        **meta,
+        "dates": meta["dates"] + [str(day) for day in dates],
+        "tickers": tickers,
+        "series": series,
+    }
+    _save_meta(path, meta)
+    return Panel(str(path), meta)
+
+
+def load_panel(config=Config()) -> Panel:
+    """
+    Open the panel, building or updating it first when needed.
+    """
+    return update_panel(config)
+
+
+def shift(values: np.ndarray, periods: int = 1) -> np.ndarray:
+    """
+    Values of periods rows before, NaN for the first rows.
+    """
+    shifted = np.full(values.shape, np.nan)
+    if periods < len(values):
+        shifted[periods:] = values[: len(values) - periods]
+    return shifted
+
+
+def ffill(values: np.ndarray) -> np.ndarray:
+    """
+    Replace the NaN of every column by its last value before them.
+    """
+    rows = np.where(np.isnan(values), 0, np.arange(len(values))[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    filled = values[rows, np.arange(values.shape[1])]
+    return filled
+
+
+def rolling_sum(values: np.ndarray, window: int, min_periods: int = 1) -> np.ndarray:
+    """
+    Sum of the last window rows of every column, ignoring NaN, or NaN where
+    less than min_periods values are available.
+    """
+    valid = ~np.isnan(values)
+    sums = np.cumsum(np.where(valid, values, 0), axis=0)
+    counts = np.cumsum(valid, axis=0)
+    sums[window:] = sums[window:] - sums[:-window]
+    counts[window:] = counts[window:] - counts[:-window]
+    return np.where(counts >= min_periods, sums, np.nan)
+
+
+def rolling_mean(values: np.ndarray, window: int, min_periods: int = 1) -> np.ndarray:
+    """
+    Mean of the last window rows of every column, ignoring NaN.
+    """
+    counts = rolling_sum((~np.isnan(values)).astype("float64"), window)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = rolling_sum(values, window, min_periods) / counts
+    return means
+
+
+def pct_change(values: np.ndarray, periods: int = 1) -> np.ndarray:
+    """
+    Relative change over periods rows, carrying the last value over the
+    rows a ticker did not trade.
+    """
+    filled = ffill(values)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return filled / shift(filled, periods) - 1
+
+
+def rank(values: np.ndarray) -> np.ndarray:
+    """
+    Percentile rank of every value within its row, NaN for NaN values. Equal
+    values share the average of their ranks.
+    """
+    missing = np.isnan(values)
+    filled = np.where(missing, np.inf, values)
+    order = np.argsort(filled, axis=1, kind="stable")
+    ordered = np.take_along_axis(filled, order, axis=1)
+
+    # number the runs of equal values across all rows and average their positions
+    starts = np.ones(values.shape, dtype=bool)
+    starts[:, 1:] = ordered[:, 1:] != ordered[:, :-1]
+    runs = np.cumsum(starts.ravel()) - 1
+    positions = np.tile(np.arange(values.shape[1], dtype="float64"), len(values))
+    averages = np.bincount(runs, positions) / np.bincount(runs)
+
+    ranks = np.empty(values.shape)
+    np.put_along_axis(ranks, order, averages[runs].reshape(values.shape), axis=1)
+    counts = (~missing).sum(axis=1, keepdims=True)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ranks = (ranks + 1) / counts
+    ranks[missing] = np.nan
+    return ranks
+
+
+def zscore(values: np.ndarray) -> np.ndarray:
+    """
+    Standard score of every value within its row, ignoring NaN.
+    """
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.nanmean(values, axis=1, keepdims=True)
+        std = np.nanstd(values, axis=1, keepdims=True)
+        return (values - mean) / std
+
+
+def _last_valid(values: np.ndarray, stop: int, block_rows: int = 256) -> np.ndarray:
+    """
+    Last value of every column before row stop, reading back block by block
+    only until every column has one.
+    """
+    last = np.full(values.shape[1], np.nan)
+    missing = np.ones(values.shape[1], dtype=bool)
+    while stop > 0 and missing.any():
+        start = max(stop - block_rows, 0)
+        last[missing] = ffill(values[start:stop][:, missing])[-1]
+        missing &= np.isnan(last)
+        stop = start
+    return last
+
+
+def screen(
+    panel: Panel,
+    day=None,
+    liquidity_window: int = 21,
+    return_window: int = 21,
+    min_average_volume: float = 0,
+    min_average_trades: float = 0,
+) -> pd.DataFrame:
+    """
+    Screen every ticker on a trading day in one vectorized pass.
+
+    Only the rows needed by the windows are read from the panel, so a screen
+    reads a few megabytes whatever the length of the history.
+
+    Args:
+        panel (Panel): The panel to screen
+        day (optional): Trading day, the last trading date up to it. Defaults
+            to the last row of the panel.
+        liquidity_window (int, optional): Trading days of the average volume
+            and trades. Defaults to 21.
+        return_window (int, optional): Trading days of the return. Defaults to 21.
+        min_average_volume (float, optional): Smallest average volume kept
+        min_average_trades (float, optional): Smallest average trades kept
+
+    Returns:
+        pd.DataFrame: One row per ticker that traded on the day and passed
+            the liquidity filters, with its close, the gap between its open
+            and its previous close, its return and its average volume and
+            trades, sorted by return
+    """
+    last = len(panel) - 1 if day is None else panel.row(day)
+    first = max(last - max(liquidity_window - 1, return_window), 0)
+    window = slice(first, last + 1)
+
+    # the closes before the window carry over the days a ticker did not trade
+    close = panel["preco_ultimo"]
+    close = np.vstack([_last_valid(close, first), close[window]])
+    previous_close = ffill(close)[-2]
+
+    volume = rolling_mean(panel["volume_titulos_negociados"][window], liquidity_window)
+    trades = rolling_mean(panel["numero_negocios"][window], liquidity_window)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        gap = panel["preco_abertura"][last] / previous_close - 1
+
+    df = pd.DataFrame(
+        {
+            "sigla_acao": panel.tickers,
+            "preco_ultimo": close[-1],
+            "gap_abertura": gap,
+            "retorno": pct_change(close, return_window)[-1],
+            "volume_medio": volume[-1],
+            "negocios_medio": trades[-1],
+        }
+    )
+
+    keep = ~np.isnan(close[-1])
+    keep &= df["volume_medio"].to_numpy() >= min_average_volume
+    keep &= df["negocios_medio"].to_numpy() >= min_average_trades
+    return (
+        df[keep]
+        .sort_values("retorno", ascending=False, kind="stable")
+        .reset_index(drop=True)
+    )
@@ -0,0 +1,372 @@
+import fcntl
+import hashlib
+import json
+import struct
+import sys
+import tempfile
+import weakref
+from contextlib import contextmanager
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+
+import pandas as pd
+
+from b3_series.cache import load_series, series_fingerprint
+from b3_series.config import Config
+from b3_series.io import get_absolute_series_path
+from b3_series.metrics import metrics
+
+SHARED_PREFIX = "b3s_"
+
+# the header segment starts with the length of the metadata
+_HEADER = struct.Struct("q")
+
+
+def _series_key(serie: str, config=Config()) -> str:
+    """
+    Name prefix of the segments of a series, which changes with the file, so
+    a series converted again is published anew instead of attached stale.
+    """
+    path = get_absolute_series_path(serie, config)
+    fingerprint = series_fingerprint(path, config.compact_schema)
+    digest = hashlib.sha1(f"{path}|{fingerprint}".encode()).hexdigest()
+    # macOS limits shared memory names to 31 characters
+    return f"{SHARED_PREFIX}{digest[:16]}"
+
+
+def _lock_path(key: str, suffix: str) -> Path:
+    return Path(tempfile.gettempdir()) / f"{key}.{suffix}"
+
+
+@contextmanager
+def _locked(key: str):
+    """
+    Hold an exclusive lock on a series between the processes of the host.
+
+    The empty lock files are left in the temporary folder, as removing them
+    would race with the processes waiting on them.
+    """
+    with open(_lock_path(key, "lock"), "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _hold_reference(key: str):
+    """
+    Record that this process is attached to a series, with a shared lock held
+    until the returned file is closed. The system releases the locks of
+    processes that exit or are killed, so the attached processes are always
+    known, unlike with a reference count.
+    """
+    f = open(_lock_path(key, "ref"), "a")
+    fcntl.flock(f, fcntl.LOCK_SH)
+    return f
+
+
+def _is_referenced(key: str) -> bool:
+    """
+    Whether any live process is attached to a series.
+    """
+    with open(_lock_path(key, "ref"), "a") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return True
+        fcntl.flock(f, fcntl.LOCK_UN)
+        return False
+
+
+# segments outlive the process creating them and are unlinked by the last
+# process detaching, so the resource tracker must not unlink them at exit
+if sys.version_info >= (3, 13):
+
+    def _open_segment(name: str, size: int = 0) -> SharedMemory:
+        return SharedMemory(name, create=size > 0, size=size, track=False)
+
+    def _unlink(segment: SharedMemory):
+        segment.unlink()
+
+else:
+    # the resource tracker knows POSIX segments by their name with a slash
+
+    def _open_segment(name: str, size: int = 0) -> SharedMemory:
+        segment = SharedMemory(name, create=size > 0, size=size)
+        resource_tracker.unregister(f"/{segment.name}", "shared_memory")
+        return segment
+
+    def _unlink(segment: SharedMemory):
+        # unlink() unregisters the segment from the resource tracker
+        resource_tracker.register(f"/{segment.name}", "shared_memory")
+        try:
+            segment.unlink()
+        except FileNotFoundError:
+            resource_tracker.unregister(f"/{segment.name}", "shared_memory")
+            raise
+
+
+def _unlink_segment(segment: SharedMemory):
+    try:
+        _unlink(segment)
+    except FileNotFoundError:
+        # already removed by sweep_shared_series
+        pass
+
+
+def _close_segment(segment: SharedMemory):
+    try:
+        segment.close()
+    except BufferError:
+        # DataFrames kept after detaching still view the segment. Their
+        # buffers hold it, so it is closed once they are garbage collected.
+        pass
+
+
+def _remove_segment(name: str) -> bool:
+    try:
+        segment = _open_segment(name)
+    except FileNotFoundError:
+        return False
+    _unlink_segment(segment)
+    _close_segment(segment)
+    return True
+
+
+def _remove_segments(key: str) -> bool:
+    """
+    Remove the segments of a series, including the columns left by a process
+    killed while publishing it, which are numbered from 0 like the columns.
+
+    Returns:
+        bool: Whether any segment was removed
+    """
+    removed = _remove_segment(key)
+    position = 0
+    while _remove_segment(f"{key}_{position}"):
+        removed = True
+        position += 1
+    return removed
+
+
+def _write_column(df: pd.DataFrame, name: str, segment_name: str) -> SharedMemory:
+    """
+    Write a column as an Arrow IPC stream to a new shared memory segment.
+    """
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(df[[name]], preserve_index=False)
+
+    sink = pa.MockOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+
+    segment = _open_segment(segment_name, max(sink.size(), 1))
+    try:
+        stream = pa.FixedSizeBufferWriter(pa.py_buffer(segment.buf))
+        with pa.ipc.new_stream(stream, table.schema) as writer:
+            writer.write_table(table)
+        stream.close()
+    except Exception:
+        _unlink_segment(segment)
+        _close_segment(segment)
+        raise
+    return segment
+
+
+def _read_column(segment: SharedMemory) -> pd.Series:
+    """
+    A column written by _write_column, as a view of the segment when its
+    type allows it.
+
+    The Arrow buffer of the segment holds the segment itself, so a segment
+    is never garbage collected, nor closed, while a column still views it.
+    """
+    import numpy as np
+    import pyarrow as pa
+
+    memory = np.frombuffer(segment.buf, dtype=np.uint8)
+    # the view is released before the segment, which can then be closed
+    buffer = pa.foreign_buffer(memory.ctypes.data, memory.nbytes, (segment, memory))
+    table = pa.ipc.open_stream(buffer).read_all()
+    # split_blocks keeps numeric columns without nulls as views of the buffers
+    df = table.to_pandas(split_blocks=True)
+    return df[df.columns[0]]
+
+
+def _detach(key: str, header: SharedMemory, segments: list[SharedMemory], reference):
+    with _locked(key):
+        reference.close()
+        if not _is_referenced(key):
+            for segment in segments + [header]:
+                _unlink_segment(segment)
+            metrics.count("shared_series_removed")
+
+    for segment in segments + [header]:
+        _close_segment(segment)
+
+
+class SharedSeries:
+    """
+    A parsed series in shared memory, attached by this process.
+
+    Every column is an Arrow IPC stream in its own shared memory segment, and
+    a header segment holds the column names. Every attached process holds a
+    shared lock on the series. The segments are removed when the last process
+    detaches, and a process exiting without detaching detaches at exit. The
+    segments of processes killed before detaching are removed by the next
+    process detaching, or by sweep_shared_series.
+    """
+
+    def __init__(
+        self, key: str, header: SharedMemory, segments: list[SharedMemory], reference
+    ):
+        self.key = key
+        self.df = pd.DataFrame(
+            {
+                series.name: series
+                for series in (_read_column(segment) for segment in segments)
+            },
+            copy=False,
+        )
+        self._detach = weakref.finalize(self, _detach, key, header, segments, reference)
+
+    @property
+    def attached(self) -> bool:
+        return self._detach.alive
+
+    def detach(self):
+        """
+        Detach from the series, removing it from shared memory if no other
+        process is attached. The DataFrame must not be used afterwards.
+        """
+        self.df = None
+        self._detach()
+
+    def __enter__(self) -> "SharedSeries":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.detach()
+
+
+def _attach(key: str) -> SharedSeries:
+    header = _open_segment(key)
+    (length,) = _HEADER.unpack_from(header.buf)
+    columns = json.loads(bytes(header.buf[_HEADER.size : _HEADER.size + length]))
+
+    segments = []
+    try:
+        for position in range(len(columns)):
+            segments.append(_open_segment(f"{key}_{position}"))
+    except Exception:
+        for segment in segments + [header]:
+            _close_segment(segment)
+        raise
+
+    return SharedSeries(key, header, segments, _hold_reference(key))
+
+
+def _publish(key: str, df: pd.DataFrame) -> SharedSeries:
+    # segments left by a process killed while publishing the series
+    _remove_segments(key)
+
+    segments = []
+    try:
+        for position, name in enumerate(df.columns):
+            segments.append(_write_column(df, name, f"{key}_{position}"))
+
+        metadata = json.dumps([str(name) for name in df.columns]).encode()
+        header = _open_segment(key, _HEADER.size + len(metadata))
+    except Exception:
+        for segment in segments:
+            _unlink_segment(segment)
+            _close_segment(segment)
+        raise
+
+    header.buf[_HEADER.size : _HEADER.size + len(metadata)] = metadata
+    _HEADER.pack_into(header.buf, 0, len(metadata))
+    return SharedSeries(key, header, segments, _hold_reference(key))
+
+
+def attach_series(serie: str, config=Config()) -> SharedSeries:
+    """
+    Attach to a series published in shared memory by another process.
+
+    Numeric and date columns without nulls are read-only views of the shared
+    memory, so attaching does not decode nor copy them.
+
+    Args:
+        serie (str): Name of the series file
+        config (Config, optional): Storage settings
+
+    Raises:
+        FileNotFoundError: If the current version of the series file is not
+            published
+
+    Returns:
+        SharedSeries: The attached series, to detach once done
+    """
+    key = _series_key(serie, config)
+    with _locked(key):
+        shared = _attach(key)
+
+    metrics.count("shared_series_attached")
+    return shared
+
+
+def publish_series(
+    serie: str, df: pd.DataFrame = None, config=Config()
+) -> SharedSeries:
+    """
+    Publish a parsed series in POSIX shared memory, or attach to it if another
+    process already published it.
+
+    Processes publishing the same series at once wait for each other, so the
+    series is decoded once however many processes need it. Requires pyarrow.
+
+    Args:
+        serie (str): Name of the series file
+        df (pd.DataFrame, optional): The parsed series. Defaults to the series
+            loaded through the series cache of the config.
+        config (Config, optional): Storage and cache settings
+
+    Returns:
+        SharedSeries: The attached series, to detach once done
+    """
+    key = _series_key(serie, config)
+    with _locked(key):
+        try:
+            shared = _attach(key)
+        except FileNotFoundError:
+            shared = _publish(key, load_series(serie, config) if df is None else df)
+            metrics.count("shared_series_published")
+            return shared
+
+    metrics.count("shared_series_attached")
+    return shared
+
+
+def sweep_shared_series() -> list[str]:
+    """
+    Remove the series left in shared memory by processes killed before
+    detaching, or killed while publishing them.
+
+    Series with any live process attached are kept. The series are found
+    from their lock files in the temporary folder, so the segments of every
+    store and version are swept.
+
+    Returns:
+        list[str]: Keys of the series removed
+    """
+    removed = []
+    for path in sorted(Path(tempfile.gettempdir()).glob(f"{SHARED_PREFIX}*.lock")):
+        key = path.stem
+        with _locked(key):
+            if not _is_referenced(key) and _remove_segments(key):
+                removed.append(key)
+
+    metrics.count("shared_series_removed", len(removed))
+    return removed
@@ -0,0 +1,220 @@
+import shutil
+import tempfile
+from contextlib import contextmanager
+from functools import lru_cache
+from itertools import chain
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator, Union
+
+from b3_series.config import Config, FSType
+from b3_series.files import atomic_write
+
+# S3 requires every part of a multipart upload but the last to have 5 MiB or more
+MULTIPART_CHUNK_SIZE = 8 * 1024 * 1024
+
+Content = Union[bytes, Iterable[bytes], BinaryIO]
+
+
+def _chunks(content: Content, chunk_size: int) -> Iterator[bytes]:
+    """
+    Iterate over the content in blocks, whatever form it was given in.
+    """
+    if isinstance(content, (bytes, bytearray, memoryview)):
+        content = memoryview(content)
+        for start in range(0, len(content), chunk_size):
+            yield content[start : start + chunk_size]
+    elif hasattr(content, "read"):
+        yield from iter(lambda: content.read(chunk_size), b"")
+    else:
+        yield from content
+
+
+class LocalStorage:
+    """
+    Series stored as files of a local folder.
+    """
+
+    def __init__(self, path: str):
+        self.root = path
+
+    def path(self, name: str) -> str:
+        return f"{self.root}/{name}"
+
+    def refresh(self):
+        pass
+
+    def list(self) -> list[str]:
+        folder = Path(self.root)
+        folder.exists() or folder.mkdir(parents=True)
+        return [file.name for file in folder.iterdir()]
+
+    def modified_at(self, name: str) -> float:
+        path = Path(self.path(name))
+        return path.stat().st_mtime if path.exists() else None
+
+    @contextmanager
+    def open(self, name: str) -> Iterator[BinaryIO]:
+        with open(self.path(name), "rb") as f:
+            yield f
+
+    def write(self, name: str, content: Content) -> int:
+        """
+        Write the content block by block to a partial file, which replaces
+        the series only once complete.
+        """
+        Path(self.root).mkdir(parents=True, exist_ok=True)
+
+        written = 0
+        with atomic_write(self.path(name)) as partial, open(partial, "wb") as f:
+            for chunk in _chunks(content, MULTIPART_CHUNK_SIZE):
+                written += f.write(chunk)
+        return written
+
+    def remove(self, name: str):
+        Path(self.path(name)).unlink()
+
+
+class S3Storage:
+    """
+    Series stored as objects under a prefix of an S3 bucket.
+
+    Writes are sent as multipart uploads of MULTIPART_CHUNK_SIZE parts, so
+    only one part is held in memory at a time. Listings are cached until
+    the storage writes or removes an object, or refresh() is called.
+    """
+
+    def __init__(self, path: str, endpoint_url: str = None, client=None):
+        bucket, _, prefix = path.removeprefix("s3://").partition("/")
+        self.bucket = bucket
+        self.prefix = f"{prefix.strip('/')}/" if prefix.strip("/") else ""
+        self.endpoint_url = endpoint_url
+        self._client = client
+        self._listing = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            try:
+                import boto3
+            except ImportError as error:
+                raise ImportError(
+                    "S3 storage requires boto3: pip install b3-series[s3]"
+                ) from error
+            self._client = boto3.client("s3", endpoint_url=self.endpoint_url)
+        return self._client
+
+    def _key(self, name: str) -> str:
+        return f"{self.prefix}{name}"
+
+    def path(self, name: str) -> str:
+        return f"s3://{self.bucket}/{self._key(name)}"
+
+    def refresh(self):
+        self._listing = None
+
+    def _list_objects(self) -> dict[str, float]:
+        if self._listing is None:
+            listing = {}
+            paginator = self.client.get_paginator("list_objects_v2")
+            for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix):
+                for item in page.get("Contents", []):
+                    name = item["Key"][len(self.prefix) :]
+                    if name and "/" not in name:
+                        listing[name] = item["LastModified"].timestamp()
+            self._listing = listing
+        return self._listing
+
+    def list(self) -> list[str]:
+        return list(self._list_objects())
+
+    def modified_at(self, name: str) -> float:
+        return self._list_objects().get(name)
+
+    @contextmanager
+    def open(self, name: str) -> Iterator[BinaryIO]:
+        """
+        Download the object to a temporary file, as zip files need to seek.
+        """
+        with tempfile.TemporaryFile() as f:
+            body = self.client.get_object(Bucket=self.bucket, Key=self._key(name))
+            shutil.copyfileobj(body["Body"], f, MULTIPART_CHUNK_SIZE)
+            f.seek(0)
+            yield f
+
+    def write(self, name: str, content: Content) -> int:
+        try:
+            return self._upload(self._key(name), content)
+        finally:
+            self.refresh()
+
+    def _upload(self, key: str, content: Content) -> int:
+        chunks = _chunks(content, MULTIPART_CHUNK_SIZE)
+
+        # buffer up to one part, so small files are sent in a single request
+        buffer = bytearray()
+        for chunk in chunks:
+            buffer += chunk
+            if len(buffer) >= MULTIPART_CHUNK_SIZE:
+                break
+        else:
+            self.client.put_object(Bucket=self.bucket, Key=key, Body=bytes(buffer))
+            return len(buffer)
+
+        upload = self.client.create_multipart_upload(Bucket=self.bucket, Key=key)
+        parts = []
+        written = 0
+
+        def upload_part(data: bytes):
+            part_number = len(parts) + 1
+            response = self.client.upload_part(
+                Bucket=self.bucket,
+                Key=key,
+                UploadId=upload["UploadId"],
+                PartNumber=part_number,
+                Body=data,
+            )
+            parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+            return len(data)
+
+        try:
+            for chunk in chain([b""], chunks):
+                buffer += chunk
+                while len(buffer) >= MULTIPART_CHUNK_SIZE:
+                    written += upload_part(bytes(buffer[:MULTIPART_CHUNK_SIZE]))
+                    del buffer[:MULTIPART_CHUNK_SIZE]
+            if buffer:
+                written += upload_part(bytes(buffer))
+
+            self.client.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=key,
+                UploadId=upload["UploadId"],
+                MultipartUpload={"Parts": parts},
+            )
+        except BaseException:
+            self.client.abort_multipart_upload(
+                Bucket=self.bucket, Key=key, UploadId=upload["UploadId"]
+            )
+            raise
+
+        return written
+
+    def remove(self, name: str):
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(name))
+        self.refresh()
+
+
+@lru_cache(maxsize=None)
+def _cached_storage(fs_type: FSType, fs_path: str, endpoint_url: str):
+    if fs_type == FSType.s3:
+        return S3Storage(fs_path, endpoint_url)
+    return LocalStorage(fs_path)
+
+
+def get_storage(config=Config()) -> Union[LocalStorage, S3Storage]:
+    """
+    Storage backend of the config, shared by the calls using the same settings
+    so S3 listings are cached between them. The syncs refresh it when they
+    start, to see the series changed by other processes meanwhile.
+    """
+    return _cached_storage(config.fs_type, config.fs_path, config.s3_endpoint_url)
@@ -1,8 +1,51 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
 from time import perf_counter, time
+from typing import TYPE_CHECKING
 
 from b3_series.config import Config
-from b3_series.io import get_absolute_series_path, list_series
-from b3_series.pandas import load_compressed_series
+from b3_series.dataset import remove_dataset_series, sync_dataset, write_dataset
+from b3_series.files import atomic_write
+from b3_series.index import (
+    INDEX_SORT_COLUMNS,
+    INDEX_VERSION,
+    has_ticker_index,
+    remove_ticker_indexes,
+    write_ticker_index,
+)
+from b3_series.io import (
+    get_absolute_series_path,
+    list_series,
+    require_local_storage,
+)
+from b3_series.jobs import JobQueue, run_jobs
+from b3_series.metrics import RunReport, metrics, run_report
+from b3_series.names import serie_stem, superseding_stems
+from b3_series.options import has_options_index, remove_options, write_options
+from b3_series.parquet import write_parquet_file
+from b3_series.schema import PARSER_VERSION
+from b3_series.storage import get_storage
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+MANIFEST = ".parquets_manifest.json"
+
+# settings of the parquet writer recorded in the manifest, see write_parquet_file
+WRITER_SETTINGS = [
+    "parquet_engine",
+    "parquet_codec",
+    "parquet_codec_level",
+    "parquet_dictionary",
+    "row_group_size",
+]
+CONVERSION_JOURNAL = ".sync_parquets_jobs.json"
 
 
 def _replace_zip_name_with_parquet(zip_name: str):
@@ -12,59 +55,297 @@ def _replace_zip_name_with_parquet(zip_name: str):
     return str(res)
 
 
-def _convert_zip_to_parquet(zip_name: str, config=Config()) -> str:
-
-    print(f"Converting {zip_name} to parquet...")
-    start_time = perf_counter()
+def write_parquet(
+    df: pd.DataFrame, parquet_name: str, config=Config(), sources: list[str] = None
+) -> str:
+    """
+    Write a parsed series as a parquet file, index its tickers, add its
+    options to the options store and, when config.partitioned_dataset is set,
+    write it to the partitioned dataset.
 
-    parquet_name = _replace_zip_name_with_parquet(zip_name)
-    zip_path = get_absolute_series_path(zip_name, config)
+    The records are sorted by ticker, so the records of a ticker are read
+    from a few row groups instead of the whole file. The file is written
+    aside and swapped in once complete, so readers never see it half-written,
+    with the engine, codec and row groups set in the config.
+    Files consolidated from other series record them as their sources.
+    """
+    df = df.sort_values(INDEX_SORT_COLUMNS, kind="stable", ignore_index=True)
     parquet_path = get_absolute_series_path(parquet_name, config)
 
-    df = load_compressed_series(zip_path)
+    with atomic_write(parquet_path) as partial:
+        write_parquet_file(
+            str(partial),
+            df,
+            config,
+            custom_metadata={"sources": json.dumps(sources)} if sources else None,
+        )
+    write_ticker_index(parquet_name, df, config)
+    write_options(parquet_name, df, config)
+    if config.partitioned_dataset:
+        write_dataset(parquet_name, df, config)
 
-    df.to_parquet(parquet_path, compression="gzip")
+    return parquet_path
+
+
+def _parquet_sources(parquet_path: str) -> list[str]:
+    """
+    Series a parquet file was consolidated from, or None if it was converted
+    from its own zip file.
+    """
+    import fastparquet
 
-    end_time = perf_counter()
-    print(f"Converted {zip_name} to parquet. Time elapsed: {end_time - start_time}")
+    sources = fastparquet.ParquetFile(parquet_path).key_value_metadata.get("sources")
+    return json.loads(sources) if sources else None
+
+
+def _convert_zip_to_parquet(zip_name: str, config=Config()) -> str:
+    """
+    Convert a zip file to parquet, validating its records while they are
+    parsed. The invalid records are written to the quarantine folder instead.
+    """
+    from b3_series.pandas import load_compressed_series
+    from b3_series.validation import SeriesValidator, write_quarantine
+
+    with metrics.span("convert_zip_to_parquet", serie=zip_name):
+        parquet_name = _replace_zip_name_with_parquet(zip_name)
+        zip_path = get_absolute_series_path(zip_name, config)
+
+        start_time = perf_counter()
+        validator = SeriesValidator()
+        df = load_compressed_series(
+            zip_path, compact=config.compact_schema, validator=validator
+        )
+        parse_seconds = perf_counter() - start_time
+
+        parquet_path = write_parquet(df, parquet_name, config)
+        quarantined = write_quarantine(parquet_name, validator.finish(), config)
+
+    metrics.count("rows_parsed", len(df))
+    metrics.count("rows_quarantined", quarantined)
+    metrics.gauge("rows_per_second", len(df) / parse_seconds, serie=zip_name)
+    metrics.count(
+        "bytes_written", os.path.getsize(parquet_path), stage="convert_zip_to_parquet"
+    )
 
     return parquet_path
 
 
+def _convert_zip_to_parquet_in_worker(
+    zip_name: str, config=Config()
+) -> tuple[str, list[dict]]:
+    """
+    Convert a zip file in a worker process, returning the metrics events
+    recorded meanwhile so the parent process can replay them.
+    """
+    with metrics.collect() as events:
+        parquet_path = _convert_zip_to_parquet(zip_name, config)
+    return parquet_path, events
+
+
 def _convert_parquets(
     zip_names: list[str], timeout_in_minutes=4, config=Config()
 ) -> list[str]:
-    converted_parquets = []
-    timeout = time() + 60 * timeout_in_minutes
+    """
+    Convert the zip files, config.conversion_workers processes at a time when
+    it is greater than one.
+
+    The conversions are tracked in a job queue persisted under config.fs_path,
+    so a failed conversion is retried with an exponential backoff without
+    aborting the others. No conversion is started after the timeout is
+    reached, but the conversions already running are allowed to finish.
+    """
+    queue = JobQueue(CONVERSION_JOURNAL, config)
+    queue.enqueue(zip_names)
 
-    for zip_name in zip_names:
-        current_time = time()
-        if current_time > timeout:
-            print(
-                f"Timeout of {timeout_in_minutes} minutes reached. Stopping conversion."
-            )
-            break
+    if config.conversion_workers <= 1:
+        return run_jobs(
+            queue, partial(_convert_zip_to_parquet, config=config), timeout_in_minutes
+        )
 
-        parquet_name = _convert_zip_to_parquet(zip_name, config)
-        converted_parquets.append(parquet_name)
+    results = run_jobs(
+        queue,
+        partial(_convert_zip_to_parquet_in_worker, config=config),
+        timeout_in_minutes,
+        config.conversion_workers,
+        ProcessPoolExecutor,
+    )
 
+    converted_parquets = []
+    for parquet_path, events in results:
+        metrics.replay(events)
+        converted_parquets.append(parquet_path)
     return converted_parquets
 
 
-def sync_parquets(config=Config()):
-    zip_series = list_series("zip", config=config)
+def _load_manifest(config=Config()) -> dict[str, dict]:
+    path = Path(get_absolute_series_path(MANIFEST, config))
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text())
+
+
+def _save_manifest(manifest: dict[str, dict], config=Config()):
+    with atomic_write(get_absolute_series_path(MANIFEST, config)) as partial:
+        partial.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+
+
+def _hash_series(zip_name: str, config=Config()) -> str:
+    digest = hashlib.sha256()
+    with open(get_absolute_series_path(zip_name, config), "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _fingerprint(zip_name: str, previous: dict = None, config=Config()) -> dict:
+    """
+    Fingerprint of a zip file and of the parser and writer settings used to
+    convert it.
+
+    The content hash is only computed when the size or the modification time
+    differ from the previous fingerprint, so unchanged files are not read.
+    """
+    stat = os.stat(get_absolute_series_path(zip_name, config))
+    fingerprint = {
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+        "parser_version": PARSER_VERSION,
+        "compact_schema": config.compact_schema,
+        "index_version": INDEX_VERSION,
+        **{setting: getattr(config, setting) for setting in WRITER_SETTINGS},
+    }
+
+    previous = previous or {}
+    unchanged = all(previous.get(key) == fingerprint[key] for key in ["size", "mtime"])
+    if unchanged and "sha256" in previous:
+        fingerprint["sha256"] = previous["sha256"]
+    else:
+        fingerprint["sha256"] = _hash_series(zip_name, config)
+
+    return fingerprint
+
+
+def _find_outdated_parquets(
+    zip_series: list[str], manifest: dict[str, dict], config=Config()
+) -> tuple[list[str], dict[str, dict]]:
+    """
+    Find the zip files whose parquet file is missing or outdated.
+
+    A parquet file is outdated when the content of its zip file, the parser
+    settings or the writer settings changed since it was converted, or when
+    it has no ticker index or options index. Writer settings missing from a
+    fingerprint, recorded before they were tracked, are taken as unchanged.
+    Parquet files converted before the manifest existed are kept when they
+    are newer than their zip file and were not consolidated from other series.
+    Zip files superseded by an existing parquet file, such as the daily files
+    of a consolidated month, are not converted.
+
+    Returns:
+        tuple[list[str], dict[str, dict]]: The zip files to convert and the
+            current fingerprint of every zip file
+    """
     parquet_series = list_series("parquet", config=config)
+    parquet_stems = {serie_stem(parquet_serie) for parquet_serie in parquet_series}
 
-    # for each zip file, check if the parquet file exists
-    missing_parquets = []
+    outdated_parquets = []
+    fingerprints = {}
     for zip_serie in zip_series:
+        previous = manifest.get(zip_serie)
+        fingerprint = _fingerprint(zip_serie, previous, config)
+        fingerprints[zip_serie] = fingerprint
+
         parquet_serie = _replace_zip_name_with_parquet(zip_serie)
+        if any(stem in parquet_stems for stem in superseding_stems(zip_serie)):
+            continue
         if parquet_serie not in parquet_series:
-            missing_parquets.append(zip_serie)
+            outdated_parquets.append(zip_serie)
+        elif not has_ticker_index(parquet_serie, config):
+            outdated_parquets.append(zip_serie)
+        elif not has_options_index(parquet_serie, config):
+            outdated_parquets.append(zip_serie)
+        elif previous is None:
+            parquet_path = get_absolute_series_path(parquet_serie, config)
+            if os.stat(parquet_path).st_mtime < fingerprint["mtime"]:
+                outdated_parquets.append(zip_serie)
+            elif _parquet_sources(parquet_path) is not None:
+                outdated_parquets.append(zip_serie)
+        elif any(
+            previous.get(key) != fingerprint[key]
+            for key in ["sha256", "parser_version", "compact_schema", "index_version"]
+        ) or any(
+            setting in previous and previous[setting] != fingerprint[setting]
+            for setting in WRITER_SETTINGS
+        ):
+            outdated_parquets.append(zip_serie)
+
+    return outdated_parquets, fingerprints
+
+
+def sync_parquets(config=Config(), timeout_in_minutes=3) -> RunReport:
+    """
+    Convert the zip files whose parquet file is missing or outdated.
+
+    No conversion is started after timeout_in_minutes, and the zip files left
+    are converted by the next run. When config.partitioned_dataset is set,
+    the parquet files missing from the dataset are then written to it within
+    the same time budget.
+
+    Returns:
+        RunReport: The converted parquet files and the zip files still
+            waiting for conversion, with the counters recorded during the run
+    """
+    from b3_series.validation import remove_quarantine
+
+    require_local_storage("Converting the series", config)
+    get_storage(config).refresh()
+
+    with run_report("sync_parquets") as report:
+        deadline = time() + 60 * timeout_in_minutes
+        zip_series = list_series("zip", config=config)
+        manifest = _load_manifest(config)
+
+        # for each zip file, check if the parquet file exists and is up to date
+        missing_parquets, fingerprints = _find_outdated_parquets(
+            zip_series, manifest, config
+        )
+
+        # for each missing parquet file, load the zip file and convert it to parquet
+        converted_parquets = _convert_parquets(
+            missing_parquets, timeout_in_minutes, config
+        )
+
+        # record the fingerprints of the unchanged and of the converted zip files,
+        # keeping the previous fingerprints of the zip files still outdated
+        updated_manifest = {}
+        for zip_serie in zip_series:
+            if zip_serie not in missing_parquets:
+                updated_manifest[zip_serie] = fingerprints[zip_serie]
+            elif zip_serie in manifest:
+                updated_manifest[zip_serie] = manifest[zip_serie]
+
+        zip_names = {
+            _replace_zip_name_with_parquet(zip_serie): zip_serie
+            for zip_serie in missing_parquets
+        }
+        converted_zips = [
+            zip_names[Path(parquet_path).name] for parquet_path in converted_parquets
+        ]
+        for zip_serie in converted_zips:
+            updated_manifest[zip_serie] = fingerprints[zip_serie]
+        _save_manifest(updated_manifest, config)
+        parquet_series = list_series("parquet", config=config)
+        if config.partitioned_dataset:
+            sync_dataset(parquet_series, config, max(deadline - time(), 0) / 60)
+        remove_ticker_indexes(parquet_series, config)
+        remove_options(parquet_series, config)
+        remove_quarantine(parquet_series, config)
+        remove_dataset_series(parquet_series, config)
 
-    # for each missing parquet file, load the zip file and convert it to parquet
-    converted_parquets = _convert_parquets(missing_parquets, 3, config)
+        report.completed = converted_parquets
+        report.remaining = [
+            zip_serie
+            for zip_serie in missing_parquets
+            if zip_serie not in converted_zips
+        ]
 
-    # print the results
-    print(f"Converted {len(converted_parquets)} parquets.")
-    print(f"{len(missing_parquets) - len(converted_parquets)} remaining.")
+    return report
@@ -1,17 +1,121 @@
-from datetime import datetime
-from time import perf_counter, time
+from __future__ import annotations
 
-from b3_api.historical_series_available import DataSeries, historical_series_available
-from b3_api.historical_series_download import historical_series_download
+import logging
+from datetime import datetime
+from functools import lru_cache
+from time import sleep, time
+from typing import TYPE_CHECKING, Callable, Iterator
 
 from b3_series.config import Config
-from b3_series.io import list_series, remove_series, save_series
+from b3_series.io import (
+    list_series,
+    remove_series,
+    require_local_storage,
+    save_series,
+)
+from b3_series.jobs import FAILED, JobQueue, backoff_seconds, run_jobs
+from b3_series.metrics import RunReport, metrics, run_report
+from b3_series.storage import get_storage
+from b3_series.sync_parquets import _replace_zip_name_with_parquet
+from b3_series.zipstream import ZipStreamDecoder
+
+if TYPE_CHECKING:
+    import requests
+    from b3_api.historical_series_available import AvailableSeries, DataSeries
+
+CATALOG_SNAPSHOT = ".available_series.json"
+DOWNLOAD_JOURNAL = ".sync_series_jobs.json"
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_TIMEOUT = 60
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=None)
+def _cached_http_session(pool_size: int, requests_per_second: float):
+    import requests
+    from requests_ratelimiter import LimiterAdapter
+
+    adapter = LimiterAdapter(
+        per_second=requests_per_second,
+        pool_connections=1,
+        pool_maxsize=pool_size,
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_http_session(config=Config()) -> requests.Session:
+    """
+    HTTP session shared by all the downloads of the same settings.
+
+    Its connection pool keeps up to config.download_workers connections alive,
+    so concurrent and consecutive downloads reuse them instead of opening one
+    per series, and the requests to B3 are rate limited to
+    config.download_requests_per_second, like the ones of b3_api.
+    """
+    return _cached_http_session(
+        max(config.download_workers, 1), config.download_requests_per_second
+    )
+
+
+def historical_series_available() -> AvailableSeries:
+    """
+    Fetch the catalog of available series from B3, importing b3_api only then.
+    """
+    from b3_api.historical_series_available import historical_series_available
+
+    return historical_series_available()
+
+
+def _load_available_series(config=Config(), save: bool = True) -> AvailableSeries:
+    """
+    Load the catalog of available series, reusing a recent snapshot.
+
+    The catalog is fetched from B3 at most once per config.catalog_ttl_in_minutes;
+    in between, the snapshot saved under config.fs_path is used instead. The
+    snapshot is also used, however old, when the catalog cannot be fetched.
+    With save=False, as in dry runs, any snapshot is used however old, and a
+    fetched catalog is not saved.
+    """
+    storage = get_storage(config)
+    modified_at = storage.modified_at(CATALOG_SNAPSHOT)
+    ttl = 60 * config.catalog_ttl_in_minutes
+
+    def load_snapshot() -> AvailableSeries:
+        from b3_api.historical_series_available import AvailableSeries
+
+        with storage.open(CATALOG_SNAPSHOT) as f:
+            return AvailableSeries.parse_raw(f.read())
+
+    if modified_at is not None and (not save or time() - modified_at < ttl):
+        return load_snapshot()
+
+    try:
+        available_series = historical_series_available()
+    except Exception as error:
+        if modified_at is None:
+            raise
+        logger.warning(
+            "Failed to fetch the available series: %s. Using the snapshot.", error
+        )
+        return load_snapshot()
+
+    if save:
+        storage.write(CATALOG_SNAPSHOT, available_series.json().encode())
+
+    return available_series
 
 
-def _find_missing_annual_series(existing_files: list[str]) -> list[DataSeries]:
+def _find_missing_annual_series(
+    existing_files: list[str], available_series: AvailableSeries = None
+) -> list[DataSeries]:
     current_year = datetime.now().year
 
-    available_series = historical_series_available()
+    if available_series is None:
+        available_series = historical_series_available()
 
     return [
         serie
@@ -20,12 +124,15 @@ def _find_missing_annual_series(existing_files: list[str]) -> list[DataSeries]:
     ]
 
 
-def _find_missing_monthly_series(existing_files: list[str]) -> list[DataSeries]:
+def _find_missing_monthly_series(
+    existing_files: list[str], available_series: AvailableSeries = None
+) -> list[DataSeries]:
     current_year = str(datetime.now().year)
     current_month = str(datetime.now().month).zfill(2)
     current_month_file_name = f"COTAHIST_M{current_month}{current_year}.ZIP"
 
-    available_series = historical_series_available()
+    if available_series is None:
+        available_series = historical_series_available()
 
     def file_not_exists(x):
         return x.file_name not in existing_files
@@ -42,9 +149,13 @@ def _find_missing_monthly_series(existing_files: list[str]) -> list[DataSeries]:
     return [serie for serie in available_series.monthly_series if accept(serie)]
 
 
-def _find_missing_daily_series(existing_files: list[str]) -> list[DataSeries]:
+def _find_missing_daily_series(
+    existing_files: list[str], available_series: AvailableSeries = None
+) -> list[DataSeries]:
     current_month = f"{str(datetime.now().month).zfill(2)}{str(datetime.now().year)}"
-    available_series = historical_series_available()
+
+    if available_series is None:
+        available_series = historical_series_available()
 
     return [
         serie
@@ -53,49 +164,151 @@ def _find_missing_daily_series(existing_files: list[str]) -> list[DataSeries]:
     ]
 
 
-def _download_serie_content(serie: str) -> bytes:
-    print(f"Downloading serie {serie}...")
-    start_time = perf_counter()
-
-    content = historical_series_download(filename=serie)
-
-    end_time = perf_counter()
-    print(f"Downloaded serie {serie}. Time elapsed: {end_time - start_time}")
-
-    return content
-
-
-def _download_series(series: list[str], timeout_in_minutes: int = 4) -> list[str]:
+def _stream_serie_content(serie: str, config=Config()) -> Iterator[bytes]:
+    """
+    Download a series from config.series_url in chunks of DOWNLOAD_CHUNK_SIZE
+    bytes.
+
+    The requests go through the shared get_http_session. A connection dropped
+    midway is resumed from the last byte received with an HTTP range request,
+    up to config.max_attempts times, so the bytes already received are neither
+    downloaded nor checked again. Servers not honouring the range fail the
+    download instead.
+    """
+    session = get_http_session(config)
+    received = 0
+    attempts = 0
+
+    def wait_to_resume(error: OSError):
+        nonlocal attempts
+        attempts += 1
+        if not received or attempts >= config.max_attempts:
+            raise error
+        logger.warning("Download of %s interrupted: %s. Resuming.", serie, error)
+        metrics.count("retries", serie=serie)
+        sleep(backoff_seconds(attempts, config))
+
+    with metrics.span("download_serie", serie=serie):
+        while True:
+            headers = {"Range": f"bytes={received}-"} if received else {}
+            # the errors of requests are OSError too
+            try:
+                response = session.get(
+                    config.series_url.format(serie),
+                    headers=headers,
+                    stream=True,
+                    timeout=DOWNLOAD_TIMEOUT,
+                )
+            except OSError as error:
+                wait_to_resume(error)
+                continue
+
+            with response:
+                # raised outside of the try blocks, so it is not resumed again
+                expected_status = 206 if received else 200
+                if response.status_code != expected_status:
+                    raise ConnectionError(
+                        f"Cannot resume the download of {serie}"
+                        if received
+                        else f"Download of {serie} failed with HTTP "
+                        f"{response.status_code}"
+                    )
+                try:
+                    for chunk in response.iter_content(DOWNLOAD_CHUNK_SIZE):
+                        received += len(chunk)
+                        metrics.count("bytes_downloaded", len(chunk))
+                        yield chunk
+                    return
+                except OSError as error:
+                    wait_to_resume(error)
+
+
+def _download_serie(serie: str, config=Config()) -> str:
+    """
+    Download a series straight into the storage, checking it on the way.
+
+    The zip file is decompressed as it arrives, so its CRC-32 is checked
+    without reading it again, and a corrupt or truncated download raises
+    zipfile.BadZipFile before replacing the stored series. With
+    config.convert_on_download the decompressed records are also parsed
+    meanwhile, and the parquet file is written once the download is checked,
+    with the invalid records in the quarantine folder.
+    """
+    import pandas as pd
+
+    from b3_series.pandas import SeriesStreamParser, compact_dtypes, empty_dataframe
+    from b3_series.sync_parquets import write_parquet
+    from b3_series.validation import SeriesValidator, write_quarantine
+
+    decoder = ZipStreamDecoder()
+    validator = SeriesValidator()
+    parser = SeriesStreamParser(compact=config.compact_schema, validator=validator)
+    frames = []
+
+    def checked_chunks():
+        for chunk in _stream_serie_content(serie, config):
+            content = decoder.feed(chunk)
+            if config.convert_on_download:
+                frames.extend(parser.feed(content))
+            yield chunk
+        decoder.close()
+
+    save_series(serie, checked_chunks(), config)
+
+    if config.convert_on_download:
+        frames.extend(parser.close())
+        df = (
+            pd.concat(frames, ignore_index=True)
+            if frames
+            else empty_dataframe(config.compact_schema)
+        )
+        if config.compact_schema:
+            df = df.astype(compact_dtypes())
+
+        parquet_name = _replace_zip_name_with_parquet(serie)
+        write_parquet(df, parquet_name, config)
+        quarantined = write_quarantine(parquet_name, validator.finish(), config)
+        metrics.count("rows_parsed", len(df))
+        metrics.count("rows_quarantined", quarantined)
+
+    return serie
+
+
+def _download_series(
+    series: list[str],
+    timeout_in_minutes: int = 4,
+    config=Config(),
+    on_download: Callable[[str], None] = None,
+) -> list[str]:
     """
     Download the data series.
 
     Args:
         series (list[str]): A list of data series to download.
         timeout_in_minutes (int, optional): Timeout duration in minutes. Defaults to 4.
+        config (Config, optional): Storage and concurrency settings.
+        on_download (Callable[[str], None], optional): Called with every
+            series once it is downloaded.
 
     Returns:
         list[str]: A list of completed data series.
 
-    The function downloads the data series one by one. It sets a timeout
-    based on the provided duration (default is 4 minutes) and gracefully stops
-    downloading if the timeout is reached. The function keeps track of the completed
-    downloads and returns it.
+    The function downloads the data series one by one, or config.download_workers
+    at a time when it is greater than one. The downloads are tracked in a job
+    queue persisted under config.fs_path, so a failed download is retried with
+    an exponential backoff without aborting the others, and the series left by
+    the timeout (default is 4 minutes) are resumed by the next run.
     """
-    completed = []
-    timeout = time() + 60 * timeout_in_minutes
-
-    # download the missing series one by one
-    for filename in series:
-        current_time = time()
-        if current_time > timeout:
-            print(f"Timeout of {timeout_in_minutes} minutes reached. Stopping.")
-            break
+    queue = JobQueue(DOWNLOAD_JOURNAL, config)
+    queue.enqueue(series)
 
-        content = _download_serie_content(filename)
-        save_series(filename, content)
-        completed.append(filename)
+    def download(serie: str) -> str:
+        _download_serie(serie, config)
+        if on_download is not None:
+            on_download(serie)
+        return serie
 
-    return completed
+    return run_jobs(queue, download, timeout_in_minutes, config.download_workers)
 
 
 def _cleanup_duplicated_data(config=Config()):
@@ -116,33 +329,72 @@ def _cleanup_duplicated_data(config=Config()):
             if filename.upper().startswith("COTAHIST_M") and not month_pattern.match(
                 filename
             ):
-                print(f"Removing file {filename}...")
-                remove_series(filename)
+                logger.info("Removing file %s", filename)
+                remove_series(filename, config)
             if filename.upper().startswith("COTAHIST_D") and not daily_pattern.match(
                 filename
             ):
-                print(f"Removing file {filename}...")
-                remove_series(filename)
+                logger.info("Removing file %s", filename)
+                remove_series(filename, config)
+
 
+def _find_missing_series(config=Config(), save_catalog: bool = True) -> list[str]:
+    """
+    File names of the available series that are not in the storage yet.
 
-def sync_series(config=Config()):
+    With save_catalog=False nothing is written to the storage, see
+    _load_available_series.
+    """
     existing_files = list_series(config=config)
+    available_series = _load_available_series(config, save_catalog)
     missing_series = []
 
-    missing_series += _find_missing_annual_series(existing_files)
-    missing_series += _find_missing_monthly_series(existing_files)
-    missing_series += _find_missing_daily_series(existing_files)
+    missing_series += _find_missing_annual_series(existing_files, available_series)
+    missing_series += _find_missing_monthly_series(existing_files, available_series)
+    missing_series += _find_missing_daily_series(existing_files, available_series)
 
     # convert to a list of file names
-    missing_series = [serie.file_name for serie in missing_series]
+    return [serie.file_name for serie in missing_series]
+
+
+def sync_series(
+    config=Config(),
+    timeout_in_minutes: int = 4,
+    on_download: Callable[[str], None] = None,
+) -> RunReport:
+    """
+    Download the missing series and remove the superseded ones.
+
+    Args:
+        config (Config, optional): Storage and concurrency settings.
+        timeout_in_minutes (int, optional): No download is started after it.
+            Defaults to 4.
+        on_download (Callable[[str], None], optional): Called with every
+            series once it is downloaded, while the others are downloaded.
+
+    Returns:
+        RunReport: The downloaded and the still missing series, with the
+            counters recorded during the run
+    """
+    if config.convert_on_download:
+        require_local_storage("Converting the series on download", config)
+    get_storage(config).refresh()
+
+    with run_report("sync_series") as report:
+        missing_series = _find_missing_series(config)
+
+        # download the missing series
+        completed = _download_series(
+            missing_series, timeout_in_minutes, config, on_download
+        )
 
-    # download the missing series
-    completed = _download_series(missing_series)
+        _cleanup_duplicated_data(config=config)
 
-    # print the results
-    print(f"Downloaded {len(completed)} series.")
-    print(f"Missing {len(missing_series) - len(completed)} series.")
+        failed = JobQueue(DOWNLOAD_JOURNAL, config).names(FAILED)
+        if failed:
+            logger.warning("Gave up on %d series: %s.", len(failed), ", ".join(failed))
 
-    _cleanup_duplicated_data(config=config)
+        report.completed = completed
+        report.remaining = [serie for serie in missing_series if serie not in completed]
 
-    return len(missing_series)
+    return report
@@ -0,0 +1,266 @@
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from b3_series.config import Config
+from b3_series.files import atomic_write, remove_files_except
+from b3_series.io import get_absolute_series_path
+from b3_series.parquet import write_parquet_file
+from b3_series.schema import ENCODING, RECORD_LENGTH
+
+QUARANTINE_FOLDER = "quarantine"
+
+# the historical series start in 1986
+FIRST_TRADING_DATE = date(1986, 1, 1)
+
+# null dates of the series
+NULL_DATES = [0, 99991231]
+
+# reasons of the problems of a whole file rather than of a record
+FILE_REASONS = ["missing_header", "missing_trailer", "record_count"]
+
+# position of the record count in the trailer record
+_TRAILER_COUNT = slice(31, 42)
+
+_PRICES = ["preco_abertura", "preco_maximo", "preco_minimo", "preco_ultimo"]
+
+
+def _date_number(day: date) -> int:
+    return day.year * 10000 + day.month * 100 + day.day
+
+
+def quarantine_path(parquet_name: str, config=Config()) -> Path:
+    return Path(get_absolute_series_path(QUARANTINE_FOLDER, config)) / parquet_name
+
+
+class SeriesValidator:
+    """
+    Check the records of a series while they are parsed.
+
+    The parser hands every block of records to check_layout before parsing
+    it and the parsed fields to check_values, so the checks reuse the parsed
+    values and cost a few vectorized comparisons per record. Invalid
+    quotation records are left out of the parsed series and recorded with
+    the reasons they failed, and finish adds the problems of the whole file:
+
+        - record_length: the record does not have RECORD_LENGTH characters
+        - tipo_registro: the record type is not 00, 01 or 99
+        - missing_header, missing_trailer: the file has no header or trailer
+          record, like truncated downloads
+        - record_count: the trailer count differs from the records of the file
+        - data_pregao: the trading date is not a date of the period
+        - data_vencimento: the expiry is not a date
+        - ohlc: the open or the close are out of the min-max range
+
+    Args:
+        period (tuple[date, date], optional): First and last trading dates
+            allowed. Defaults to the dates from 1986 until today.
+    """
+
+    def __init__(self, period: tuple[date, date] = None):
+        first_day, last_day = period or (FIRST_TRADING_DATE, date.today())
+        self.first_day = _date_number(max(first_day, FIRST_TRADING_DATE))
+        self.last_day = _date_number(min(last_day, date.today()))
+        self.records = 0
+        self.headers = 0
+        self._trailer = None
+        self._issues = []
+
+    def _flag(self, records: np.ndarray, numbers: np.ndarray, checks: list):
+        """
+        Record the records failing any of the (reason, failed mask) checks.
+        """
+        failed = np.zeros(len(records), dtype=bool)
+        for _, mask in checks:
+            failed |= mask
+        if not failed.any():
+            return
+
+        reasons = [[] for _ in range(failed.sum())]
+        for reason, mask in checks:
+            for position in np.flatnonzero(mask[failed]):
+                reasons[position].append(reason)
+
+        self._issues.append(
+            pd.DataFrame(
+                {
+                    "record_number": numbers[failed],
+                    "reasons": [",".join(reason) for reason in reasons],
+                    "record": [
+                        bytes(record).decode(ENCODING).rstrip()
+                        for record in records[failed]
+                    ],
+                }
+            )
+        )
+
+    def check_layout(
+        self, records: np.ndarray, lengths: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Check the length and the type of the next block of records.
+
+        Args:
+            records (np.ndarray): The (n x RECORD_LENGTH) record matrix
+            lengths (np.ndarray): The length of each record, without line break
+
+        Returns:
+            tuple[np.ndarray, np.ndarray]: The mask of the valid quotation
+                records and the number of each record in the file
+        """
+        numbers = np.arange(self.records + 1, self.records + len(records) + 1)
+        self.records += len(records)
+
+        first, second = records[:, 0], records[:, 1]
+        quotes = (first == ord("0")) & (second == ord("1"))
+        headers = (first == ord("0")) & (second == ord("0"))
+        trailers = (first == ord("9")) & (second == ord("9"))
+
+        self.headers += int(headers.sum())
+        if trailers.any():
+            position = np.flatnonzero(trailers)[-1]
+            self._trailer = (numbers[position], records[position])
+
+        bad_length = lengths != RECORD_LENGTH
+        bad_type = ~(quotes | headers | trailers)
+        self._flag(
+            records,
+            numbers,
+            [("record_length", bad_length), ("tipo_registro", bad_type)],
+        )
+
+        return quotes & ~bad_length, numbers
+
+    def check_values(
+        self, records: np.ndarray, numbers: np.ndarray, data: dict, fields: dict
+    ) -> np.ndarray:
+        """
+        Check the dates and the prices of parsed quotation records.
+
+        Args:
+            records (np.ndarray): The quotation records
+            numbers (np.ndarray): The number of each record in the file
+            data (dict): The parsed columns, where invalid dates are NaT
+            fields (dict): The integer values and blank masks of the date and
+                price columns, by column name
+
+        Returns:
+            np.ndarray: The mask of the valid records
+        """
+        days, _ = fields["data_pregao"]
+        bad_day = np.isnat(data["data_pregao"])
+        bad_day |= (days < self.first_day) | (days > self.last_day)
+
+        expiries, _ = fields["data_vencimento"]
+        bad_expiry = np.isnat(data["data_vencimento"])
+        for null_date in NULL_DATES:
+            bad_expiry &= expiries != null_date
+
+        (open_, _), (high, _), (low, _), (close, _) = [fields[name] for name in _PRICES]
+        blank = np.zeros(len(records), dtype=bool)
+        for name in _PRICES:
+            blank |= fields[name][1]
+        bad_prices = ~blank & (
+            (open_ < low) | (open_ > high) | (close < low) | (close > high)
+        )
+
+        checks = [
+            ("data_pregao", bad_day),
+            ("data_vencimento", bad_expiry),
+            ("ohlc", bad_prices),
+        ]
+        self._flag(records, numbers, checks)
+        return ~(bad_day | bad_expiry | bad_prices)
+
+    def finish(self) -> pd.DataFrame:
+        """
+        Check the header and the trailer once all the records were checked.
+
+        Returns:
+            pd.DataFrame: The invalid records, with their record_number, the
+                comma-separated reasons and the record itself, plus one row
+                per problem of the file
+        """
+        issues = list(self._issues)
+
+        def add(reason: str, number=None, record: str = ""):
+            issues.append(
+                pd.DataFrame(
+                    {"record_number": [number], "reasons": [reason], "record": [record]}
+                )
+            )
+
+        if self.headers == 0:
+            add("missing_header")
+        if self._trailer is None:
+            add("missing_trailer")
+        else:
+            number, record = self._trailer
+            count = record[_TRAILER_COUNT]
+            expected = int(bytes(count)) if bytes(count).isdigit() else None
+            if expected != self.records:
+                add("record_count", number, bytes(record).decode(ENCODING).rstrip())
+
+        if not issues:
+            return empty_issues()
+
+        df = pd.concat(issues, ignore_index=True)
+        df["record_number"] = df["record_number"].astype("Int64")
+        return df.sort_values("record_number", kind="stable", ignore_index=True)
+
+
+def empty_issues() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "record_number": pd.Series(dtype="Int64"),
+            "reasons": pd.Series(dtype=object),
+            "record": pd.Series(dtype=object),
+        }
+    )
+
+
+def write_quarantine(parquet_name: str, issues: pd.DataFrame, config=Config()) -> int:
+    """
+    Write the invalid records of a series to quarantine/<parquet name>, or
+    remove the quarantine file of a series converted again without issues.
+
+    The file is written aside with the writer settings of the config and
+    swapped in once complete.
+
+    Returns:
+        int: Number of invalid quotation records
+    """
+    path = quarantine_path(parquet_name, config)
+    if issues.empty:
+        path.unlink(missing_ok=True)
+        return 0
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with atomic_write(path) as partial:
+        write_parquet_file(str(partial), issues, config)
+
+    return int((~issues["reasons"].isin(FILE_REASONS)).sum())
+
+
+def remove_quarantine(parquet_names: list[str], config=Config()) -> list[str]:
+    """
+    Remove the quarantine files of parquet files other than the given ones.
+
+    Returns:
+        list[str]: Names of the parquet files whose quarantine file was removed
+    """
+    return remove_files_except(quarantine_path("", config), parquet_names)
+
+
+def read_quarantine(parquet_name: str, config=Config()) -> pd.DataFrame:
+    """
+    Invalid records of a series, empty if it had none.
+    """
+    import fastparquet
+
+    path = quarantine_path(parquet_name, config)
+    if not path.exists():
+        return empty_issues()
+    return fastparquet.ParquetFile(str(path)).to_pandas(index=False)
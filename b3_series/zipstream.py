@@ -0,0 +1,152 @@
+import struct
+import zipfile
+import zlib
+
+_LOCAL_HEADER = struct.Struct("<4sHHHHHLLLHH")
+_LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+_DATA_DESCRIPTOR_SIGNATURE = b"PK\x07\x08"
+_ZIP64_EXTRA_ID = 0x0001
+_DATA_DESCRIPTOR_FLAG = 0x08
+
+
+class ZipStreamDecoder:
+    """
+    Decompress the first member of a zip file as its bytes arrive.
+
+    Zip files keep their directory at the end, but every member is preceded
+    by a local header with its compression method, and its CRC-32 and sizes
+    either there or in a data descriptor right after the data. This allows
+    the member to be decompressed and checked while the file is downloaded,
+    without waiting for the directory.
+
+    Feed the file in any chunks with feed(), which returns the decompressed
+    bytes available so far, and call close() once the file ended to check
+    the CRC-32 and the size of the member.
+    """
+
+    def __init__(self):
+        self._pending = b""
+        self._header = None
+        self._decompressor = None
+        self._remaining = None
+        self._trailer = b""
+        self._crc = 0
+        self._size = 0
+
+    def _parse_header(self) -> bool:
+        if len(self._pending) < _LOCAL_HEADER.size:
+            return False
+
+        (
+            signature,
+            _,
+            flags,
+            method,
+            _,
+            _,
+            crc,
+            compressed_size,
+            size,
+            name_length,
+            extra_length,
+        ) = _LOCAL_HEADER.unpack_from(self._pending)
+        if signature != _LOCAL_HEADER_SIGNATURE:
+            raise zipfile.BadZipFile("File is not a zip file")
+
+        end = _LOCAL_HEADER.size + name_length + extra_length
+        if len(self._pending) < end:
+            return False
+
+        zip64 = False
+        extra = self._pending[end - extra_length : end]
+        while len(extra) >= 4:
+            header_id, length = struct.unpack_from("<HH", extra)
+            if header_id == _ZIP64_EXTRA_ID and length >= 16:
+                size, compressed_size = struct.unpack_from("<QQ", extra, 4)
+                zip64 = True
+            extra = extra[4 + length :]
+
+        descriptor = bool(flags & _DATA_DESCRIPTOR_FLAG)
+        if method == zipfile.ZIP_DEFLATED:
+            self._decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+        elif method != zipfile.ZIP_STORED:
+            raise zipfile.BadZipFile(f"Unsupported compression method {method}")
+        elif descriptor:
+            raise zipfile.BadZipFile("Stored member of unknown size")
+        else:
+            self._remaining = compressed_size
+
+        self._header = {
+            "crc": crc,
+            "size": size,
+            "descriptor": descriptor,
+            "zip64": zip64,
+        }
+        self._pending = self._pending[end:]
+        return True
+
+    @property
+    def finished(self) -> bool:
+        if self._decompressor is not None:
+            return self._decompressor.eof
+        return self._remaining == 0
+
+    def feed(self, chunk: bytes) -> bytes:
+        """
+        Feed the next bytes of the zip file.
+
+        Returns:
+            bytes: The decompressed bytes of the member made available by the chunk
+        """
+        if self.finished:
+            self._trailer = (self._trailer + chunk)[:24]
+            return b""
+
+        self._pending += chunk
+        if self._header is None and not self._parse_header():
+            return b""
+
+        data, self._pending = self._pending, b""
+        if self._decompressor is not None:
+            try:
+                content = self._decompressor.decompress(data)
+            except zlib.error as error:
+                raise zipfile.BadZipFile(str(error)) from error
+            self._trailer = self._decompressor.unused_data[:24]
+        else:
+            content = data[: self._remaining]
+            self._remaining -= len(content)
+            self._trailer = data[len(content) :][:24]
+
+        self._crc = zlib.crc32(content, self._crc)
+        self._size += len(content)
+        return content
+
+    def close(self):
+        """
+        Check that the member was complete and that its CRC-32 and size match.
+
+        Raises:
+            zipfile.BadZipFile: If the file ended early or the member is corrupt
+        """
+        if self._header is None or not self.finished:
+            raise zipfile.BadZipFile(
+                "Zip file ended before the end of its first member"
+            )
+
+        crc, size = self._header["crc"], self._header["size"]
+        if self._header["descriptor"]:
+            trailer = self._trailer
+            if trailer.startswith(_DATA_DESCRIPTOR_SIGNATURE):
+                trailer = trailer[4:]
+            layout = "<LQQ" if self._header["zip64"] else "<LLL"
+            if len(trailer) < struct.calcsize(layout):
+                raise zipfile.BadZipFile("Zip file ended before its data descriptor")
+            crc, _, size = struct.unpack_from(layout, trailer)
+
+        if crc != self._crc:
+            raise zipfile.BadZipFile(
+                f"Bad CRC-32: expected {crc:08x}, got {self._crc:08x}"
+            )
+        if size != self._size:
+            raise zipfile.BadZipFile(f"Bad size: expected {size}, got {self._size}")
@@ -0,0 +1,14 @@
+import pytest
+
+from b3_series.metrics import metrics
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    """
+    Start every test with no counter totals, so counters recorded by one test
+    never leak into the run reports of the next ones.
+    """
+    metrics.reset()
+    yield
+    metrics.reset()
@@ -0,0 +1,147 @@
+import os
+
+import pandas as pd
+import pytest
+
+from b3_series import adjust as adjust_module
+from b3_series.adjust import (
+    _nearest_ratio,
+    adjust_prices,
+    detect_adjustment_events,
+    load_adjusted,
+    load_adjustment_factors,
+    normalize_quotation_factor,
+)
+from b3_series.bench import generate_series
+from b3_series.config import Config
+from b3_series.parquet import write_parquet_file
+from b3_series.sync_parquets import sync_parquets
+
+
+def _records(
+    ticker, opens, closes, distributions, factor=1, market=10, first="2023-01-02"
+):
+    return pd.DataFrame(
+        {
+            "sigla_acao": ticker,
+            "data_pregao": pd.bdate_range(first, periods=len(opens)),
+            "tipo_mercado": market,
+            "preco_abertura": opens,
+            "preco_ultimo": closes,
+            "quantidade_titulos_negociados": 100,
+            "fator_cotacao": factor,
+            "numero_distribuicao": distributions,
+        }
+    )
+
+
+def test_nearest_ratio():
+    assert _nearest_ratio(2.05) == 2
+    assert _nearest_ratio(0.101) == pytest.approx(0.1)
+    # only n:1 splits and 1:n groupings
+    assert pd.isna(_nearest_ratio(1.52))
+    assert pd.isna(_nearest_ratio(2.5))
+    assert pd.isna(_nearest_ratio(1.42))
+
+
+def test_normalize_quotation_factor():
+    df = normalize_quotation_factor(_records("ABEV3", [1000.0], [2000.0], [1], 1000))
+    assert df["preco_abertura"].tolist() == [1.0]
+    assert df["preco_ultimo"].tolist() == [2.0]
+
+
+def test_detect_adjustment_events():
+    df = pd.concat(
+        [
+            # 2:1 split on the third day, then a 10:1 grouping on the fifth
+            _records(
+                "ABEV3",
+                [20.0, 20.5, 10.3, 10.2, 101.0],
+                [20.0, 20.6, 10.1, 10.0, 100.0],
+                [1, 1, 2, 2, 3],
+            ),
+            # a price jump without a new distribution is not an event
+            _records("PETR4", [10.0, 20.0], [10.0, 20.0], [1, 1]),
+            # nor the price jumps of the options market
+            _records("PETRA10", [1.0, 2.0], [1.0, 2.0], [1, 2], market=70),
+        ]
+    )
+
+    events = detect_adjustment_events(df)
+
+    assert events["sigla_acao"].tolist() == ["ABEV3", "ABEV3"]
+    assert events["data_pregao"].tolist() == list(
+        pd.to_datetime(["2023-01-04", "2023-01-06"])
+    )
+    assert events["fator"].tolist() == pytest.approx([2, 0.1])
+
+    adjusted = adjust_prices(df)
+    abev3 = adjusted[adjusted["sigla_acao"] == "ABEV3"]
+    assert abev3["fator_ajuste"].tolist() == pytest.approx([0.2, 0.2, 0.1, 0.1, 1])
+    assert abev3["preco_ultimo"].tolist() == pytest.approx(
+        [100.0, 103.0, 101.0, 100.0, 100.0]
+    )
+    assert abev3["quantidade_titulos_negociados"].tolist() == pytest.approx(
+        [20, 20, 10, 10, 100]
+    )
+    assert (adjusted[adjusted["sigla_acao"] == "PETR4"]["fator_ajuste"] == 1).all()
+    assert (adjusted[adjusted["sigla_acao"] == "PETRA10"]["fator_ajuste"] == 1).all()
+
+
+def test_load_adjustment_factors_cache(tmp_path, mocker):
+    generate_series(str(tmp_path / "COTAHIST_A2023.ZIP"), 1_000)
+    config = Config(fs_path=str(tmp_path))
+    sync_parquets(config)
+
+    read = mocker.spy(adjust_module, "_read_event_records")
+    load_adjustment_factors(config)
+    load_adjustment_factors(config)
+    assert read.call_count == 1
+
+    parquet_path = tmp_path / "COTAHIST_A2023.parquet"
+    stat = os.stat(parquet_path)
+    os.utime(parquet_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    load_adjustment_factors(config)
+    assert read.call_count == 2
+
+    df = load_adjusted(tickers=["T0001"], config=config)
+    assert (df["sigla_acao"] == "T0001").all()
+    assert (df["fator_ajuste"] == 1).all()
+
+
+def test_load_adjustment_factors_between_files(tmp_path, mocker):
+    config = Config(fs_path=str(tmp_path))
+    # a 2:1 split on the first trading day of February, and a 10:1 grouping
+    # within February
+    months = {
+        "COTAHIST_M012023.parquet": _records(
+            "ABEV3", [20.0, 20.5], [20.0, 20.6], [1, 1], first="2023-01-30"
+        ),
+        "COTAHIST_M022023.parquet": _records(
+            "ABEV3",
+            [10.3, 10.2, 101.0],
+            [10.1, 10.0, 100.0],
+            [2, 2, 3],
+            first="2023-02-01",
+        ),
+    }
+    for name, df in months.items():
+        write_parquet_file(str(tmp_path / name), df, config)
+
+    events = load_adjustment_factors(config)
+
+    assert events["data_pregao"].tolist() == list(
+        pd.to_datetime(["2023-02-01", "2023-02-03"])
+    )
+    assert events["fator"].tolist() == pytest.approx([2, 0.1])
+
+    # only the file replaced is read again
+    read = mocker.spy(adjust_module, "_read_event_records")
+    write_parquet_file(
+        str(tmp_path / "COTAHIST_M022023.parquet"),
+        months["COTAHIST_M022023.parquet"][:2],
+        config,
+    )
+    events = load_adjustment_factors(config)
+    assert read.call_args_list == [mocker.call("COTAHIST_M022023.parquet", config)]
+    assert events["fator"].tolist() == pytest.approx([2])
@@ -0,0 +1,80 @@
+import json
+import subprocess
+import sys
+
+from b3_series.bench import (
+    STARTUP_STATEMENTS,
+    compare_parquet_settings,
+    generate_series,
+    main,
+    run_benchmarks,
+)
+from b3_series.pandas import load_compressed_series
+
+
+def test_generate_series(tmp_path):
+    path = generate_series(str(tmp_path / "COTAHIST_A2023.ZIP"), 1_000)
+
+    df = load_compressed_series(path)
+    assert len(df) == 1_000
+    assert df["data_pregao"].is_monotonic_increasing
+    assert (df["preco_minimo"] <= df["preco_maximo"]).all()
+    assert df["data_vencimento"].notna().any()
+
+
+def test_run_benchmarks():
+    results = run_benchmarks(records=1_000, codecs=["gzip", None], isolate=False)
+
+    assert results["records"] == 1_000
+    assert results["load"][0]["records"] == 1_000
+    assert results["load"][0]["records_per_second"] > 0
+    assert [result["codec"] for result in results["parquet"]] == ["gzip", None]
+    assert results["sync_parquets"]["seconds"] > 0
+    assert [result["statement"] for result in results["startup"]] == list(
+        STARTUP_STATEMENTS
+    )
+
+
+def test_startup_does_not_import_heavy_modules():
+    code = (
+        "import sys, b3_series.sync_series, b3_series.sync_parquets, b3_series.cli; "
+        "print(sorted({'b3_api', 'fastparquet', 'numpy', 'pandas'} & set(sys.modules)))"
+    )
+    output = subprocess.check_output([sys.executable, "-c", code], text=True)
+    assert output.strip() == "[]"
+
+
+def test_main(tmp_path):
+    output = tmp_path / "bench.json"
+    main(["--records", "1000", "--output", str(output)])
+
+    results = json.loads(output.read_text())
+    assert results["load"][0]["engine"] == "numpy"
+
+
+def test_compare_parquet_settings(tmp_path):
+    path = generate_series(str(tmp_path / "COTAHIST_A2023.ZIP"), 1_000)
+
+    results = compare_parquet_settings(
+        path,
+        [
+            {"parquet_codec": "zstd", "parquet_codec_level": 3},
+            {"parquet_codec": "snappy", "parquet_codec_level": 3},
+        ],
+    )
+
+    assert [result["codec"] for result in results] == ["zstd", "snappy"]
+    assert results[0]["bytes"] > 0
+    assert results[0]["write_seconds"] > 0
+    assert "error" in results[1]
+
+
+def test_main_compare(tmp_path):
+    output = tmp_path / "compare.json"
+    main(
+        ["--compare", "--records", "1000", "--parquet-engines", "fastparquet"]
+        + ["--codecs", "gzip", "none", "--output", str(output)]
+    )
+
+    results = json.loads(output.read_text())
+    assert [result["codec"] for result in results["parquet"]] == ["gzip", None]
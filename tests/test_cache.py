@@ -0,0 +1,72 @@
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+from b3_series.cache import SeriesCache, load_series
+from b3_series.config import Config
+from b3_series.pandas import load_compressed_series
+
+SAMPLE_PATH = os.path.join(os.path.dirname(__file__), "test_pandas", "sample.zip")
+
+
+@pytest.fixture
+def series_path(tmp_path):
+    return shutil.copy(SAMPLE_PATH, tmp_path / "COTAHIST_A2000.ZIP")
+
+
+def test_cache_hits_and_invalidation(series_path, mocker):
+    read = mocker.patch(
+        "b3_series.cache._read_series", wraps=lambda path, compact: pd.DataFrame()
+    )
+    cache = SeriesCache()
+
+    assert cache.load(str(series_path)) is cache.load(str(series_path))
+    assert read.call_count == 1
+
+    cache.load(str(series_path), compact=True)
+    assert read.call_count == 2
+
+    stat = os.stat(series_path)
+    os.utime(series_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    cache.load(str(series_path))
+    assert read.call_count == 3
+
+
+def test_cache_lru_eviction(tmp_path):
+    paths = [
+        shutil.copy(SAMPLE_PATH, tmp_path / f"COTAHIST_A200{i}.ZIP") for i in [0, 1, 2]
+    ]
+    cache = SeriesCache()
+    cache.load(str(paths[0]))
+    cache.max_bytes = cache.size * 2
+
+    cache.load(str(paths[1]))
+    cache.load(str(paths[0]))
+    cache.load(str(paths[2]))
+
+    assert len(cache) == 2
+    assert cache.size <= cache.max_bytes
+    assert list(cache._entries) == [str(paths[0]), str(paths[2])]
+
+
+def test_cache_disk_tier(series_path, tmp_path, mocker):
+    pytest.importorskip("pyarrow")
+    disk_path = tmp_path / "cache"
+
+    df = SeriesCache(disk_path=str(disk_path)).load(str(series_path))
+    assert len(list(disk_path.glob("*.feather"))) == 1
+
+    read = mocker.patch("b3_series.cache._read_series")
+    cached = SeriesCache(disk_path=str(disk_path)).load(str(series_path))
+    read.assert_not_called()
+    pd.testing.assert_frame_equal(cached, df)
+
+
+def test_load_series(series_path, tmp_path):
+    config = Config(fs_path=str(tmp_path))
+
+    df = load_series("COTAHIST_A2000.ZIP", config)
+    pd.testing.assert_frame_equal(df, load_compressed_series(str(series_path)))
+    assert load_series("COTAHIST_A2000.ZIP", config) is df
@@ -0,0 +1,92 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+from b3_series.cli import _config, _parser, main
+
+SAMPLE_PATH = os.path.join(
+    os.path.dirname(__file__), "test_sync_parquets", "COTAHIST_A2000.ZIP"
+)
+
+
+def test_import_is_lazy():
+    code = "import sys, b3_series.cli; print('pandas' in sys.modules)"
+    output = subprocess.check_output([sys.executable, "-c", code], text=True)
+    assert output.strip() == "False"
+
+
+def test_convert_and_query(tmp_path, capsys):
+    shutil.copy(SAMPLE_PATH, tmp_path)
+
+    main(["convert", "--fs-path", str(tmp_path), "--dry-run"])
+    assert "Would convert COTAHIST_A2000.ZIP" in capsys.readouterr().out
+    assert not (tmp_path / "COTAHIST_A2000.parquet").exists()
+
+    main(["convert", "--fs-path", str(tmp_path)])
+    report = json.loads(capsys.readouterr().out)
+    assert report["completed"] == [f"{tmp_path}/COTAHIST_A2000.parquet"]
+
+    output = tmp_path / "out.csv"
+    main(["query", "GEPA4", "--fs-path", str(tmp_path), "--output", str(output)])
+    df = pd.read_csv(output)
+    assert df["sigla_acao"].tolist() == ["GEPA4"]
+
+
+def test_stats(tmp_path, capsys):
+    shutil.copy(SAMPLE_PATH, tmp_path)
+
+    main(["stats", "--fs-path", str(tmp_path)])
+
+    stats = json.loads(capsys.readouterr().out)
+    assert stats["zip"] == {"series": 1, "bytes": os.path.getsize(SAMPLE_PATH)}
+    assert stats["parquet"] == {"series": 0, "bytes": 0}
+
+
+def test_s3_is_rejected_by_local_commands(tmp_path, capsys):
+    for command in ["sync", "convert", "query"]:
+        with pytest.raises(SystemExit):
+            main([command, "--fs-type", "s3", "--fs-path", "s3://bucket/data"])
+        assert "needs a local store" in capsys.readouterr().err
+
+
+def test_sync_dry_run_writes_nothing(mocker, tmp_path, capsys):
+    serie = SimpleNamespace(name="2000", file_name="COTAHIST_A2000.ZIP")
+    available = SimpleNamespace(
+        annual_series=[serie], monthly_series=[], daily_series=[]
+    )
+    mocker.patch(
+        "b3_series.sync_series.historical_series_available", return_value=available
+    )
+
+    main(["sync", "--fs-path", str(tmp_path), "--dry-run"])
+
+    assert "Would download COTAHIST_A2000.ZIP" in capsys.readouterr().out
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_writer_settings():
+    args = _parser().parse_args(
+        [
+            "convert",
+            "--parquet-codec",
+            "none",
+            "--no-parquet-dictionary",
+            "--row-group-size",
+            "5000",
+        ]
+    )
+    config = _config(args)
+
+    assert config.parquet_codec is None
+    assert config.parquet_dictionary is False
+    assert config.row_group_size == 5000
+
+    config = _config(_parser().parse_args(["convert"]))
+    assert config.parquet_codec == "gzip"
+    assert config.parquet_dictionary is None
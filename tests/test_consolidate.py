@@ -0,0 +1,94 @@
+import shutil
+from datetime import date
+
+import pandas as pd
+
+from b3_series import sync_parquets as sync_parquets_module
+from b3_series.bench import generate_series
+from b3_series.config import Config
+from b3_series.consolidate import DEDUPLICATION_COLUMNS, sync_consolidated
+from b3_series.index import INDEX_FOLDER
+from b3_series.io import list_series
+from b3_series.query import load
+from b3_series.sync_parquets import sync_parquets
+from b3_series.validation import quarantine_path, write_quarantine
+
+
+def _sync_daily_series(tmp_path, names):
+    zip_path = generate_series(str(tmp_path / "generated.zip"), 500, year=2022)
+    for name in names:
+        shutil.copy(zip_path, tmp_path / name)
+    (tmp_path / "generated.zip").unlink()
+
+    config = Config(fs_path=str(tmp_path), row_group_size=100)
+    sync_parquets(config)
+    return config
+
+
+def test_sync_consolidated(tmp_path, mocker):
+    daily_series = [
+        "COTAHIST_D03012022.ZIP",
+        "COTAHIST_D04012022.ZIP",
+        "COTAHIST_D01022022.ZIP",
+        "COTAHIST_D02052023.ZIP",
+    ]
+    config = _sync_daily_series(tmp_path, daily_series)
+    records = load(config=config)
+    issues = pd.DataFrame(
+        {
+            "record_number": pd.array([2], dtype="Int64"),
+            "reasons": ["ohlc"],
+            "record": ["01"],
+        }
+    )
+    write_quarantine("COTAHIST_D03012022.parquet", issues, config)
+
+    report = sync_consolidated(config, today=date(2023, 5, 5))
+
+    assert report.completed == [
+        "COTAHIST_M012022.parquet",
+        "COTAHIST_M022022.parquet",
+        "COTAHIST_A2022.parquet",
+    ]
+    # the daily series of the current month are not consolidated yet
+    assert sorted(list_series("parquet", config=config)) == [
+        "COTAHIST_A2022.parquet",
+        "COTAHIST_D02052023.parquet",
+    ]
+    assert sorted(p.name for p in (tmp_path / INDEX_FOLDER).iterdir()) == [
+        "COTAHIST_A2022.parquet",
+        "COTAHIST_D02052023.parquet",
+    ]
+    # the quarantine files of the merged series are removed with their indexes
+    assert not quarantine_path("COTAHIST_D03012022.parquet", config).exists()
+
+    consolidated = load(end=date(2022, 12, 31), config=config)
+    expected = records.drop_duplicates(DEDUPLICATION_COLUMNS)
+    assert len(consolidated) == len(expected)
+    assert not consolidated.duplicated(DEDUPLICATION_COLUMNS).any()
+
+    df = load(tickers=["T0001"], end=date(2022, 12, 31), config=config)
+    pd.testing.assert_frame_equal(
+        df,
+        consolidated[consolidated["sigla_acao"] == "T0001"].reset_index(drop=True),
+    )
+
+    # the consolidated daily series are not converted again
+    convert = mocker.spy(sync_parquets_module, "_convert_zip_to_parquet")
+    sync_parquets(config)
+    assert convert.call_count == 0
+
+    # but the official annual series replaces the consolidated one
+    shutil.copy(tmp_path / "COTAHIST_D03012022.ZIP", tmp_path / "COTAHIST_A2022.ZIP")
+    sync_parquets(config)
+    assert convert.call_count == 1
+    assert len(load(end=date(2022, 12, 31), config=config)) == 500
+
+
+def test_sync_consolidated_waits_for_late_daily_series(tmp_path):
+    config = _sync_daily_series(tmp_path, ["COTAHIST_D28022022.ZIP"])
+
+    assert sync_consolidated(config, today=date(2022, 3, 2)).completed == []
+    assert sync_consolidated(config, today=date(2022, 3, 9)).completed == [
+        "COTAHIST_M022022.parquet"
+    ]
@@ -0,0 +1,126 @@
+import os
+import shutil
+from datetime import date
+
+import pandas as pd
+
+from b3_series.bench import generate_series
+from b3_series.config import Config
+from b3_series.consolidate import sync_consolidated
+from b3_series.dataset import get_dataset_path, remove_dataset_series
+from b3_series.query import load
+from b3_series.sync_parquets import sync_parquets
+
+
+def _copy_serie(request, tmp_path, zip_name):
+    filename = request.module.__file__
+    test_dir, _ = os.path.splitext(filename)
+    shutil.copy("{}/{}".format(test_dir, "COTAHIST_D09062023.ZIP"), tmp_path / zip_name)
+
+
+def test_sync_parquets_writes_dataset(request, tmp_path):
+    _copy_serie(request, tmp_path, "COTAHIST_D09062023.ZIP")
+    config = Config(
+        fs_path=str(tmp_path),
+        partitioned_dataset=True,
+        dataset_partition_on=["tipo_mercado"],
+    )
+
+    sync_parquets(config)
+
+    dataset_path = get_dataset_path(config)
+    assert os.listdir("{}/ano=2023/mes=6/tipo_mercado=10".format(dataset_path)) == [
+        "COTAHIST_D09062023.parquet"
+    ]
+    df = pd.read_parquet(dataset_path, engine="fastparquet")
+    assert df["sigla_acao"].tolist() == ["GEPA3", "GEPA4", "GFSA3"]
+
+
+def test_dataset_supersedes_series(request, tmp_path):
+    config = Config(fs_path=str(tmp_path), partitioned_dataset=True)
+    month_path = "{}/ano=2023/mes=6".format(get_dataset_path(config))
+
+    _copy_serie(request, tmp_path, "COTAHIST_D09062023.ZIP")
+    sync_parquets(config)
+    assert os.listdir(month_path) == ["COTAHIST_D09062023.parquet"]
+
+    _copy_serie(request, tmp_path, "COTAHIST_M062023.ZIP")
+    sync_parquets(config)
+    assert os.listdir(month_path) == ["COTAHIST_M062023.parquet"]
+
+    _copy_serie(request, tmp_path, "COTAHIST_A2023.ZIP")
+    _copy_serie(request, tmp_path, "COTAHIST_D12062023.ZIP")
+    sync_parquets(config)
+    assert os.listdir(month_path) == ["COTAHIST_A2023.parquet"]
+
+    assert len(load(config=config)) == 3
+
+
+def test_sync_parquets_writes_converted_series_to_dataset(request, tmp_path):
+    _copy_serie(request, tmp_path, "COTAHIST_D09062023.ZIP")
+    config = Config(fs_path=str(tmp_path))
+    sync_parquets(config)
+    assert not os.path.exists(get_dataset_path(config))
+
+    # the parquet file is current, so it is written from the parquet file
+    report = sync_parquets(config.copy(update={"partitioned_dataset": True}))
+
+    assert report.completed == []
+    assert os.listdir("{}/ano=2023/mes=6".format(get_dataset_path(config))) == [
+        "COTAHIST_D09062023.parquet"
+    ]
+
+
+def test_load_from_dataset(tmp_path):
+    generate_series(str(tmp_path / "COTAHIST_A2022.ZIP"), 2_000, year=2022)
+    config = Config(
+        fs_path=str(tmp_path),
+        row_group_size=100,
+        partitioned_dataset=True,
+        dataset_partition_on=["tipo_mercado"],
+    )
+    sync_parquets(config)
+    files_config = config.copy(update={"partitioned_dataset": False})
+
+    def sorted_records(df):
+        return df.sort_values(list(df.columns), ignore_index=True)
+
+    pd.testing.assert_frame_equal(
+        sorted_records(load(config=config)), sorted_records(load(config=files_config))
+    )
+
+    expected = load(config=files_config, start="2022-03-01", end="2022-04-30")
+    ticker = expected["sigla_acao"].iloc[0]
+    market = int(expected["tipo_mercado"].iloc[0])
+    filters = dict(
+        tickers=[ticker], markets=[market], start="2022-03-01", end="2022-04-30"
+    )
+    pd.testing.assert_frame_equal(
+        sorted_records(load(config=config, **filters)),
+        sorted_records(load(config=files_config, **filters)),
+    )
+
+
+def test_sync_consolidated_prunes_dataset(tmp_path):
+    zip_path = generate_series(str(tmp_path / "generated.zip"), 200, year=2022)
+    for name in ["COTAHIST_D03012022.ZIP", "COTAHIST_D04012022.ZIP"]:
+        shutil.copy(zip_path, tmp_path / name)
+    (tmp_path / "generated.zip").unlink()
+    config = Config(fs_path=str(tmp_path), partitioned_dataset=True)
+    sync_parquets(config)
+
+    sync_consolidated(config, today=date(2022, 3, 1))
+
+    dataset_files = {path.name for path in (tmp_path / "dataset").rglob("*.parquet")}
+    assert dataset_files == {"COTAHIST_M012022.parquet"}
+
+
+def test_remove_dataset_series(request, tmp_path):
+    _copy_serie(request, tmp_path, "COTAHIST_D09062023.ZIP")
+    config = Config(fs_path=str(tmp_path), partitioned_dataset=True)
+    sync_parquets(config)
+
+    assert remove_dataset_series(["COTAHIST_D09062023.parquet"], config) == []
+    assert remove_dataset_series([], config) == [
+        "{}/ano=2023/mes=6/COTAHIST_D09062023.parquet".format(get_dataset_path(config))
+    ]
@@ -0,0 +1,55 @@
+import pytest
+
+from b3_series.files import atomic_write, remove_files_except
+
+
+def test_atomic_write(tmp_path):
+    path = tmp_path / "file.json"
+    path.write_text("old")
+
+    with atomic_write(path) as partial:
+        partial.write_text("new")
+        assert path.read_text() == "old"
+
+    assert path.read_text() == "new"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["file.json"]
+
+
+def test_atomic_write_keeps_file_on_failure(tmp_path):
+    path = tmp_path / "file.json"
+    path.write_text("old")
+
+    with pytest.raises(ConnectionError):
+        with atomic_write(path) as partial:
+            partial.write_text("partial")
+            raise ConnectionError()
+
+    assert path.read_text() == "old"
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["file.json"]
+
+
+def test_atomic_write_folder(tmp_path):
+    path = tmp_path / "panel"
+    path.mkdir()
+    (path / "old.f8").write_bytes(b"old")
+
+    with atomic_write(path) as partial:
+        partial.mkdir()
+        (partial / "new.f8").write_bytes(b"new")
+
+    assert sorted(p.name for p in path.iterdir()) == ["new.f8"]
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["panel"]
+
+
+def test_remove_files_except(tmp_path):
+    for name in ["COTAHIST_A2022.parquet", "COTAHIST_A2023.parquet", "notes.txt"]:
+        (tmp_path / name).touch()
+
+    assert remove_files_except(tmp_path, ["COTAHIST_A2023.parquet"]) == [
+        "COTAHIST_A2022.parquet"
+    ]
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "COTAHIST_A2023.parquet",
+        "notes.txt",
+    ]
+    assert remove_files_except(tmp_path / "missing", []) == []
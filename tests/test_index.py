@@ -0,0 +1,70 @@
+import os
+
+import pandas as pd
+
+from b3_series.config import Config
+from b3_series.index import build_ticker_index, has_ticker_index, read_ticker_index
+from b3_series.pandas import load_compressed_series
+from b3_series.sync_parquets import write_parquet
+
+SAMPLE_PATH = os.path.join(os.path.dirname(__file__), "test_pandas", "sample.zip")
+
+
+def test_build_ticker_index():
+    df = pd.DataFrame(
+        {
+            "sigla_acao": ["ABEV3", "ABEV3", "ABEV3", "PETR4", "PETR4"],
+            "codigo_isin": ["BRABEV", "BRABEV", "BRABEW", "BRPETR", "BRPETR"],
+            "data_pregao": pd.to_datetime(
+                ["2023-01-02", "2023-01-03", "2023-01-04", "2023-01-02", "2023-01-03"]
+            ),
+        }
+    )
+
+    index = build_ticker_index(df)
+
+    assert index["sigla_acao"].tolist() == ["ABEV3", "ABEV3", "PETR4"]
+    assert index["codigo_isin"].tolist() == ["BRABEV", "BRABEW", "BRPETR"]
+    assert index["row_start"].tolist() == [0, 2, 3]
+    assert index["row_stop"].tolist() == [2, 3, 5]
+    assert (
+        index["first_date"].tolist()
+        == pd.to_datetime(["2023-01-02", "2023-01-04", "2023-01-02"]).tolist()
+    )
+    assert (
+        index["last_date"].tolist()
+        == pd.to_datetime(["2023-01-03", "2023-01-04", "2023-01-03"]).tolist()
+    )
+
+
+def test_build_empty_ticker_index():
+    df = pd.DataFrame(columns=["sigla_acao", "codigo_isin", "data_pregao"])
+    assert build_ticker_index(df).empty
+
+
+def test_read_ticker_index_of_replaced_parquet(tmp_path):
+    config = Config(fs_path=str(tmp_path))
+    df = load_compressed_series(SAMPLE_PATH)
+    write_parquet(df, "COTAHIST_A2000.parquet", config)
+
+    index = read_ticker_index("COTAHIST_A2000.parquet", ["GEPA4"], config=config)
+    assert index[["row_start", "row_stop"]].values.tolist() == [[1, 2]]
+
+    # an index left behind by a replaced parquet file is ignored
+    df.iloc[:1].to_parquet(tmp_path / "COTAHIST_A2000.parquet", engine="fastparquet")
+    assert read_ticker_index("COTAHIST_A2000.parquet", ["GEPA4"], config=config) is None
+
+
+def test_ticker_index_of_parquet_replaced_with_same_size(tmp_path):
+    config = Config(fs_path=str(tmp_path))
+    write_parquet(load_compressed_series(SAMPLE_PATH), "COTAHIST_A2000.parquet", config)
+    assert has_ticker_index("COTAHIST_A2000.parquet", config)
+
+    # a parquet file replaced by another of the same size
+    path = tmp_path / "COTAHIST_A2000.parquet"
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert path.stat().st_size == stat.st_size
+
+    assert not has_ticker_index("COTAHIST_A2000.parquet", config)
+    assert read_ticker_index("COTAHIST_A2000.parquet", ["GEPA4"], config=config) is None
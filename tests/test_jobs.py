@@ -0,0 +1,62 @@
+from b3_series.config import Config
+from b3_series.jobs import DONE, FAILED, PENDING, JobQueue, backoff_seconds, run_jobs
+from b3_series.metrics import metrics
+
+
+def test_backoff_seconds():
+    config = Config(retry_backoff_seconds=2)
+    assert [backoff_seconds(attempts, config) for attempts in [1, 2, 3]] == [2, 4, 8]
+    assert backoff_seconds(100, config) == 15 * 60
+
+
+def test_run_jobs_retries_failed_jobs(tmp_path):
+    config = Config(fs_path=str(tmp_path), retry_backoff_seconds=0, max_attempts=3)
+    queue = JobQueue(".jobs.json", config)
+    queue.enqueue(["a", "b", "c"])
+    attempts = []
+
+    def work(name: str) -> str:
+        attempts.append(name)
+        if name == "b" and attempts.count("b") < 2:
+            raise ConnectionError("reset")
+        if name == "c":
+            raise ConnectionError("refused")
+        return name.upper()
+
+    with metrics.collect() as events:
+        assert run_jobs(queue, work, 1) == ["A", "B"]
+
+    assert attempts.count("c") == 3
+    assert queue["b"].status == DONE
+    assert queue["c"].status == FAILED
+    assert queue["c"].error == "ConnectionError: refused"
+    retries = [event for event in events if event["name"] == "retries"]
+    assert sum(event["value"] for event in retries) == 3
+
+
+def test_job_queue_resumes_previous_run(tmp_path):
+    config = Config(fs_path=str(tmp_path))
+    queue = JobQueue(".jobs.json", config)
+    queue.enqueue(["a", "b", "c"])
+    queue.start("a")
+    queue.complete("a")
+    queue.start("b")
+    queue.fail("c", ConnectionError("reset"))
+
+    # a new run, after the previous one stopped with b in flight
+    queue = JobQueue(".jobs.json", config)
+    assert [queue[name].status for name in ["a", "b", "c"]] == [DONE, PENDING, PENDING]
+    assert queue.ready() == ["b"]
+    assert queue["c"].attempts == 1
+
+    queue.enqueue(["b", "c", "d"])
+    assert len(queue) == 3
+    assert queue.ready() == ["b", "d"]
+
+
+def test_run_jobs_timeout(tmp_path):
+    queue = JobQueue(".jobs.json", Config(fs_path=str(tmp_path)))
+    queue.enqueue(["a"])
+
+    assert run_jobs(queue, str.upper, -1, workers=2) == []
+    assert queue.ready() == ["a"]
@@ -0,0 +1,106 @@
+import json
+import logging
+import threading
+
+from b3_series.metrics import (
+    JsonLinesSink,
+    LoggingSink,
+    Metrics,
+    PrometheusSink,
+    metrics,
+    run_report,
+)
+
+
+def test_metrics_without_sinks():
+    recorder = Metrics()
+
+    with recorder.span("stage", serie="COTAHIST_A2000.ZIP"):
+        recorder.count("rows_parsed", 10)
+    recorder.count("rows_parsed", 5)
+
+    assert recorder.totals() == {"rows_parsed": 15}
+
+
+def test_json_lines_sink(tmp_path):
+    recorder = Metrics()
+    recorder.add_sink(JsonLinesSink(str(tmp_path / "metrics.jsonl")))
+
+    with recorder.span("stage", serie="COTAHIST_A2000.ZIP") as labels:
+        labels["rows"] = 3
+    recorder.count("bytes_downloaded", 100)
+
+    lines = (tmp_path / "metrics.jsonl").read_text().splitlines()
+    events = [json.loads(line) for line in lines]
+    assert [event["type"] for event in events] == ["span", "counter"]
+    assert events[0]["labels"] == {"serie": "COTAHIST_A2000.ZIP", "rows": 3}
+    assert events[1]["value"] == 100
+
+
+def test_prometheus_sink(tmp_path):
+    recorder = Metrics()
+    recorder.add_sink(PrometheusSink(str(tmp_path / "b3_series.prom")))
+
+    for serie in ["COTAHIST_A2000.ZIP", "COTAHIST_A2001.ZIP"]:
+        with recorder.span("convert_zip_to_parquet", serie=serie):
+            pass
+        recorder.count("bytes_written", 10, stage="save_series")
+
+    lines = (tmp_path / "b3_series.prom").read_text().splitlines()
+    assert 'b3_series_bytes_written_total{stage="save_series"} 20' in lines
+    assert "b3_series_convert_zip_to_parquet_seconds_count 2" in lines
+
+
+def test_logging_sink(caplog):
+    recorder = Metrics()
+    recorder.add_sink(LoggingSink())
+
+    with caplog.at_level(logging.INFO, logger="b3_series"):
+        recorder.count("files_skipped_by_timeout", 2)
+
+    assert "files_skipped_by_timeout  counter 2" in caplog.text
+
+
+def test_collect_and_replay():
+    recorder = Metrics()
+
+    with recorder.collect() as events:
+        recorder.count("rows_parsed", 3)
+    assert len(events) == 1
+
+    other = Metrics()
+    other.replay(events)
+    assert other.totals() == {"rows_parsed": 3}
+
+
+def test_run_report():
+    with run_report("sync") as report:
+        metrics.count("bytes_downloaded", 42)
+
+    assert report.stage == "sync"
+    assert report.seconds > 0
+    assert report.counters == {"bytes_downloaded": 42}
+
+
+def test_reset():
+    recorder = Metrics()
+    recorder.count("rows_parsed", 3)
+
+    recorder.reset()
+
+    assert recorder.totals() == {}
+
+
+def test_collect_only_diverts_the_calling_thread(tmp_path):
+    recorder = Metrics()
+    recorder.add_sink(JsonLinesSink(str(tmp_path / "metrics.jsonl")))
+
+    with recorder.collect() as events:
+        thread = threading.Thread(target=recorder.count, args=("rows_parsed", 5))
+        thread.start()
+        thread.join()
+        recorder.count("rows_parsed", 3)
+
+    assert [event["value"] for event in events] == [3]
+    lines = (tmp_path / "metrics.jsonl").read_text().splitlines()
+    assert [json.loads(line)["value"] for line in lines] == [5]
@@ -0,0 +1,157 @@
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+from b3_series.bench import generate_series
+from b3_series.config import Config
+from b3_series.options import (
+    OPTION_MARKETS,
+    OPTIONS_FOLDER,
+    OPTIONS_INDEX_FOLDER,
+    has_options_index,
+    load_options,
+    map_underlyings,
+    option_chain,
+    write_options,
+)
+from b3_series.query import load
+from b3_series.sync_parquets import sync_parquets
+
+
+def _all_options(config: Config) -> pd.DataFrame:
+    df = load(config=config)
+    options = df[df["tipo_mercado"].isin(OPTION_MARKETS)].copy()
+    options["ativo_objeto"] = map_underlyings(df)
+    return options
+
+
+def test_map_underlyings():
+    df = pd.DataFrame(
+        {
+            "sigla_acao": ["PETR3", "PETR4", "VALE3", "PETRA10", "PETRM20"]
+            + ["VALEB30", "IBOVA40"],
+            "tipo_mercado": [10, 10, 10, 70, 80, 70, 70],
+            "especificacao_papel": ["ON  N2", "PN  N2", "ON  NM", "PN  N2", "ON"]
+            + ["PNA", ""],
+            "volume_titulos_negociados": [10.0, 100.0, 50.0, 1.0, 1.0, 1.0, 1.0],
+        }
+    )
+
+    underlyings = map_underlyings(df)
+
+    assert underlyings.index.tolist() == [3, 4, 5, 6]
+    assert underlyings.tolist() == ["PETR4", "PETR3", "VALE3", "IBOV"]
+
+
+def test_load_options(tmp_path):
+    generate_series(str(tmp_path / "COTAHIST_A2022.ZIP"), 20_000, year=2022)
+    config = Config(fs_path=str(tmp_path))
+    sync_parquets(config)
+
+    options = _all_options(config)
+    underlying, expiry = options.iloc[0][["ativo_objeto", "data_vencimento"]]
+    expected = options[
+        (options["ativo_objeto"] == underlying) & (options["data_vencimento"] == expiry)
+    ].sort_values(["data_pregao", "preco_exercicio", "sigla_acao"])
+
+    df = load_options([underlying], [expiry], config=config)
+
+    pd.testing.assert_frame_equal(
+        df[expected.columns], expected.reset_index(drop=True), check_dtype=False
+    )
+    partitions = sorted(
+        path.name
+        for path in (tmp_path / OPTIONS_FOLDER).iterdir()
+        if path.name != OPTIONS_INDEX_FOLDER
+    )
+    assert partitions == sorted(
+        f"{day:%Y-%m-%d}" for day in options["data_vencimento"].unique()
+    )
+
+    # strikes and trading dates narrow the chain down
+    strike = expected["preco_exercicio"].median()
+    day = expected["data_pregao"].iloc[0]
+    df = load_options(
+        [underlying], min_strike=strike, start=day, end=day, config=config
+    )
+    assert not df.empty
+    assert (df["preco_exercicio"] >= strike).all()
+    assert (df["data_pregao"] == day).all()
+
+    chain = option_chain(underlying, day, config=config)
+    traded = options[
+        (options["ativo_objeto"] == underlying) & (options["data_pregao"] == day)
+    ]
+    assert sorted(chain["sigla_acao"]) == sorted(traded["sigla_acao"])
+    assert chain["data_vencimento"].is_monotonic_increasing
+
+
+def test_load_options_without_index(tmp_path):
+    generate_series(str(tmp_path / "COTAHIST_A2022.ZIP"), 5_000, year=2022)
+    config = Config(fs_path=str(tmp_path))
+    sync_parquets(config)
+    underlying = _all_options(config)["ativo_objeto"].iloc[0]
+    indexed = load_options([underlying], config=config)
+
+    shutil.rmtree(tmp_path / OPTIONS_FOLDER)
+
+    pd.testing.assert_frame_equal(load_options([underlying], config=config), indexed)
+
+
+def test_remove_options_of_removed_parquets(tmp_path):
+    generate_series(str(tmp_path / "COTAHIST_A2022.ZIP"), 2_000, year=2022)
+    generate_series(str(tmp_path / "COTAHIST_A2023.ZIP"), 2_000, year=2023)
+    config = Config(fs_path=str(tmp_path))
+    sync_parquets(config)
+
+    (tmp_path / "COTAHIST_A2022.ZIP").unlink()
+    (tmp_path / "COTAHIST_A2022.parquet").unlink()
+    sync_parquets(config)
+
+    folder = tmp_path / OPTIONS_FOLDER
+    assert {path.name for path in folder.glob("*/*")} == {"COTAHIST_A2023.parquet"}
+    assert all(path.name.startswith("2023") for path in folder.glob("2*"))
+
+
+def test_options_of_parquet_replaced_with_same_size(tmp_path):
+    generate_series(str(tmp_path / "COTAHIST_A2022.ZIP"), 2_000, year=2022)
+    config = Config(fs_path=str(tmp_path))
+    sync_parquets(config)
+    assert has_options_index("COTAHIST_A2022.parquet", config)
+
+    path = tmp_path / "COTAHIST_A2022.parquet"
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    assert not has_options_index("COTAHIST_A2022.parquet", config)
+
+
+def test_interrupted_options_write_leaves_no_index(tmp_path, mocker):
+    generate_series(str(tmp_path / "COTAHIST_A2022.ZIP"), 2_000, year=2022)
+    config = Config(fs_path=str(tmp_path))
+    sync_parquets(config)
+    underlying = _all_options(config)["ativo_objeto"].iloc[0]
+    indexed = load_options([underlying], config=config)
+
+    mocker.patch(
+        "b3_series.options.write_parquet_file", side_effect=OSError("No space left")
+    )
+    with pytest.raises(OSError):
+        write_options("COTAHIST_A2022.parquet", load(config=config), config)
+
+    assert not has_options_index("COTAHIST_A2022.parquet", config)
+    pd.testing.assert_frame_equal(load_options([underlying], config=config), indexed)
+
+
+def test_load_options_with_dictionary_keeps_text_dtypes(tmp_path):
+    generate_series(str(tmp_path / "COTAHIST_A2022.ZIP"), 2_000, year=2022)
+    config = Config(fs_path=str(tmp_path), parquet_dictionary=True)
+    sync_parquets(config)
+    underlying = _all_options(config)["ativo_objeto"].iloc[0]
+
+    df = load_options([underlying], config=config)
+
+    assert df["sigla_acao"].dtype == object
+    assert df["especificacao_papel"].dtype == object
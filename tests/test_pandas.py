@@ -1,6 +1,16 @@
 import os
+import zipfile
 
-from b3_series.pandas import load_compressed_series
+import pandas as pd
+import pytest
+
+from b3_series.pandas import (
+    compact_dtypes,
+    empty_dataframe,
+    iter_compressed_series,
+    load_compressed_series,
+)
+from b3_series.validation import SeriesValidator
 
 
 def test_load_compressed_series(request):
@@ -13,3 +23,83 @@ def test_load_compressed_series(request):
     assert df["sigla_acao"][0] == "GEPA3"
     assert df["sigla_acao"][1] == "GEPA4"
     assert df["sigla_acao"][2] == "GFSA3"
+
+
+def test_load_compressed_series_engines_match(request):
+    filename = request.module.__file__
+    test_dir, _ = os.path.splitext(filename)
+    serie_path = "{}/{}".format(test_dir, "sample.zip")
+
+    df = load_compressed_series(serie_path, engine="numpy")
+    expected = load_compressed_series(serie_path, engine="fwf")
+    expected["data_vencimento"] = pd.to_datetime(expected["data_vencimento"])
+
+    pd.testing.assert_frame_equal(df, expected)
+
+
+def test_load_compressed_series_fwf_options(request):
+    filename = request.module.__file__
+    test_dir, _ = os.path.splitext(filename)
+    serie_path = "{}/{}".format(test_dir, "sample.zip")
+
+    with pytest.raises(ValueError, match="compact option requires the numpy"):
+        load_compressed_series(serie_path, engine="fwf", compact=True)
+    with pytest.raises(ValueError, match="validator option requires the numpy"):
+        load_compressed_series(serie_path, engine="fwf", validator=SeriesValidator())
+
+
+def test_iter_compressed_series(request):
+    filename = request.module.__file__
+    test_dir, _ = os.path.splitext(filename)
+    serie_path = "{}/{}".format(test_dir, "sample.zip")
+
+    chunks = list(iter_compressed_series(serie_path, chunk_rows=2))
+    assert [len(chunk) for chunk in chunks] == [1, 2]
+    assert all((chunk.dtypes == chunks[0].dtypes).all() for chunk in chunks)
+
+    df = pd.concat(chunks, ignore_index=True)
+    expected = load_compressed_series(serie_path)
+    pd.testing.assert_frame_equal(df, expected, check_dtype=False)
+
+
+def test_iter_compressed_series_without_trailer(request, tmp_path):
+    filename = request.module.__file__
+    test_dir, _ = os.path.splitext(filename)
+
+    with zipfile.ZipFile("{}/{}".format(test_dir, "sample.zip")) as zip_file:
+        lines = zip_file.read(zip_file.namelist()[0]).splitlines()
+
+    serie_path = tmp_path / "truncated.zip"
+    with zipfile.ZipFile(serie_path, "w") as zip_file:
+        zip_file.writestr("truncated.txt", b"\r\n".join(lines[:-1]))
+
+    df = pd.concat(iter_compressed_series(serie_path), ignore_index=True)
+    assert df["sigla_acao"].tolist() == ["GEPA3", "GEPA4", "GFSA3"]
+
+
+def test_load_compressed_series_compact(request):
+    filename = request.module.__file__
+    test_dir, _ = os.path.splitext(filename)
+    serie_path = "{}/{}".format(test_dir, "sample.zip")
+
+    df = load_compressed_series(serie_path, compact=True)
+    expected = load_compressed_series(serie_path)
+
+    assert df.dtypes.astype(str).to_dict() == compact_dtypes()
+    assert df["tipo_mercado"].dtype == "Int16"
+    assert df["sigla_acao"].tolist() == ["GEPA3", "GEPA4", "GFSA3"]
+    assert df["preco_ultimo"].tolist() == [2377, 2410, 691]
+    assert (
+        df["volume_titulos_negociados"] == expected["volume_titulos_negociados"] * 100
+    ).all()
+
+
+def test_empty_dataframe():
+    assert empty_dataframe().dtypes.astype(str).tolist()[:3] == [
+        "int64",
+        "datetime64[ns]",
+        "int64",
+    ]
+    assert (
+        empty_dataframe(compact=True).dtypes.astype(str).to_dict() == compact_dtypes()
+    )
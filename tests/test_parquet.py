@@ -0,0 +1,56 @@
+import fastparquet
+import pandas as pd
+import pytest
+
+from b3_series.config import Config
+from b3_series.pandas import load_compressed_series
+from b3_series.parquet import PARQUET_CODECS, write_parquet_file
+
+SAMPLE_PATH = "tests/test_pandas/sample.zip"
+
+
+@pytest.mark.parametrize("codec", PARQUET_CODECS)
+def test_write_parquet_file(tmp_path, codec):
+    df = load_compressed_series(SAMPLE_PATH)
+    path = str(tmp_path / "sample.parquet")
+    config = Config(parquet_codec=codec, row_group_size=2)
+
+    write_parquet_file(path, df, config, custom_metadata={"sources": "[]"})
+
+    parquet_file = fastparquet.ParquetFile(path)
+    assert len(parquet_file.row_groups) == 2
+    assert parquet_file.key_value_metadata["sources"] == "[]"
+    pd.testing.assert_frame_equal(parquet_file.to_pandas(index=False), df)
+
+
+def test_write_parquet_file_with_level_and_dictionary(tmp_path):
+    df = load_compressed_series(SAMPLE_PATH, compact=True)
+    path = str(tmp_path / "sample.parquet")
+    config = Config(parquet_codec="zstd", parquet_codec_level=19)
+
+    write_parquet_file(path, df, config)
+
+    pd.testing.assert_frame_equal(fastparquet.ParquetFile(path).to_pandas(), df)
+
+    # text columns are written as categoricals
+    write_parquet_file(path, df, Config(parquet_dictionary=True))
+    assert fastparquet.ParquetFile(path).dtypes["moeda"] == "category"
+
+    with pytest.raises(ValueError, match="snappy"):
+        write_parquet_file(
+            path, df, Config(parquet_codec="snappy", parquet_codec_level=1)
+        )
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_write_parquet_file_with_pyarrow(tmp_path, compact):
+    pytest.importorskip("pyarrow")
+    df = load_compressed_series(SAMPLE_PATH, compact=compact)
+    path = str(tmp_path / "sample.parquet")
+    config = Config(parquet_engine="pyarrow", parquet_codec="zstd")
+
+    write_parquet_file(path, df, config, custom_metadata={"sources": "[]"})
+
+    parquet_file = fastparquet.ParquetFile(path)
+    assert parquet_file.key_value_metadata["sources"] == "[]"
+    pd.testing.assert_frame_equal(parquet_file.to_pandas(index=False), df)
@@ -0,0 +1,125 @@
+import os
+import shutil
+from datetime import date
+
+import fastparquet
+import pandas as pd
+import pytest
+
+from b3_series.bench import generate_series
+from b3_series.config import Config
+from b3_series.query import load, select_series, serie_period
+from b3_series.sync_parquets import sync_parquets
+
+
+def _config(request, tmp_path) -> Config:
+    filename = request.module.__file__
+    test_dir, _ = os.path.splitext(filename)
+    tmp_path.mkdir(exist_ok=True)
+    shutil.copy("{}/{}".format(test_dir, "COTAHIST_D09062023.ZIP"), tmp_path)
+
+    config = Config(fs_path=str(tmp_path))
+    sync_parquets(config)
+    return config
+
+
+def test_serie_period():
+    assert serie_period("COTAHIST_A2000.parquet") == (
+        date(2000, 1, 1),
+        date(2000, 12, 31),
+    )
+    assert serie_period("COTAHIST_M022024.parquet") == (
+        date(2024, 2, 1),
+        date(2024, 2, 29),
+    )
+    assert serie_period("COTAHIST_D09062023.parquet") == (
+        date(2023, 6, 9),
+        date(2023, 6, 9),
+    )
+
+
+def test_select_series(tmp_path):
+    for name in ["COTAHIST_A2022", "COTAHIST_M062023", "COTAHIST_D09062023"]:
+        (tmp_path / f"{name}.parquet").touch()
+    config = Config(fs_path=str(tmp_path))
+
+    assert select_series(config=config) == [
+        "COTAHIST_A2022.parquet",
+        "COTAHIST_M062023.parquet",
+    ]
+    assert select_series(date(2023, 1, 1), config=config) == [
+        "COTAHIST_M062023.parquet"
+    ]
+    assert select_series(end=date(2022, 12, 31), config=config) == [
+        "COTAHIST_A2022.parquet"
+    ]
+
+
+def test_load(request, tmp_path):
+    config = _config(request, tmp_path)
+
+    df = load(
+        tickers=["GEPA4", "GFSA3"],
+        start="2023-06-01",
+        end="2023-06-30",
+        columns=["sigla_acao", "preco_ultimo"],
+        config=config,
+    )
+
+    assert df.columns.tolist() == ["sigla_acao", "preco_ultimo"]
+    assert df["sigla_acao"].tolist() == ["GEPA4", "GFSA3"]
+    assert df["preco_ultimo"].tolist() == [24.1, 6.91]
+
+
+def test_load_outside_date_range(request, tmp_path):
+    config = _config(request, tmp_path)
+
+    df = load(tickers=["GEPA4"], end=date(2023, 6, 8), config=config)
+
+    assert len(df) == 0
+
+
+def test_load_through_ticker_index(tmp_path, mocker):
+    generate_series(str(tmp_path / "COTAHIST_A2023.ZIP"), 5_000)
+    config = Config(fs_path=str(tmp_path), row_group_size=100)
+    sync_parquets(config)
+
+    expected = load(config=config)
+    tickers = expected["sigla_acao"].drop_duplicates().sample(5, random_state=0)
+    to_pandas = mocker.spy(fastparquet.ParquetFile, "to_pandas")
+
+    df = load(tickers=tickers.tolist(), config=config)
+
+    assert sorted(df["sigla_acao"].unique()) == sorted(tickers)
+    pd.testing.assert_frame_equal(
+        df,
+        expected[expected["sigla_acao"].isin(tickers)].reset_index(drop=True),
+    )
+    # only the row groups holding the tickers are read, from the index
+    assert to_pandas.call_count <= len(tickers) + 1
+
+    isin = expected["codigo_isin"].iloc[0]
+    df = load(isins=[isin], columns=["codigo_isin"], config=config)
+    assert df["codigo_isin"].unique().tolist() == [isin]
+    assert len(df) == (expected["codigo_isin"] == isin).sum()
+
+
+@pytest.mark.parametrize("engine", ["fastparquet", "pyarrow"])
+def test_load_with_dictionary_keeps_text_dtypes(request, tmp_path, engine):
+    if engine == "pyarrow":
+        pytest.importorskip("pyarrow")
+    expected = load(config=_config(request, tmp_path / "plain"))
+
+    config = Config(
+        fs_path=str(tmp_path / "dictionary"),
+        parquet_engine=engine,
+        parquet_dictionary=True,
+    )
+    shutil.copytree(tmp_path / "plain", config.fs_path, dirs_exist_ok=True)
+    sync_parquets(config)
+
+    df = load(config=config)
+    pd.testing.assert_frame_equal(df, expected)
+    assert df["sigla_acao"].dtype == object
+    df = load(tickers=["GEPA4"], config=config)
+    assert df["sigla_acao"].dtype == object
@@ -0,0 +1,29 @@
+import pytest
+
+from b3_series.pandas import dataframe_columns
+from b3_series.schema import RECORD_LENGTH, SCHEMA
+
+
+def test_schema_covers_the_record():
+    assert SCHEMA.colspecs[0][0] == 0
+    assert SCHEMA.colspecs[-1][1] == RECORD_LENGTH
+    for (_, end), (start, _) in zip(SCHEMA.colspecs, SCHEMA.colspecs[1:]):
+        assert end == start
+
+
+def test_schema_is_immutable():
+    with pytest.raises(TypeError):
+        SCHEMA.dtypes["preco_ultimo"] = "int64"
+    with pytest.raises(AttributeError):
+        SCHEMA.columns[0].name = "tipo"
+
+
+def test_dataframe_columns():
+    columns = dataframe_columns()
+    assert [column["name"] for column in columns] == list(SCHEMA.names)
+    assert columns[1] == {
+        "name": "data_pregao",
+        "description": "Data do pregão",
+        "type": "date",
+        "tuple": (2, 10),
+    }
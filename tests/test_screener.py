@@ -0,0 +1,119 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from b3_series import screener as screener_module
+from b3_series.bench import generate_series
+from b3_series.config import Config
+from b3_series.query import load
+from b3_series.screener import (
+    PANEL_MARKETS,
+    build_panel,
+    ffill,
+    load_panel,
+    pct_change,
+    rank,
+    rolling_mean,
+    screen,
+    update_panel,
+)
+from b3_series.sync_parquets import sync_parquets
+
+
+def _cash_market(config: Config) -> pd.DataFrame:
+    df = load(markets=PANEL_MARKETS, config=config)
+    return df.drop_duplicates(["data_pregao", "sigla_acao"], keep="last")
+
+
+def test_build_panel(tmp_path):
+    generate_series(str(tmp_path / "COTAHIST_A2022.ZIP"), 5_000, year=2022)
+    config = Config(fs_path=str(tmp_path))
+    sync_parquets(config)
+
+    panel = build_panel(config)
+
+    expected = _cash_market(config).pivot(
+        index="data_pregao", columns="sigla_acao", values="preco_ultimo"
+    )
+    close = panel.frame("preco_ultimo")
+    assert len(panel) == len(expected)
+    pd.testing.assert_frame_equal(
+        close[expected.columns], expected, check_names=False, check_freq=False
+    )
+
+
+def test_update_panel_appends_new_series(tmp_path, mocker):
+    generate_series(str(tmp_path / "COTAHIST_A2022.ZIP"), 5_000, year=2022)
+    config = Config(fs_path=str(tmp_path))
+    sync_parquets(config)
+    panel = load_panel(config)
+
+    generate_series(str(tmp_path / "COTAHIST_A2023.ZIP"), 5_000, year=2023, seed=1)
+    sync_parquets(config)
+    build = mocker.patch("b3_series.screener.build_panel")
+    updated = update_panel(config)
+
+    build.assert_not_called()
+    assert len(updated) > len(panel)
+    assert updated.dates[0] == panel.dates[0]
+
+    mocker.stopall()
+    rebuilt = build_panel(config)
+    pd.testing.assert_frame_equal(
+        updated.frame("volume_titulos_negociados")[rebuilt.tickers],
+        rebuilt.frame("volume_titulos_negociados"),
+    )
+    assert len(panel.frame("preco_ultimo")) == len(panel)
+
+
+def test_operators():
+    values = np.array([[1.0, np.nan], [np.nan, 2.0], [4.0, 4.0], [8.0, np.nan]])
+    df = pd.DataFrame(values)
+
+    np.testing.assert_array_equal(ffill(values), df.ffill().to_numpy())
+    np.testing.assert_allclose(
+        rolling_mean(values, 2), df.rolling(2, min_periods=1).mean().to_numpy()
+    )
+    np.testing.assert_allclose(
+        pct_change(values), df.ffill().pct_change(fill_method=None).to_numpy()
+    )
+    np.testing.assert_array_equal(rank(values), df.rank(axis=1, pct=True).to_numpy())
+
+
+def test_screen(tmp_path):
+    generate_series(str(tmp_path / "COTAHIST_A2022.ZIP"), 20_000, year=2022)
+    config = Config(fs_path=str(tmp_path))
+    sync_parquets(config)
+    panel = load_panel(config)
+
+    df = screen(panel, "2022-12-30", return_window=5, min_average_trades=1_000)
+
+    records = _cash_market(config)
+    traded = records[records["data_pregao"] == "2022-12-30"]
+    assert set(df["sigla_acao"]) <= set(traded["sigla_acao"])
+    assert (df["negocios_medio"] >= 1_000).all()
+    assert df["retorno"].dropna().is_monotonic_decreasing
+
+    close = panel.frame("preco_ultimo").ffill()
+    expected = close.iloc[-1] / close.iloc[-6] - 1
+    np.testing.assert_allclose(
+        df["retorno"], expected[df["sigla_acao"]].to_numpy(), equal_nan=True
+    )
+
+
+def test_update_panel_rebuilds_replaced_series(tmp_path, mocker):
+    generate_series(str(tmp_path / "COTAHIST_A2022.ZIP"), 2_000, year=2022)
+    config = Config(fs_path=str(tmp_path))
+    sync_parquets(config)
+    load_panel(config)
+
+    # a series replaced by another of the same size
+    path = tmp_path / "COTAHIST_A2022.parquet"
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+    build = mocker.spy(screener_module, "build_panel")
+    update_panel(config)
+
+    build.assert_called_once()
@@ -0,0 +1,185 @@
+import gc
+import os
+import signal
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+
+import pandas as pd
+import pytest
+
+import b3_series.shared as shared_module
+from b3_series.bench import generate_series
+from b3_series.cache import load_series
+from b3_series.config import Config
+from b3_series.shared import (
+    _series_key,
+    attach_series,
+    publish_series,
+    sweep_shared_series,
+)
+
+pytest.importorskip("pyarrow")
+
+SERIE = "COTAHIST_A2023.ZIP"
+
+
+@pytest.fixture
+def config(tmp_path):
+    generate_series(str(tmp_path / SERIE), 1_000)
+    return Config(fs_path=str(tmp_path))
+
+
+def _attach_in_worker(config: Config) -> pd.DataFrame:
+    with attach_series(SERIE, config) as shared:
+        return shared.df.copy()
+
+
+def _killed_in_worker(config: Config, publish: bool):
+    if publish:
+        shared = publish_series(SERIE, config=config)
+    else:
+        shared = attach_series(SERIE, config)
+    assert shared.attached
+    os.kill(os.getpid(), signal.SIGKILL)
+
+
+def _run_killed_worker(config: Config, publish: bool = False):
+    process = get_context("spawn").Process(
+        target=_killed_in_worker, args=(config, publish)
+    )
+    process.start()
+    process.join()
+    assert process.exitcode == -signal.SIGKILL
+
+
+def test_publish_and_attach(config):
+    published = publish_series(SERIE, config=config)
+
+    with get_context("spawn").Pool(1) as pool:
+        df = pool.apply(_attach_in_worker, (config,))
+
+    pd.testing.assert_frame_equal(df, load_series(SERIE, config))
+    assert not published.df["numero_negocios"].to_numpy().flags.writeable
+    published.detach()
+
+    with pytest.raises(FileNotFoundError):
+        attach_series(SERIE, config)
+
+
+def test_remove_once_last_reader_detaches(config):
+    published = publish_series(SERIE, config=config)
+    reader = attach_series(SERIE, config)
+
+    published.detach()
+    df = attach_series(SERIE, config).df
+    assert not published.attached
+    assert reader.df["sigla_acao"].equals(df["sigla_acao"])
+
+    reader.detach()
+    with pytest.raises(FileNotFoundError):
+        attach_series(SERIE, config)
+
+
+def test_publish_decodes_once(config, mocker):
+    load = mocker.spy(shared_module, "load_series")
+
+    first = publish_series(SERIE, config=config)
+    second = publish_series(SERIE, config=config)
+
+    assert load.call_count == 1
+    assert second.df["data_pregao"].equals(first.df["data_pregao"])
+    first.detach()
+    second.detach()
+
+
+def test_publish_compact_series(config):
+    config = Config(fs_path=config.fs_path, compact_schema=True)
+    expected = load_series(SERIE, config)
+
+    with publish_series(SERIE, expected, config) as shared:
+        pd.testing.assert_frame_equal(shared.df, expected)
+
+
+def test_changed_series_are_published_again(config):
+    with publish_series(SERIE, config=config):
+        path = os.path.join(config.fs_path, SERIE)
+        os.utime(path, (0, 0))
+
+        with pytest.raises(FileNotFoundError):
+            attach_series(SERIE, config)
+
+
+def test_remove_after_reader_was_killed(config):
+    published = publish_series(SERIE, config=config)
+    _run_killed_worker(config)
+
+    published.detach()
+
+    with pytest.raises(FileNotFoundError):
+        attach_series(SERIE, config)
+
+
+def test_sweep_series_of_killed_publisher(config):
+    _run_killed_worker(config, publish=True)
+    key = _series_key(SERIE, config)
+
+    assert key in sweep_shared_series()
+    with pytest.raises(FileNotFoundError):
+        attach_series(SERIE, config)
+
+    # series with live processes attached are kept
+    with publish_series(SERIE, config=config):
+        assert key not in sweep_shared_series()
+        attach_series(SERIE, config).detach()
+
+
+def test_publish_over_segments_of_interrupted_publish(config):
+    key = _series_key(SERIE, config)
+    leftover = SharedMemory(f"{key}_0", create=True, size=16)
+    leftover.close()
+
+    with publish_series(SERIE, config=config) as shared:
+        pd.testing.assert_frame_equal(shared.df, load_series(SERIE, config))
+
+
+def _record_close_errors(mocker) -> list[BufferError]:
+    errors = []
+    close = SharedMemory.close
+
+    def recorded_close(segment):
+        try:
+            close(segment)
+        except BufferError as error:
+            errors.append(error)
+            raise
+
+    mocker.patch.object(SharedMemory, "close", recorded_close)
+    return errors
+
+
+def test_detach_releases_views_before_closing(config, mocker):
+    errors = _record_close_errors(mocker)
+    shared = publish_series(SERIE, config=config)
+
+    shared.detach()
+
+    assert errors == []
+
+
+@pytest.mark.filterwarnings("error::pytest.PytestUnraisableExceptionWarning")
+def test_views_kept_after_detach_keep_their_segments(config, mocker):
+    errors = _record_close_errors(mocker)
+    shared = publish_series(SERIE, config=config)
+    expected = shared.df.copy()
+    df = shared.df
+
+    shared.detach()
+
+    pd.testing.assert_frame_equal(df, expected)
+    closed_early = len(errors)
+    assert closed_early > 0
+
+    # the segments are closed once the columns viewing them are collected
+    del df
+    gc.collect()
+    assert len(errors) == closed_early
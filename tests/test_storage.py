@@ -0,0 +1,160 @@
+import io
+
+import pytest
+
+from b3_series.config import Config, FSType
+from b3_series.consolidate import sync_consolidated
+from b3_series.io import (
+    list_series,
+    open_series,
+    remove_series,
+    save_series,
+    series_modified_at,
+)
+from b3_series.metrics import metrics
+from b3_series.pipeline import sync_pipeline
+from b3_series.query import load
+from b3_series.storage import MULTIPART_CHUNK_SIZE, S3Storage
+from b3_series.sync_parquets import sync_parquets
+from b3_series.sync_series import sync_series
+
+
+def test_local_storage(tmp_path):
+    config = Config(fs_path=str(tmp_path / "series"))
+
+    save_series("COTAHIST_A2000.ZIP", b"content", config)
+    save_series("COTAHIST_A2001.ZIP", [b"con", b"tent"], config)
+    save_series("COTAHIST_A2002.ZIP", io.BytesIO(b"content"), config)
+
+    assert sorted(list_series("zip", config=config)) == [
+        "COTAHIST_A2000.ZIP",
+        "COTAHIST_A2001.ZIP",
+        "COTAHIST_A2002.ZIP",
+    ]
+    for serie in list_series(config=config):
+        with open_series(serie, config) as f:
+            assert f.read() == b"content"
+    assert series_modified_at("COTAHIST_A2000.ZIP", config) is not None
+    assert series_modified_at("COTAHIST_A1999.ZIP", config) is None
+
+    remove_series("COTAHIST_A2000.ZIP", config)
+    assert "COTAHIST_A2000.ZIP" not in list_series(config=config)
+
+
+def test_local_storage_keeps_series_on_failed_write(tmp_path):
+    config = Config(fs_path=str(tmp_path))
+    save_series("COTAHIST_A2000.ZIP", b"content", config)
+
+    def failing_chunks():
+        yield b"partial"
+        raise ConnectionError()
+
+    with pytest.raises(ConnectionError):
+        save_series("COTAHIST_A2000.ZIP", failing_chunks(), config)
+
+    assert list_series(config=config) == ["COTAHIST_A2000.ZIP"]
+    with open_series("COTAHIST_A2000.ZIP", config) as f:
+        assert f.read() == b"content"
+
+
+@pytest.fixture
+def s3_client(monkeypatch):
+    boto3 = pytest.importorskip("boto3")
+    moto = pytest.importorskip("moto")
+
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+
+    with moto.mock_aws():
+        client = boto3.client("s3")
+        client.create_bucket(Bucket="b3-series")
+        yield client
+
+
+def test_s3_storage(s3_client):
+    storage = S3Storage("s3://b3-series/data", client=s3_client)
+
+    storage.write("COTAHIST_A2000.ZIP", b"content")
+    assert storage.list() == ["COTAHIST_A2000.ZIP"]
+    assert (
+        storage.path("COTAHIST_A2000.ZIP") == "s3://b3-series/data/COTAHIST_A2000.ZIP"
+    )
+
+    with storage.open("COTAHIST_A2000.ZIP") as f:
+        assert f.read() == b"content"
+
+    storage.remove("COTAHIST_A2000.ZIP")
+    assert storage.list() == []
+
+
+def test_s3_storage_multipart_write(s3_client):
+    storage = S3Storage("b3-series/data", client=s3_client)
+    content = bytes(range(256)) * (MULTIPART_CHUNK_SIZE // 100)
+
+    chunks = (content[i : i + 1024**2] for i in range(0, len(content), 1024**2))
+    assert storage.write("COTAHIST_A2000.ZIP", chunks) == len(content)
+
+    obj = s3_client.head_object(Bucket="b3-series", Key="data/COTAHIST_A2000.ZIP")
+    assert obj["ContentLength"] == len(content)
+    assert obj["ETag"].endswith('-3"')
+
+    with storage.open("COTAHIST_A2000.ZIP") as f:
+        assert f.read() == content
+
+
+def test_s3_storage_caches_listing(s3_client, mocker):
+    storage = S3Storage("b3-series", client=s3_client)
+    storage.write("COTAHIST_A2000.ZIP", b"content")
+
+    paginator = mocker.spy(s3_client, "get_paginator")
+    assert storage.list() == ["COTAHIST_A2000.ZIP"]
+    assert storage.modified_at("COTAHIST_A2000.ZIP") is not None
+    assert storage.list() == ["COTAHIST_A2000.ZIP"]
+    assert paginator.call_count == 1
+
+    storage.write("COTAHIST_A2001.ZIP", b"content")
+    assert sorted(storage.list()) == ["COTAHIST_A2000.ZIP", "COTAHIST_A2001.ZIP"]
+    assert paginator.call_count == 2
+
+
+def test_s3_config(s3_client, mocker):
+    storage = S3Storage("b3-series/data", client=s3_client)
+    cached_storage = mocker.patch(
+        "b3_series.storage._cached_storage", return_value=storage
+    )
+    config = Config(fs_type=FSType.s3, fs_path="b3-series/data")
+
+    save_series("COTAHIST_A2000.ZIP", b"content", config)
+
+    cached_storage.assert_called_with(FSType.s3, "b3-series/data", None)
+    assert storage.list() == ["COTAHIST_A2000.ZIP"]
+    assert metrics.totals() == {"bytes_written": len(b"content")}
+
+
+def test_s3_sync_series_refreshes_listing(s3_client, mocker):
+    storage = S3Storage("b3-series/data", client=s3_client)
+    mocker.patch("b3_series.storage._cached_storage", return_value=storage)
+    mocker.patch("b3_series.sync_series._find_missing_series", return_value=[])
+    config = Config(fs_type=FSType.s3, fs_path="b3-series/data")
+    assert list_series(config=config) == []
+
+    # written by another process, so not in the cached listing yet
+    s3_client.put_object(
+        Bucket="b3-series", Key="data/COTAHIST_A2000.ZIP", Body=b"content"
+    )
+    assert list_series(config=config) == []
+
+    sync_series(config)
+    assert list_series("zip", config=config) == ["COTAHIST_A2000.ZIP"]
+
+
+def test_s3_rejects_local_operations():
+    config = Config(fs_type=FSType.s3, fs_path="b3-series/data")
+
+    for operation in [sync_parquets, sync_pipeline, sync_consolidated, load]:
+        with pytest.raises(ValueError, match="requires fs_type=local"):
+            operation(config=config)
+
+    with pytest.raises(ValueError, match="requires fs_type=local"):
+        sync_series(config.copy(update={"convert_on_download": True}))
@@ -1,11 +1,23 @@
 import os
+import shutil
+import zipfile
 
+from b3_series import sync_parquets as sync_parquets_module
 from b3_series.config import Config
+from b3_series.index import INDEX_FOLDER
+from b3_series.options import OPTIONS_FOLDER
 from b3_series.sync_parquets import (
+    CONVERSION_JOURNAL,
+    MANIFEST,
+    WRITER_SETTINGS,
+    _convert_parquets,
     _convert_zip_to_parquet,
+    _load_manifest,
     _replace_zip_name_with_parquet,
+    _save_manifest,
     sync_parquets,
 )
+from b3_series.validation import QUARANTINE_FOLDER
 
 
 def test_replace_zip_name_with_parquet():
@@ -31,15 +43,143 @@ def test_convert_zip_to_parquet(request):
 
     assert path == "{}/{}".format(test_dir, "COTAHIST_A2000.parquet")
     assert os.path.exists(path)
+    assert os.path.exists("{}/{}".format(test_dir, "index/COTAHIST_A2000.parquet"))
     os.unlink(path)
+    shutil.rmtree("{}/{}".format(test_dir, INDEX_FOLDER))
+    shutil.rmtree("{}/{}".format(test_dir, OPTIONS_FOLDER))
+    shutil.rmtree("{}/{}".format(test_dir, QUARANTINE_FOLDER))
 
 
 def test_sync_parquets(request, mocker):
     filename = request.module.__file__
     test_dir, _ = os.path.splitext(filename)
 
-    sync_parquets(Config(fs_path=test_dir))
+    report = sync_parquets(Config(fs_path=test_dir))
 
     out = "{}/{}".format(test_dir, "COTAHIST_A2000.parquet")
     assert os.path.exists(out)
+    assert report.completed == [out]
+    assert report.remaining == []
+    assert report.counters["rows_parsed"] == 3
     os.unlink(out)
+    os.unlink("{}/{}".format(test_dir, MANIFEST))
+    os.unlink("{}/{}".format(test_dir, CONVERSION_JOURNAL))
+    shutil.rmtree("{}/{}".format(test_dir, INDEX_FOLDER))
+    shutil.rmtree("{}/{}".format(test_dir, OPTIONS_FOLDER))
+    shutil.rmtree("{}/{}".format(test_dir, QUARANTINE_FOLDER))
+
+
+def test_convert_parquets_in_parallel(request, tmp_path):
+    filename = request.module.__file__
+    test_dir, _ = os.path.splitext(filename)
+
+    zip_names = ["COTAHIST_A2000.ZIP", "COTAHIST_A2001.ZIP", "COTAHIST_A2002.ZIP"]
+    for zip_name in zip_names:
+        shutil.copy("{}/{}".format(test_dir, "COTAHIST_A2000.ZIP"), tmp_path / zip_name)
+
+    config = Config(fs_path=str(tmp_path), conversion_workers=2)
+    converted = _convert_parquets(zip_names, config=config)
+
+    assert sorted(converted) == [
+        "{}/{}".format(tmp_path, _replace_zip_name_with_parquet(zip_name))
+        for zip_name in zip_names
+    ]
+    assert all(os.path.exists(path) for path in converted)
+
+
+def test_convert_parquets_in_parallel_timeout(request, tmp_path):
+    filename = request.module.__file__
+    test_dir, _ = os.path.splitext(filename)
+    shutil.copy("{}/{}".format(test_dir, "COTAHIST_A2000.ZIP"), tmp_path)
+
+    config = Config(fs_path=str(tmp_path), conversion_workers=2)
+    converted = _convert_parquets(["COTAHIST_A2000.ZIP"], -1, config)
+
+    assert converted == []
+
+
+def test_sync_parquets_manifest(request, tmp_path, mocker):
+    filename = request.module.__file__
+    test_dir, _ = os.path.splitext(filename)
+    zip_path = tmp_path / "COTAHIST_A2000.ZIP"
+    shutil.copy("{}/{}".format(test_dir, "COTAHIST_A2000.ZIP"), zip_path)
+
+    config = Config(fs_path=str(tmp_path))
+    convert = mocker.spy(sync_parquets_module, "_convert_zip_to_parquet")
+    hash_series = mocker.spy(sync_parquets_module, "_hash_series")
+
+    sync_parquets(config)
+    assert convert.call_count == 1
+    assert hash_series.call_count == 1
+
+    # unchanged zip files are not read again
+    sync_parquets(config)
+    assert convert.call_count == 1
+    assert hash_series.call_count == 1
+
+    # touched but identical zip files are hashed, not converted
+    os.utime(zip_path, (0, 0))
+    sync_parquets(config)
+    assert convert.call_count == 1
+    assert hash_series.call_count == 2
+
+    # republished zip files are converted again
+    with zipfile.ZipFile(zip_path, "a") as zip_file:
+        zip_file.comment = b"republished"
+    sync_parquets(config)
+    assert convert.call_count == 2
+
+    # and so are zip files converted with other parser settings
+    sync_parquets(Config(fs_path=str(tmp_path), compact_schema=True))
+    assert convert.call_count == 3
+
+    # and so are parquet files without ticker index
+    shutil.rmtree(tmp_path / INDEX_FOLDER)
+    sync_parquets(Config(fs_path=str(tmp_path), compact_schema=True))
+    assert convert.call_count == 4
+
+    # or without options index
+    shutil.rmtree(tmp_path / OPTIONS_FOLDER)
+    sync_parquets(Config(fs_path=str(tmp_path), compact_schema=True))
+    assert convert.call_count == 5
+
+    # or written with other writer settings
+    config = Config(fs_path=str(tmp_path), compact_schema=True, parquet_codec=None)
+    sync_parquets(config)
+    assert convert.call_count == 6
+    sync_parquets(config)
+    assert convert.call_count == 6
+
+    # fingerprints recorded before the writer settings were tracked are kept
+    manifest = _load_manifest(config)
+    for setting in WRITER_SETTINGS:
+        del manifest["COTAHIST_A2000.ZIP"][setting]
+    _save_manifest(manifest, config)
+    sync_parquets(Config(fs_path=str(tmp_path), compact_schema=True))
+    assert convert.call_count == 6
+
+
+def test_sync_parquets_indexes_new_files_only(request, tmp_path):
+    filename = request.module.__file__
+    test_dir, _ = os.path.splitext(filename)
+    shutil.copy("{}/{}".format(test_dir, "COTAHIST_A2000.ZIP"), tmp_path)
+
+    config = Config(fs_path=str(tmp_path))
+    sync_parquets(config)
+    index_path = tmp_path / INDEX_FOLDER / "COTAHIST_A2000.parquet"
+    indexed_at = index_path.stat().st_mtime_ns
+
+    shutil.copy(
+        "{}/{}".format(test_dir, "COTAHIST_A2000.ZIP"),
+        tmp_path / "COTAHIST_D02012001.ZIP",
+    )
+    sync_parquets(config)
+
+    assert index_path.stat().st_mtime_ns == indexed_at
+    assert (tmp_path / INDEX_FOLDER / "COTAHIST_D02012001.parquet").exists()
+
+    # the index of removed parquet files is removed too
+    (tmp_path / "COTAHIST_D02012001.ZIP").unlink()
+    (tmp_path / "COTAHIST_D02012001.parquet").unlink()
+    sync_parquets(config)
+    assert not (tmp_path / INDEX_FOLDER / "COTAHIST_D02012001.parquet").exists()
@@ -1,11 +1,26 @@
+import io
+import os
+import zipfile
 from datetime import datetime
+from time import sleep, time
 
+import pandas as pd
+import pytest
+import requests
 from b3_api.historical_series_available import AvailableSeries, DataSeries, SerieType
 
+from b3_series.config import Config
+from b3_series.metrics import RunReport
+from b3_series.pandas import load_compressed_series
+from b3_series.pipeline import sync_pipeline
 from b3_series.sync_series import (
+    _download_serie,
+    _download_series,
     _find_missing_annual_series,
     _find_missing_daily_series,
     _find_missing_monthly_series,
+    _load_available_series,
+    get_http_session,
 )
 
 
@@ -85,3 +100,261 @@ def test_find_missing_daily_series(mocker):
 
     missing_daily_series = _find_missing_daily_series([sample_filename])
     assert len(missing_daily_series) == 0
+
+
+def _zip_content(name: str, content: bytes) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        zip_file.writestr(name, content)
+    return buffer.getvalue()
+
+
+def _response(raw: io.BytesIO, status_code: int = 200) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status_code
+    response.raw = raw
+    return response
+
+
+def _mock_get(mocker, **kwargs):
+    session = mocker.patch("b3_series.sync_series.get_http_session").return_value
+    session.get.configure_mock(**kwargs)
+    return session.get
+
+
+def _mock_session(mocker, contents: dict[str, bytes]):
+    return _mock_get(
+        mocker,
+        side_effect=lambda url, **kwargs: _response(
+            io.BytesIO(contents[url.split("/")[-1]])
+        ),
+    )
+
+
+def test_download_series_concurrently(mocker, tmp_path):
+    series = ["COTAHIST_A2000.ZIP", "COTAHIST_A2001.ZIP", "COTAHIST_A2002.ZIP"]
+    contents = {serie: _zip_content("COTAHIST.TXT", serie.encode()) for serie in series}
+    download = _mock_session(mocker, contents)
+
+    config = Config(fs_path=str(tmp_path), download_workers=2)
+    completed = _download_series(series, config=config)
+
+    assert sorted(completed) == series
+    assert download.call_count == 3
+    for serie in series:
+        assert (tmp_path / serie).read_bytes() == contents[serie]
+
+
+def test_download_serie_resumes_interrupted_download(mocker, tmp_path):
+    content = _zip_content("COTAHIST.TXT", os.urandom(1000))
+
+    class Raw(io.BytesIO):
+        def read(self, size=-1):
+            # the first connection drops after 500 bytes
+            if self.tell() == 500 and download.call_count == 1:
+                raise ConnectionResetError("Connection reset by peer")
+            return super().read(size)
+
+    def get(url, headers, **kwargs):
+        raw = Raw(content)
+        if "Range" not in headers:
+            return _response(raw)
+        raw.seek(int(headers["Range"][6:-1]))
+        return _response(raw, 206)
+
+    download = _mock_get(mocker, side_effect=get)
+    mocker.patch("b3_series.sync_series.DOWNLOAD_CHUNK_SIZE", 100)
+
+    config = Config(fs_path=str(tmp_path), retry_backoff_seconds=0)
+    _download_serie("COTAHIST_A2000.ZIP", config)
+
+    assert download.call_count == 2
+    assert (tmp_path / "COTAHIST_A2000.ZIP").read_bytes() == content
+
+
+def test_download_series_retries_failed_downloads(mocker, tmp_path):
+    content = _zip_content("COTAHIST.TXT", b"content")
+    download = _mock_get(
+        mocker,
+        side_effect=[
+            requests.ConnectionError("Connection refused"),
+            _response(io.BytesIO(content)),
+        ],
+    )
+
+    config = Config(fs_path=str(tmp_path), retry_backoff_seconds=0)
+    completed = _download_series(["COTAHIST_A2000.ZIP"], config=config)
+
+    assert completed == ["COTAHIST_A2000.ZIP"]
+    assert download.call_count == 2
+    assert (tmp_path / "COTAHIST_A2000.ZIP").read_bytes() == content
+
+
+def test_download_serie_checks_crc(mocker, tmp_path):
+    content = bytearray(_zip_content("COTAHIST.TXT", b"content" * 100))
+    content[14] ^= 0xFF  # first byte of the CRC-32 in the local header
+    _mock_session(mocker, {"COTAHIST_A2000.ZIP": bytes(content)})
+    mocker.patch("b3_series.sync_series.DOWNLOAD_CHUNK_SIZE", 16)
+
+    with pytest.raises(zipfile.BadZipFile):
+        _download_serie("COTAHIST_A2000.ZIP", Config(fs_path=str(tmp_path)))
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_download_serie_convert_on_download(mocker, tmp_path):
+    sample_path = os.path.join(os.path.dirname(__file__), "test_pandas", "sample.zip")
+    with open(sample_path, "rb") as f:
+        _mock_session(mocker, {"COTAHIST_A2000.ZIP": f.read()})
+    mocker.patch("b3_series.sync_series.DOWNLOAD_CHUNK_SIZE", 100)
+
+    config = Config(fs_path=str(tmp_path), convert_on_download=True)
+    _download_serie("COTAHIST_A2000.ZIP", config)
+
+    df = pd.read_parquet(tmp_path / "COTAHIST_A2000.parquet", engine="fastparquet")
+    expected = load_compressed_series(sample_path)
+    pd.testing.assert_frame_equal(df, expected)
+
+
+def test_download_series_concurrently_timeout(mocker, tmp_path):
+    download = _mock_get(mocker)
+
+    config = Config(fs_path=str(tmp_path), download_workers=2)
+    completed = _download_series(["COTAHIST_A2000.ZIP"], -1, config)
+
+    assert completed == []
+    download.assert_not_called()
+
+
+def test_load_available_series(mocker, tmp_path):
+    sample = AvailableSeries(
+        annual_series=[
+            DataSeries(
+                name="2000", type=SerieType.ANNUAL, file_name="COTAHIST_A2000.ZIP"
+            )
+        ],
+    )
+    available = mocker.patch(
+        "b3_series.sync_series.historical_series_available", return_value=sample
+    )
+
+    config = Config(fs_path=str(tmp_path))
+    assert _load_available_series(config, save=False) == sample
+    assert list(tmp_path.iterdir()) == []
+
+    assert _load_available_series(config) == sample
+    assert _load_available_series(config) == sample
+    assert available.call_count == 2
+
+    # without saving, the snapshot is used however old
+    stale = Config(fs_path=str(tmp_path), catalog_ttl_in_minutes=0)
+    assert _load_available_series(stale, save=False) == sample
+    assert available.call_count == 2
+
+    assert _load_available_series(stale) == sample
+    assert available.call_count == 3
+
+
+def test_sync_pipeline_converts_downloaded_series(mocker, tmp_path):
+    sample_path = os.path.join(os.path.dirname(__file__), "test_pandas", "sample.zip")
+    with open(sample_path, "rb") as f:
+        _mock_session(mocker, {"COTAHIST_A2000.ZIP": f.read()})
+    mocker.patch(
+        "b3_series.sync_series._find_missing_series",
+        return_value=["COTAHIST_A2000.ZIP"],
+    )
+
+    report = sync_pipeline(Config(fs_path=str(tmp_path)))
+
+    assert report.completed == [f"{tmp_path}/COTAHIST_A2000.parquet"]
+    assert report.remaining == []
+    assert report.counters["rows_parsed"] == 3
+    df = pd.read_parquet(tmp_path / "COTAHIST_A2000.parquet", engine="fastparquet")
+    assert len(df) == 3
+
+
+def _slow_conversion(serie: str, config: Config):
+    sleep(1)
+    return serie, []
+
+
+def test_sync_pipeline_starts_no_conversion_after_the_timeout(mocker, tmp_path):
+    series = [f"COTAHIST_A{year}.ZIP" for year in range(2000, 2005)]
+
+    def sync_series(config, timeout_in_minutes, on_download):
+        for serie in series[:4]:
+            on_download(serie)
+        # downloaded after the timeout
+        sleep(1.6)
+        on_download(series[4])
+        return RunReport(stage="sync_series", completed=series)
+
+    mocker.patch("b3_series.pipeline.sync_series", side_effect=sync_series)
+    mocker.patch(
+        "b3_series.pipeline._convert_zip_to_parquet_in_worker", _slow_conversion
+    )
+    sync_parquets = mocker.patch(
+        "b3_series.pipeline.sync_parquets",
+        return_value=RunReport(stage="sync_parquets", remaining=series[2:]),
+    )
+
+    started = time()
+    report = sync_pipeline(Config(fs_path=str(tmp_path)), timeout_in_minutes=1.5 / 60)
+
+    # the second conversion starts before the timeout, the others are left
+    assert report.completed == series[:2]
+    assert report.remaining == series[2:]
+    assert time() - started < 3.5
+    assert sync_parquets.call_args.args[1] == 0
+
+
+def test_download_serie_from_configured_url(mocker, tmp_path):
+    content = _zip_content("COTAHIST.TXT", b"content")
+    download = _mock_session(mocker, {"COTAHIST_A2000.ZIP": content})
+
+    config = Config(fs_path=str(tmp_path), series_url="https://mirror.test/b3/{}")
+    _download_serie("COTAHIST_A2000.ZIP", config)
+
+    url = download.call_args.args[0]
+    assert url == "https://mirror.test/b3/COTAHIST_A2000.ZIP"
+
+
+def test_download_serie_fails_when_range_is_not_honoured(mocker, tmp_path):
+    content = _zip_content("COTAHIST.TXT", os.urandom(1000))
+
+    class Raw(io.BytesIO):
+        # the server ignores the range and sends the whole file again
+        def read(self, size=-1):
+            if self.tell() == 500 and download.call_count == 1:
+                raise ConnectionResetError("Connection reset by peer")
+            return super().read(size)
+
+    download = _mock_get(
+        mocker, side_effect=lambda url, **kwargs: _response(Raw(content))
+    )
+    mocker.patch("b3_series.sync_series.DOWNLOAD_CHUNK_SIZE", 100)
+
+    config = Config(fs_path=str(tmp_path), retry_backoff_seconds=0)
+    with pytest.raises(ConnectionError, match="Cannot resume"):
+        _download_serie("COTAHIST_A2000.ZIP", config)
+
+    assert download.call_count == 2
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_download_serie_fails_on_http_error(mocker, tmp_path):
+    _mock_get(mocker, return_value=_response(io.BytesIO(b"Not Found"), 404))
+
+    with pytest.raises(ConnectionError, match="HTTP 404"):
+        _download_serie("COTAHIST_A2000.ZIP", Config(fs_path=str(tmp_path)))
+
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_http_session_is_shared_by_the_downloads():
+    config = Config(download_workers=4)
+    session = get_http_session(config)
+
+    assert get_http_session(config) is session
+    assert session.get_adapter("https://b3.test")._pool_maxsize == 4
+    assert get_http_session(Config(download_workers=2)) is not session
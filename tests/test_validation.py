@@ -0,0 +1,214 @@
+import os
+import zipfile
+from datetime import date
+
+import pandas as pd
+
+from b3_series.config import Config
+from b3_series.pandas import (
+    SeriesStreamParser,
+    iter_compressed_series,
+    load_compressed_series,
+)
+from b3_series.sync_parquets import _convert_zip_to_parquet
+from b3_series.validation import (
+    SeriesValidator,
+    quarantine_path,
+    read_quarantine,
+    remove_quarantine,
+    write_quarantine,
+)
+
+
+def _sample_lines(request) -> list[bytes]:
+    test_dir, _ = os.path.splitext(request.module.__file__)
+    sample_path = os.path.join(os.path.dirname(test_dir), "test_pandas", "sample.zip")
+    with zipfile.ZipFile(sample_path) as zf:
+        return zf.read(zf.namelist()[0]).splitlines()
+
+
+def _replace(line: bytes, start: int, value: bytes) -> bytes:
+    return line[:start] + value + line[start + len(value) :]
+
+
+def _write_series(path, header: bytes, quotes: list[bytes], trailer_count=None):
+    lines = [header] + quotes
+    if trailer_count is not False:
+        count = len(quotes) + 2 if trailer_count is None else trailer_count
+        lines.append(
+            _replace(b"99COTAHIST.2023BOVESPA".ljust(245), 31, b"%011d" % count)
+        )
+
+    with zipfile.ZipFile(path, "w") as zf:
+        zf.writestr("COTAHIST_A2023.TXT", b"\r\n".join(lines) + b"\r\n")
+    return str(path)
+
+
+def _invalid_quotes(quote: bytes) -> list[bytes]:
+    return [
+        quote,
+        # record_length
+        quote[:-5],
+        # tipo_registro
+        _replace(quote, 0, b"02"),
+        # data_pregao, not a date
+        _replace(quote, 2, b"20230231"),
+        # data_pregao, out of the period
+        _replace(quote, 2, b"19700102"),
+        # data_vencimento, not a date
+        _replace(quote, 202, b"20231301"),
+        # ohlc, open above the max price
+        _replace(quote, 56, b"0000000099999"),
+        # ohlc and data_vencimento
+        _replace(_replace(quote, 108, b"0000000000001"), 202, b"20230000"),
+    ]
+
+
+def test_load_compressed_series_quarantines_invalid_records(request, tmp_path):
+    header, quote, *_ = _sample_lines(request)
+    path = _write_series(tmp_path / "series.zip", header, _invalid_quotes(quote))
+
+    validator = SeriesValidator()
+    df = load_compressed_series(path, validator=validator)
+    issues = validator.finish()
+
+    assert df["sigla_acao"].tolist() == ["GEPA3"]
+    assert issues["record_number"].tolist() == [3, 4, 5, 6, 7, 8, 9]
+    assert issues["reasons"].tolist() == [
+        "record_length",
+        "tipo_registro",
+        "data_pregao",
+        "data_pregao",
+        "data_vencimento",
+        "ohlc",
+        "data_vencimento,ohlc",
+    ]
+    assert issues["record"][0] == quote[:-5].decode("latin-1")
+
+
+def test_load_compressed_series_without_validator_keeps_records(request, tmp_path):
+    header, quote, *_ = _sample_lines(request)
+    path = _write_series(tmp_path / "series.zip", header, _invalid_quotes(quote))
+
+    df = load_compressed_series(path)
+
+    assert len(df) == 7
+    assert df["data_pregao"].isna().sum() == 1
+
+
+def test_validator_checks_header_and_trailer(request, tmp_path):
+    header, *quotes, _ = _sample_lines(request)
+
+    path = _write_series(tmp_path / "valid.zip", header, quotes)
+    validator = SeriesValidator()
+    load_compressed_series(path, validator=validator)
+    assert validator.finish().empty
+
+    path = _write_series(tmp_path / "count.zip", header, quotes, trailer_count=9778)
+    validator = SeriesValidator()
+    assert len(load_compressed_series(path, validator=validator)) == 3
+    issues = validator.finish()
+    assert issues["reasons"].tolist() == ["record_count"]
+    assert issues["record_number"].tolist() == [5]
+
+    path = _write_series(
+        tmp_path / "truncated.zip", header, quotes, trailer_count=False
+    )
+    validator = SeriesValidator()
+    assert len(load_compressed_series(path, validator=validator)) == 3
+    assert validator.finish()["reasons"].tolist() == ["missing_trailer"]
+
+    path = _write_series(tmp_path / "headless.zip", quotes[0], quotes[1:])
+    validator = SeriesValidator()
+    load_compressed_series(path, validator=validator)
+    assert validator.finish()["reasons"].tolist() == ["missing_header"]
+
+
+def test_validator_period(request, tmp_path):
+    header, *quotes, _ = _sample_lines(request)
+    path = _write_series(tmp_path / "series.zip", header, quotes)
+
+    validator = SeriesValidator((date(2022, 1, 1), date(2022, 12, 31)))
+    assert load_compressed_series(path, validator=validator).empty
+    assert validator.finish()["reasons"].tolist() == ["data_pregao"] * 3
+
+
+def test_stream_parser_validates_chunks(request, tmp_path):
+    header, quote, *_ = _sample_lines(request)
+    path = _write_series(tmp_path / "series.zip", header, _invalid_quotes(quote) * 3)
+
+    expected = SeriesValidator()
+    load_compressed_series(path, validator=expected)
+
+    validator = SeriesValidator()
+    chunks = list(iter_compressed_series(path, chunk_rows=4, validator=validator))
+    assert sum(len(chunk) for chunk in chunks) == 3
+    pd.testing.assert_frame_equal(validator.finish(), expected.finish())
+
+    with zipfile.ZipFile(path) as zf:
+        content = zf.read(zf.namelist()[0])
+    validator = SeriesValidator()
+    parser = SeriesStreamParser(chunk_rows=5, validator=validator)
+    chunks = [
+        chunk
+        for block in range(0, len(content), 1000)
+        for chunk in parser.feed(content[block : block + 1000])
+    ]
+    chunks += parser.close()
+    assert sum(len(chunk) for chunk in chunks) == 3
+    assert len(validator.finish()) == 21
+
+
+def test_write_and_read_quarantine(request, tmp_path):
+    header, quote, *_ = _sample_lines(request)
+    path = _write_series(
+        tmp_path / "series.zip", header, _invalid_quotes(quote), trailer_count=False
+    )
+    config = Config(fs_path=str(tmp_path))
+
+    validator = SeriesValidator()
+    load_compressed_series(path, validator=validator)
+    issues = validator.finish()
+
+    assert write_quarantine("COTAHIST_A2023.parquet", issues, config) == 7
+    pd.testing.assert_frame_equal(
+        read_quarantine("COTAHIST_A2023.parquet", config), issues
+    )
+
+    # a series converted again without issues has no quarantine file
+    assert write_quarantine("COTAHIST_A2023.parquet", issues.iloc[:0], config) == 0
+    assert not quarantine_path("COTAHIST_A2023.parquet", config).exists()
+    assert read_quarantine("COTAHIST_A2023.parquet", config).empty
+
+
+def test_quarantine_uses_writer_settings_and_is_pruned(request, tmp_path):
+    header, quote, *_ = _sample_lines(request)
+    path = _write_series(tmp_path / "series.zip", header, _invalid_quotes(quote))
+    config = Config(fs_path=str(tmp_path), parquet_codec=None)
+
+    validator = SeriesValidator()
+    load_compressed_series(path, validator=validator)
+    issues = validator.finish()
+    for name in ["COTAHIST_A2022.parquet", "COTAHIST_A2023.parquet"]:
+        write_quarantine(name, issues, config)
+
+    pd.testing.assert_frame_equal(
+        read_quarantine("COTAHIST_A2023.parquet", config), issues
+    )
+    assert not list(quarantine_path("", config).glob("*.partial"))
+
+    removed = remove_quarantine(["COTAHIST_A2023.parquet"], config)
+    assert removed == ["COTAHIST_A2022.parquet"]
+    assert not quarantine_path("COTAHIST_A2022.parquet", config).exists()
+    assert quarantine_path("COTAHIST_A2023.parquet", config).exists()
+
+
+def test_convert_zip_to_parquet_quarantines_invalid_records(request, tmp_path):
+    header, quote, *_ = _sample_lines(request)
+    _write_series(tmp_path / "COTAHIST_A2023.ZIP", header, _invalid_quotes(quote))
+    config = Config(fs_path=str(tmp_path))
+
+    parquet_path = _convert_zip_to_parquet("COTAHIST_A2023.ZIP", config)
+
+    assert os.path.exists(parquet_path)
+    assert len(read_quarantine("COTAHIST_A2023.parquet", config)) == 7
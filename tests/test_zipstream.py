@@ -0,0 +1,67 @@
+import io
+import os
+import zipfile
+
+import pytest
+
+from b3_series.zipstream import ZipStreamDecoder
+
+SAMPLE_PATH = os.path.join(os.path.dirname(__file__), "test_pandas", "sample.zip")
+
+
+def _decode(content: bytes, chunk_size: int) -> bytes:
+    decoder = ZipStreamDecoder()
+    decompressed = b"".join(
+        decoder.feed(content[start : start + chunk_size])
+        for start in range(0, len(content), chunk_size)
+    )
+    decoder.close()
+    return decompressed
+
+
+def test_decode_zip_stream():
+    with open(SAMPLE_PATH, "rb") as f:
+        content = f.read()
+    with zipfile.ZipFile(SAMPLE_PATH) as zip_file:
+        expected = zip_file.read(zip_file.namelist()[0])
+
+    for chunk_size in [1, 7, 100, len(content)]:
+        assert _decode(content, chunk_size) == expected
+
+
+@pytest.mark.parametrize("force_zip64", [False, True])
+def test_decode_zip_stream_with_data_descriptor(force_zip64):
+    class Unseekable(io.RawIOBase):
+        def __init__(self):
+            self.content = bytearray()
+
+        def writable(self):
+            return True
+
+        def write(self, data):
+            self.content += data
+            return len(data)
+
+    expected = b"content\r\n" * 1000
+    stream = Unseekable()
+    with zipfile.ZipFile(stream, "w", zipfile.ZIP_DEFLATED) as zip_file:
+        with zip_file.open("COTAHIST.TXT", "w", force_zip64=force_zip64) as f:
+            f.write(expected)
+
+    assert _decode(bytes(stream.content), 10) == expected
+
+
+def test_decode_zip_stream_errors():
+    with open(SAMPLE_PATH, "rb") as f:
+        content = f.read()
+
+    with pytest.raises(zipfile.BadZipFile):
+        _decode(content[:150], 10)
+
+    corrupt = bytearray(content)
+    corrupt[14] ^= 0xFF
+    with pytest.raises(zipfile.BadZipFile):
+        _decode(bytes(corrupt), 10)
+
+    with pytest.raises(zipfile.BadZipFile):
+        _decode(b"not a zip file" * 10, 10)